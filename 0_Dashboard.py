@@ -7,6 +7,7 @@ import numpy as np
 import json
 import requests
 import pydeck as pdk
+import altair as alt
 from datetime import date, datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from groq import Groq
@@ -18,13 +19,23 @@ from utils import (
     build_rentebetalingen,
     get_exchange_rate_eur_to_gmd,
     get_exchange_rate_volatility,
+    get_exchange_rate_timeseries,
     format_currency,
     analyse_portfolio_perceel,
     analyse_verkocht_perceel,
     verdeel_winst,
+    portfolio_kpis,
+    gevoeligheidsgrid,
+    rendementen,
 )
 
-from datastore import store
+from datastore import store, sessie_tracker
+from bulk_export import FORMATEN, export_bytes
+from portfolio_frame import portfolio_frame
+from journaal import sessie_journaal
+from financieel.kpis import splits_verkocht
+from financieel.scenario import PADEN, kalibreer_fx, simuleer_portfolio
+from financieel.gevoeligheid import FX_SCHOKKEN_PCT
 
 # auth
 from auth import login_check
@@ -69,7 +80,8 @@ def groq_chat(messages, *, model: str | None = None) -> str:
 
 # --- Data laden ---
 if "percelen" not in st.session_state or not st.session_state["percelen"]:
-    st.session_state["percelen"] = store.load_percelen()
+    st.session_state["percelen"] = store.load_percelen(tracker=sessie_tracker())
+    sessie_journaal().begin(st.session_state["percelen"])
 
 # --- Titel & Koersen ---
 st.title(_("Vastgoeddashboard – Gambia"))
@@ -89,6 +101,154 @@ with col2:
     else:
         st.warning(_("Geen historische wisselkoersdata beschikbaar."))
 
+# --- 📅 Historische stand (bijv. einde kwartaal) ---
+with st.expander(_("📅 Portfolio op peildatum")):
+    _kwartaal_start = date(date.today().year, 3 * ((date.today().month - 1) // 3) + 1, 1)
+    peildatum = st.date_input(
+        _("Peildatum"),
+        value=_kwartaal_start - timedelta(days=1),
+        max_value=date.today(),
+        key="peildatum_dashboard",
+    )
+    if not wisselkoers:
+        st.warning(_("Wisselkoers niet beschikbaar."))
+    else:
+        try:
+            kpis_toen = portfolio_kpis(store.as_of(peildatum), wisselkoers, peildatum=peildatum)
+            kpis_nu = portfolio_kpis(st.session_state["percelen"], wisselkoers)
+        except Exception as e:
+            st.warning(_("Historische stand niet beschikbaar: {e}").format(e=e))
+        else:
+            k1, k2, k3, k4 = st.columns(4)
+            k1.metric(_("Percelen"), kpis_toen["aantal"], kpis_nu["aantal"] - kpis_toen["aantal"])
+            k2.metric(_("Verkocht"), kpis_toen["aantal_verkocht"],
+                      kpis_nu["aantal_verkocht"] - kpis_toen["aantal_verkocht"])
+            k3.metric(_("Verwachte winst"), format_currency(kpis_toen["verwachte_winst_eur"]),
+                      round(kpis_nu["verwachte_winst_eur"] - kpis_toen["verwachte_winst_eur"], 2))
+            k4.metric(_("Gerealiseerde winst"), format_currency(kpis_toen["gerealiseerde_winst_eur"]),
+                      round(kpis_nu["gerealiseerde_winst_eur"] - kpis_toen["gerealiseerde_winst_eur"], 2))
+            st.caption(_("Verschil t.o.v. vandaag (EUR) onder elke waarde."))
+
+# --- 🎲 Scenario's: groei, horizon en wisselkoers ---
+with st.expander(_("🎲 Scenario's (Monte Carlo)")):
+    if not wisselkoers:
+        st.warning(_("Wisselkoers niet beschikbaar."))
+    else:
+        fx_drift, fx_vol = kalibreer_fx(get_exchange_rate_timeseries(90))
+        s1, s2, s3 = st.columns(3)
+        mc_groei = s1.number_input(_("Groei per jaar (%)"), value=5.0, step=0.5, key="mc_groei")
+        mc_groei_sd = s1.number_input(_("Spreiding groei (%-punt)"), min_value=0.0, value=2.0, step=0.5,
+                                      key="mc_groei_sd")
+        mc_horizon = s2.number_input(_("Horizon (jaren)"), min_value=0.0, value=3.0, step=0.5, key="mc_horizon")
+        mc_spreiding = s2.number_input(_("Spreiding horizon (jaren)"), min_value=0.0, value=1.0, step=0.5,
+                                       key="mc_spreiding")
+        mc_vol = s3.number_input(_("FX-volatiliteit per jaar (%)"), min_value=0.0,
+                                 value=round(fx_vol * 100, 2), step=0.5, key="mc_vol")
+        mc_drift = s3.number_input(_("FX-drift per jaar (%)"), value=round(fx_drift * 100, 2), step=0.5,
+                                   key="mc_drift")
+        st.caption(_("FX gekalibreerd op de dagkoersen van de afgelopen 90 dagen; niet-verkochte percelen, "
+                     "{n} paden.").format(n=PADEN))
+
+        # alleen opnieuw simuleren als de parameters of de percelen veranderen
+        mc_sleutel = (mc_groei, mc_groei_sd, mc_horizon, mc_spreiding, mc_vol, mc_drift, wisselkoers,
+                      id(st.session_state["percelen"]), sessie_journaal().versie, date.today())
+        bewaard = st.session_state.get("mc_scenario")
+        if bewaard is None or bewaard[0] != mc_sleutel:
+            _verkocht, mc_percelen = splits_verkocht(st.session_state["percelen"], pd.Timestamp.today())
+            try:
+                bewaard = (mc_sleutel, simuleer_portfolio(
+                    mc_percelen, mc_groei, mc_horizon, wisselkoers, groei_sd_pct=mc_groei_sd,
+                    horizon_spreiding=mc_spreiding, fx_drift=mc_drift / 100, fx_vol=mc_vol / 100, seed=0,
+                    vertaal=_,
+                ))
+            except Exception as e:
+                bewaard = (mc_sleutel, None)
+                st.warning(_("Simulatie mislukt: {e}").format(e=e))
+            st.session_state["mc_scenario"] = bewaard
+
+        sim = bewaard[1]
+        if sim is not None:
+            netto = sim["portfolio"].loc["netto_winst_eur"]
+            m1, m2, m3, m4 = st.columns(4)
+            m1.metric(_("Netto winst P5"), format_currency(netto["p5"]))
+            m2.metric(_("Netto winst P50"), format_currency(netto["p50"]))
+            m3.metric(_("Netto winst P95"), format_currency(netto["p95"]))
+            m4.metric(_("Kans op verlies"), f"{sim['kans_verlies']:.0%}")
+            st.markdown(_("**Uitkering per investeerder (EUR)**"))
+            st.dataframe(sim["investeerders"], hide_index=True, use_container_width=True)
+            st.markdown(_("**Netto winst per perceel (EUR)**"))
+            st.dataframe(sim["percelen"], hide_index=True, use_container_width=True)
+
+# --- 🧭 Gevoeligheid: groei × horizon × FX-schok ---
+with st.expander(_("🧭 Gevoeligheid (groei × horizon × FX-schok)")):
+    if not wisselkoers:
+        st.warning(_("Wisselkoers niet beschikbaar."))
+    else:
+        try:
+            grid = gevoeligheidsgrid(st.session_state["percelen"], wisselkoers)
+        except Exception as e:
+            grid = None
+            st.warning(_("Gevoeligheidsanalyse mislukt: {e}").format(e=e))
+        if grid is not None:
+            g1, g2 = st.columns(2)
+            gv_schok = g1.select_slider(_("FX-schok bij verkoop (%)"), options=list(FX_SCHOKKEN_PCT), value=0.0,
+                                        key="gv_schok")
+            gv_opties = [_("Portfolio")] + sorted(grid["investeerders"]["naam"].unique().tolist())
+            gv_onderwerp = g2.selectbox(_("Tonen voor"), gv_opties, key="gv_onderwerp")
+            if gv_onderwerp == _("Portfolio"):
+                gv_df, gv_veld = grid["portfolio"], "netto_winst_eur"
+            else:
+                gv_df = grid["investeerders"][grid["investeerders"]["naam"] == gv_onderwerp]
+                gv_veld = "uitkering_eur"
+            gv_df = gv_df[gv_df["fx_schok_pct"] == gv_schok]
+
+            heatmap = alt.Chart(gv_df).mark_rect().encode(
+                x=alt.X("horizon_jaren:O", title=_("Horizon (jaren)")),
+                y=alt.Y("groei_pct:O", title=_("Groei per jaar (%)"), sort="descending"),
+                color=alt.Color(f"{gv_veld}:Q", title="EUR", scale=alt.Scale(scheme="redyellowgreen", domainMid=0)),
+                tooltip=["groei_pct", "horizon_jaren", "fx_schok_pct", alt.Tooltip(f"{gv_veld}:Q", format=",.0f")],
+            )
+            waarden = heatmap.mark_text(fontSize=11).encode(
+                text=alt.Text(f"{gv_veld}:Q", format=",.0f"), color=alt.value("black"),
+            )
+            st.altair_chart(heatmap + waarden, use_container_width=True)
+            st.caption(_("Niet-verkochte percelen; een investeerder krijgt inleg + rente + winstdeling (EUR). "
+                         "Een negatieve schok betekent minder GMD per euro."))
+
+# --- 💸 Kasstromen en XIRR ---
+with st.expander(_("💸 Kasstromen & rendement (XIRR)")):
+    try:
+        kasstromen = rendementen(st.session_state["percelen"])
+    except Exception as e:
+        kasstromen = None
+        st.warning(_("Kasstroomanalyse mislukt: {e}").format(e=e))
+    if kasstromen is not None:
+        st.markdown(_("**Per investeerder (alle percelen)**"))
+        st.dataframe(kasstromen["investeerders"], hide_index=True, use_container_width=True)
+        st.markdown(_("**Per perceel**"))
+        st.dataframe(kasstromen["percelen"], hide_index=True, use_container_width=True)
+        st.markdown(_("**Per investeerder per perceel**"))
+        st.dataframe(kasstromen["investeringen"], hide_index=True, use_container_width=True)
+        st.download_button(_("⬇️ Kasstroomschema (CSV)"), kasstromen["schema"].to_csv(index=False).encode("utf-8"),
+                           file_name="kasstromen.csv", mime="text/csv", key="kasstromen_download")
+        st.caption(_("XIRR in % per jaar (Act/365). Kosten staan op de aankoopdatum; rente als coupon "
+                     "(maandelijks / jaarlijks) of bij verkoop. Leeg = geen tekenwissel in de kasstromen."))
+
+# --- 📦 Export voor rapportages ---
+with st.expander(_("📦 Export (Parquet / Excel / GeoJSON)")):
+    st.caption(_("Percelen, investeerders, kosten en statusupdates als vaste tabellen; Parquet als zip met vier bestanden."))
+    export_formaat = st.radio(_("Formaat"), list(FORMATEN), horizontal=True, key="export_formaat")
+    if st.button(_("📦 Export maken"), key="export_maken"):
+        try:
+            st.session_state["export"] = export_bytes(export_formaat)
+        except Exception as e:
+            st.session_state.pop("export", None)
+            st.error(_("Export mislukt: {e}").format(e=e))
+    if "export" in st.session_state:
+        inhoud, bestandsnaam, mime = st.session_state["export"]
+        st.download_button(_("⬇️ Download {naam}").format(naam=bestandsnaam), inhoud,
+                           file_name=bestandsnaam, mime=mime, key="export_download")
+
 st.markdown("---")
 
 # --- Power BI Embed ---
@@ -164,16 +324,16 @@ with tab_chat:
 
     def _resolve_loc(name: str):
         """Exact → fuzzy → None. Return (perceel_dict, suggestie)."""
-        for p in _percelen_norm():
-            if (p.get("locatie","").lower().strip() == (name or "").lower().strip()):
-                return p, None
-        guess = _closest_loc(name)
-        if guess:
-            for p in _percelen_norm():
-                if p.get("locatie")==guess:
-                    return p, None
-            return None, guess
-        return None, None
+        frame = portfolio_frame()
+        pos = frame.positie(name)
+        if pos is None:
+            guess = _closest_loc(name)
+            if not guess:
+                return None, None
+            pos = frame.positie(guess)
+            if pos is None:
+                return None, guess
+        return _normalize_perceel(_percelen_raw()[pos]), None
 
     def _parse_loc_list(txt: str) -> list[str]:
         """Sta lijsten toe: 'Sanyang 1, Kunkujang 2 en Tanji' → ['Sanyang 1','Kunkujang 2','Tanji']"""
@@ -257,9 +417,10 @@ with tab_chat:
         }
 
     def investor_report():
+        # uit de sessie: ook nog niet opgeslagen of in de wachtrij staande bewerkingen
         agg = {}
-        for p in _percelen_norm():
-            for inv in (p.get("investeerders") or []):
+        for p in _percelen_raw():
+            for inv in ((p.get("investeerders") or []) if isinstance(p, dict) else []):
                 naam = (inv.get("naam") or _("Onbekend")).strip()
                 a = agg.setdefault(naam, {"totaal_inleg_eur": 0.0, "percelen": 0, "rentetypes": set()})
                 a["totaal_inleg_eur"] += float(inv.get("bedrag_eur") or 0)
@@ -303,33 +464,11 @@ with tab_chat:
         return {"locatie": target.get("locatie"), "score": score, "toelichting": toel, "advies": advies}
 
     def get_totale_winst():
-        ps = _percelen_norm()
-        opb = sum(float(p.get("verwachte_opbrengst_eur") or 0) for p in ps)
-        kos = sum(float(p.get("verwachte_kosten_eur") or 0) for p in ps)
-        ank = sum(float(p.get("aankoopprijs_eur") or 0) for p in ps)
-        return {"opbrengst": opb, "kosten": kos, "aankoop": ank, "winst": opb - kos - ank}
+        return portfolio_frame().totalen()
 
     def find_deadlines(days: int = 30):
-        ps = _percelen_raw()
-        today = date.today()
-        due = []
-        for p in ps:
-            d = p.get("doorlooptijd")
-            if not d: 
-                continue
-            try:
-                dt = datetime.fromisoformat(d).date()
-                delta = (dt - today).days
-                if delta <= days:
-                    due.append({
-                        "locatie": p.get("locatie"), 
-                        "fase": p.get("dealstage"), 
-                        "einddatum": d, 
-                        "dagen_tot": delta
-                    })
-            except Exception:
-                pass
-        return {"horizon_dagen": days, "items": sorted(due, key=lambda x: x["dagen_tot"])}
+        items = portfolio_frame().deadlines(int(days)).to_dict("records")
+        return {"horizon_dagen": days, "items": items}
 
     def score_readiness():
         req = _get_doc_requirements()
@@ -362,19 +501,8 @@ with tab_chat:
         return {"locatie": p.get("locatie"), "fase": p.get("dealstage"), "docs": docs}
 
     def simulate_fx(delta_pct: float = -10):
-        ps = _percelen_norm()
-        out = []
-        for p in ps:
-            opb = float(p.get("verwachte_opbrengst_eur") or 0)
-            kos = float(p.get("verwachte_kosten_eur") or 0)
-            ank = float(p.get("aankoopprijs_eur") or 0)
-            opb_new = opb * (1 + delta_pct/100.0)
-            out.append({
-                "locatie": p.get("locatie"), 
-                "winst_oud": opb-kos-ank, 
-                "winst_nieuw": round(opb_new-kos-ank, 2)
-            })
-        return {"delta_pct": delta_pct, "items": out}
+        items = portfolio_frame().fx_scenario(float(delta_pct)).to_dict("records")
+        return {"delta_pct": delta_pct, "items": items}
 
     # ---------- Batch/wijzere tools ----------
     def summary_all():
@@ -397,13 +525,7 @@ with tab_chat:
         return {"adviezen": out}
 
     def rank_by(field: str = "verwachte_winst_eur", n: int = 5, desc: bool = True):
-        ps = _percelen_norm()
-        rows = []
-        for p in ps:
-            val = float(p.get(field) or 0)
-            rows.append({"locatie": p.get("locatie"), field: val})
-        rows.sort(key=lambda r: r[field], reverse=bool(desc))
-        return {"veld": field, "top": rows[:max(1,int(n))]}
+        return {"veld": field, "top": portfolio_frame().rangschik(field, int(n), bool(desc))}
 
     FUNCTIONS = {
         # single
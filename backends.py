@@ -0,0 +1,837 @@
+"""
+Opslag-backends voor DataStore.
+
+Elke backend bewaart per perceel een rij (perceel_id, versie, updated_at,
+perceel) en kent dezelfde vier operaties als de Supabase-tabel met de
+rpc's percelen_stempel en percelen_opslaan. Zo draaien load/save, cache en
+concurrency-controle identiek tegen Supabase, een lokaal SQLite-bestand of
+een JSON-bestand (benchmarks, loadtests en offline demo's).
+
+Keuze via PERCELEN_BACKEND (env of secrets): supabase (standaard), sqlite
+of json; het bestand via PERCELEN_DB_PAD.
+
+Met PERCELEN_GENORMALISEERD=1 (supabase en sqlite) staan de lijsten
+investeerders, kosten_items, status_updates en v_plots in eigen tabellen
+(één rij per element) en bevat het perceel-document op die plek een lege
+lijst. Lezen zet de dicts weer in elkaar; schrijven raakt alleen de
+gewijzigde elementen.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import zlib
+from datetime import datetime, timedelta, timezone
+
+import streamlit as st
+
+
+def instelling(naam: str, default=None):
+    """Lees een instelling uit de omgeving of st.secrets (mag ontbreken)."""
+    if os.environ.get(naam):
+        return os.environ[naam]
+    try:
+        return st.secrets.get(naam, default)
+    except Exception:
+        return default
+
+
+# Standaard paginagrootte (onder de gebruikelijke max-rows van 1000 in PostgREST)
+PAGINAGROOTTE = 500
+
+# Maximaal aantal ids per in.(...)-filter
+ID_BLOK = 100
+
+# Na zoveel journaalregels legt de opslag een snapshot van alle percelen vast
+SNAPSHOT_ELKE = 500
+
+# ... en in elk geval na zoveel dagen, zolang er wijzigingen bijkomen
+SNAPSHOT_DAGEN = 7
+
+
+def _nu() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def snapshot_nodig(laatste_seq: int, vorige_seq: int, vorige_tijd: str | None, nu: str) -> bool:
+    """
+    Nieuwe snapshot na SNAPSHOT_ELKE regels of SNAPSHOT_DAGEN dagen (mits er
+    regels bij zijn gekomen). De eerste regel krijgt meteen een snapshot:
+    die legt ook de percelen van vóór het journaal vast.
+    """
+    if laatste_seq <= vorige_seq:
+        return False
+    if vorige_tijd is None:
+        return True
+    verstreken = datetime.fromisoformat(nu) - datetime.fromisoformat(vorige_tijd)
+    return laatste_seq - vorige_seq >= SNAPSHOT_ELKE or verstreken >= timedelta(days=SNAPSHOT_DAGEN)
+
+
+# Kindtabellen (perceel_<veld>) met hun projectiekolommen en type
+KINDTABELLEN = {
+    "investeerders": {"naam": "text", "bedrag_eur": "numeric", "rente": "numeric",
+                      "winstdeling": "numeric", "rentetype": "text"},
+    "kosten_items": {"omschrijving": "text", "categorie": "text", "bedrag_eur": "numeric"},
+    "status_updates": {"datum": "text"},
+    "v_plots": {"plot_id": "text", "plot_number": "text", "status": "text"},
+}
+
+
+def is_kindlijst(waarde) -> bool:
+    """Alleen lijsten van dicts gaan naar een kindtabel; al het andere blijft in het document."""
+    return isinstance(waarde, list) and bool(waarde) and all(isinstance(e, dict) for e in waarde)
+
+
+def stel_samen(perceel: dict, kinderen: dict) -> dict:
+    """Vul de lege lijsten in het document met de kindrijen (veld → [data, ...])."""
+    for veld, lijst in kinderen.items():
+        if lijst and perceel.get(veld) == []:
+            perceel[veld] = lijst
+    return perceel
+
+
+def _controleer_kolommen(veld: str, kolommen) -> list[str]:
+    if veld not in KINDTABELLEN:
+        raise ValueError(f"Onbekende kindtabel: {veld}")
+    kolommen = list(kolommen or KINDTABELLEN[veld])
+    onbekend = [k for k in kolommen if k not in KINDTABELLEN[veld]]
+    if onbekend:
+        raise ValueError(f"Geen projectiekolom in perceel_{veld}: {', '.join(onbekend)}")
+    return kolommen
+
+
+class OpslagBackend:
+    """Interface die DataStore van een backend verwacht."""
+
+    naam = "?"
+    genormaliseerd = False
+
+    def stempel(self) -> dict | None:
+        """Aantal rijen, som van de versies en laatste updated_at."""
+        raise NotImplementedError
+
+    def lees_versies(self) -> dict:
+        """perceel_id → versie, in volgorde van toevoegen."""
+        raise NotImplementedError
+
+    def lees_rijen(self, perceel_ids: list[str] | None = None) -> list[dict]:
+        """Rijen {perceel_id, versie, perceel}; alle of alleen de opgegeven ids."""
+        raise NotImplementedError
+
+    def lees_paginas(self, paginagrootte: int | None = None):
+        """
+        Alle rijen {perceel_id, versie, perceel} als opeenvolgende pagina's
+        (lijsten), in volgorde van toevoegen. Standaard: lees_rijen in stukken.
+        """
+        rijen = self.lees_rijen()
+        n = paginagrootte or PAGINAGROOTTE
+        for i in range(0, len(rijen), n):
+            yield rijen[i:i + n]
+
+    def lees_samenvattingen(self, velden) -> list[dict]:
+        """Rijen {perceel_id, versie, perceel} met alleen `velden` uit het document."""
+        raise NotImplementedError
+
+    def opslaan(self, upserts: list[dict], verwijderd: list[dict]) -> dict:
+        """
+        Pas upserts ({perceel_id, perceel, versie}) en verwijderingen
+        ({perceel_id, versie}) atomair toe, voorwaardelijk op versie
+        (None = nieuw perceel). Returnt {versies, verwijderd, conflicten}
+        zoals de rpc percelen_opslaan.
+
+        Bij een genormaliseerde backend kan een upsert `kinderen` bevatten:
+        veld → {lengte, rijen: [{positie, data}]}, alleen de gewijzigde
+        posities; posities vanaf `lengte` worden verwijderd.
+
+        Upserts en verwijderingen met een `journaal`-regel ({soort, patch,
+        invers, gebruiker}) worden, als ze doorgaan, in dezelfde transactie
+        aan het journaal toegevoegd; elke SNAPSHOT_ELKE regels volgt een
+        snapshot.
+        """
+        raise NotImplementedError
+
+    def lees_journaal(self, perceel_id: str | None = None, na_seq: int | None = None,
+                      tot_seq: int | None = None, limiet: int | None = None,
+                      aflopend: bool = False, vanaf_tijd: str | None = None,
+                      voor_tijd: str | None = None) -> list[dict]:
+        """
+        Journaalregels {seq, tijd, perceel_id, versie, soort, patch, invers,
+        gebruiker}; tijden als ISO-tekst (vanaf_tijd inclusief, voor_tijd niet).
+        """
+        raise NotImplementedError
+
+    def lees_snapshot(self, voor_tijd: str) -> dict | None:
+        """Laatste snapshot {seq, tijd, percelen: [{perceel_id, versie, perceel}]} van vóór `voor_tijd`."""
+        raise NotImplementedError
+
+    def lees_kindrijen(self, veld: str, kolommen=None) -> list[dict]:
+        """Projectie op een kindtabel: {perceel_id, positie, <kolommen>} per element."""
+        raise NotImplementedError
+
+
+# =========================
+# SUPABASE
+# =========================
+
+class SupabaseBackend(OpslagBackend):
+    naam = "supabase"
+
+    def __init__(self, client, genormaliseerd: bool = False, paginagrootte: int = PAGINAGROOTTE):
+        self.client = client
+        self.genormaliseerd = genormaliseerd
+        self.paginagrootte = paginagrootte
+        # de view zet de kindtabellen server-side weer in het document
+        self._tabel = "percelen_volledig" if genormaliseerd else "percelen"
+
+    def _pagineer(self, tabel: str, kolommen: str, aantal: int | None = None):
+        """
+        Pagina's van `aantal` rijen, keyset op id (id > laatste id). Blijft
+        onder de max-rows-limiet van PostgREST en slaat geen rijen over als
+        er tussendoor iets verwijderd wordt.
+        """
+        aantal = aantal or self.paginagrootte
+        na = None
+        while True:
+            query = self.client.table(tabel).select(f"id, {kolommen}").order("id").limit(aantal)
+            if na is not None:
+                query = query.gt("id", na)
+            rijen = query.execute().data or []
+            if rijen:
+                yield rijen
+            if len(rijen) < aantal:
+                return
+            na = rijen[-1]["id"]
+
+    def stempel(self):
+        return self.client.rpc("percelen_stempel", {}).execute().data
+
+    def lees_versies(self):
+        versies = {}
+        for pagina in self._pagineer("percelen", "perceel_id, versie"):
+            versies.update((row["perceel_id"], row.get("versie")) for row in pagina)
+        return versies
+
+    def lees_paginas(self, paginagrootte=None):
+        for pagina in self._pagineer(self._tabel, "perceel_id, versie, perceel", paginagrootte):
+            yield [{"perceel_id": r["perceel_id"], "versie": r.get("versie"), "perceel": r["perceel"]} for r in pagina]
+
+    def lees_rijen(self, perceel_ids=None):
+        if perceel_ids is None:
+            return [row for pagina in self.lees_paginas() for row in pagina]
+        ids = list(perceel_ids)
+        rijen = []
+        # in.(...) staat in de url: in blokken, zodat die niet te lang wordt
+        for i in range(0, len(ids), ID_BLOK):
+            rijen += (
+                self.client
+                .table(self._tabel)
+                .select("perceel_id, versie, perceel")
+                .in_("perceel_id", ids[i:i + ID_BLOK])
+                .execute()
+            ).data or []
+        return rijen
+
+    def lees_samenvattingen(self, velden):
+        velden = [v for v in velden if v != "perceel_id"]
+        kolommen = ", ".join(["perceel_id", "versie"] + [f"{v}:perceel->{v}" for v in velden])
+        return [
+            {
+                "perceel_id": row["perceel_id"],
+                "versie": row.get("versie"),
+                "perceel": {v: row[v] for v in velden if row.get(v) is not None},
+            }
+            for pagina in self._pagineer(self._tabel, kolommen)
+            for row in pagina
+        ]
+
+    def opslaan(self, upserts, verwijderd):
+        return (
+            self.client
+            .rpc("percelen_opslaan", {
+                "p_upserts": upserts,
+                "p_verwijderd": verwijderd,
+            })
+            .execute()
+        ).data or {}
+
+    def lees_journaal(self, perceel_id=None, na_seq=None, tot_seq=None, limiet=None, aflopend=False,
+                      vanaf_tijd=None, voor_tijd=None):
+        query = (
+            self.client
+            .table("percelen_journaal")
+            .select("seq, tijd, perceel_id, versie, soort, patch, invers, gebruiker")
+            .order("seq", desc=aflopend)
+        )
+        if perceel_id is not None:
+            query = query.eq("perceel_id", perceel_id)
+        if na_seq is not None:
+            query = query.gt("seq", na_seq)
+        if tot_seq is not None:
+            query = query.lte("seq", tot_seq)
+        if vanaf_tijd is not None:
+            query = query.gte("tijd", vanaf_tijd)
+        if voor_tijd is not None:
+            query = query.lt("tijd", voor_tijd)
+        if limiet is not None:
+            return query.limit(limiet).execute().data or []
+
+        rijen, start = [], 0
+        while True:
+            pagina = query.range(start, start + self.paginagrootte - 1).execute().data or []
+            rijen += pagina
+            if len(pagina) < self.paginagrootte:
+                return rijen
+            start += self.paginagrootte
+
+    def lees_snapshot(self, voor_tijd):
+        rijen = (
+            self.client
+            .table("percelen_snapshots")
+            .select("seq, tijd, percelen")
+            .lt("tijd", voor_tijd)
+            .order("seq", desc=True)
+            .limit(1)
+            .execute()
+        ).data or []
+        return rijen[0] if rijen else None
+
+    def lees_kindrijen(self, veld, kolommen=None):
+        kolommen = _controleer_kolommen(veld, kolommen)
+        rijen, start = [], 0
+        while True:
+            pagina = (
+                self.client
+                .table(f"perceel_{veld}")
+                .select(", ".join(["perceel_id", "positie"] + kolommen))
+                .order("perceel_id")
+                .order("positie")
+                .range(start, start + self.paginagrootte - 1)
+                .execute()
+            ).data or []
+            rijen += pagina
+            if len(pagina) < self.paginagrootte:
+                return rijen
+            start += self.paginagrootte
+
+
+# =========================
+# SQLITE
+# =========================
+
+class SQLiteBackend(OpslagBackend):
+    """Lokale stand-in met hetzelfde gedrag als de Supabase-tabel."""
+
+    naam = "sqlite"
+
+    def __init__(self, pad: str, genormaliseerd: bool = False):
+        self.pad = pad
+        self.genormaliseerd = genormaliseerd
+        with self._verbind() as con:
+            con.execute(
+                """
+                create table if not exists percelen (
+                    id integer primary key autoincrement,
+                    perceel_id text not null unique,
+                    versie integer not null default 1,
+                    updated_at text not null,
+                    perceel text not null
+                )
+                """
+            )
+            con.execute(
+                """
+                create table if not exists percelen_journaal (
+                    seq integer primary key autoincrement,
+                    tijd text not null,
+                    perceel_id text not null,
+                    versie integer,
+                    soort text not null,
+                    patch text,
+                    invers text,
+                    gebruiker text
+                )
+                """
+            )
+            con.execute("create index if not exists percelen_journaal_perceel_idx on percelen_journaal (perceel_id, seq)")
+            con.execute(
+                """
+                create table if not exists percelen_snapshots (
+                    id integer primary key autoincrement,
+                    seq integer not null,
+                    tijd text not null,
+                    percelen blob not null
+                )
+                """
+            )
+            if genormaliseerd:
+                for veld, kolommen in KINDTABELLEN.items():
+                    con.execute(self._kindtabel_sql(veld, kolommen))
+                self._normaliseer(con)
+
+    @staticmethod
+    def _kindtabel_sql(veld, kolommen) -> str:
+        projecties = []
+        for kolom, soort in kolommen.items():
+            if soort == "numeric":
+                expr = (f"case when json_type(data, '$.{kolom}') in ('integer', 'real') "
+                        f"then json_extract(data, '$.{kolom}') end")
+                projecties.append(f"{kolom} real generated always as ({expr}) virtual")
+            else:
+                projecties.append(f"{kolom} text generated always as (json_extract(data, '$.{kolom}')) virtual")
+        return f"""
+            create table if not exists perceel_{veld} (
+                perceel_id text not null references percelen (perceel_id) on delete cascade,
+                positie integer not null,
+                data text not null,
+                {", ".join(projecties)},
+                primary key (perceel_id, positie)
+            )
+        """
+
+    def _normaliseer(self, con):
+        """Verplaats lijsten die nog in het document staan naar de kindtabellen (eenmalig)."""
+        rijen = con.execute("select perceel_id, perceel from percelen").fetchall()
+        for pid, tekst in rijen:
+            perceel = json.loads(tekst)
+            verplaatst = False
+            for veld in KINDTABELLEN:
+                if is_kindlijst(perceel.get(veld)):
+                    self._schrijf_kinderen(con, pid, {veld: {
+                        "lengte": len(perceel[veld]),
+                        "rijen": [{"positie": i, "data": e} for i, e in enumerate(perceel[veld])],
+                    }})
+                    perceel[veld] = []
+                    verplaatst = True
+            if verplaatst:
+                con.execute(
+                    "update percelen set perceel = ? where perceel_id = ?",
+                    (json.dumps(perceel, ensure_ascii=False), pid),
+                )
+
+    def _verbind(self):
+        con = sqlite3.connect(self.pad, timeout=30)
+        con.execute("pragma journal_mode = wal")
+        con.execute("pragma foreign_keys = on")
+        return con
+
+    def stempel(self):
+        with self._verbind() as con:
+            aantal, som, laatst = con.execute(
+                "select count(*), coalesce(sum(versie), 0), max(updated_at) from percelen"
+            ).fetchone()
+        return {"aantal": aantal, "versiesom": som, "laatst": laatst}
+
+    def lees_versies(self):
+        with self._verbind() as con:
+            rijen = con.execute("select perceel_id, versie from percelen order by id").fetchall()
+        return dict(rijen)
+
+    def lees_rijen(self, perceel_ids=None):
+        with self._verbind() as con:
+            if perceel_ids is None:
+                rijen = con.execute("select perceel_id, versie, perceel from percelen order by id").fetchall()
+            else:
+                ids = list(perceel_ids)
+                rijen = con.execute(
+                    f"select perceel_id, versie, perceel from percelen where perceel_id in ({','.join('?' * len(ids))})",
+                    ids,
+                ).fetchall() if ids else []
+            kinderen = self._lees_kinderen(con, None if perceel_ids is None else [r[0] for r in rijen])
+        return [
+            {"perceel_id": pid, "versie": versie, "perceel": stel_samen(json.loads(tekst), kinderen.get(pid, {}))}
+            for pid, versie, tekst in rijen
+        ]
+
+    def lees_paginas(self, paginagrootte=None):
+        n = paginagrootte or PAGINAGROOTTE
+        na = 0
+        while True:
+            with self._verbind() as con:
+                rijen = con.execute(
+                    "select id, perceel_id, versie, perceel from percelen where id > ? order by id limit ?",
+                    (na, n),
+                ).fetchall()
+                kinderen = self._lees_kinderen(con, [r[1] for r in rijen])
+            if rijen:
+                yield [
+                    {"perceel_id": pid, "versie": versie, "perceel": stel_samen(json.loads(tekst), kinderen.get(pid, {}))}
+                    for _id, pid, versie, tekst in rijen
+                ]
+            if len(rijen) < n:
+                return
+            na = rijen[-1][0]
+
+    def lees_samenvattingen(self, velden):
+        velden = [v for v in velden if v != "perceel_id"]
+        # -> levert JSON-tekst (ook voor objecten en lijsten), json() houdt dat zo in json_object
+        projectie = ", ".join(f"'{v}', json(perceel -> '$.{v}')" for v in velden)
+        with self._verbind() as con:
+            rijen = con.execute(
+                f"select perceel_id, versie, json_object({projectie}) from percelen order by id"
+            ).fetchall()
+            kinderen = self._lees_kinderen(con, velden=[v for v in velden if v in KINDTABELLEN])
+        resultaat = []
+        for pid, versie, tekst in rijen:
+            perceel = {k: v for k, v in json.loads(tekst).items() if v is not None}
+            resultaat.append({"perceel_id": pid, "versie": versie, "perceel": stel_samen(perceel, kinderen.get(pid, {}))})
+        return resultaat
+
+    def _lees_kinderen(self, con, perceel_ids=None, velden=KINDTABELLEN) -> dict:
+        """perceel_id → veld → [data, ...] in volgorde van positie."""
+        kinderen = {}
+        if not self.genormaliseerd or perceel_ids == []:
+            return kinderen
+        for veld in velden:
+            sql = f"select perceel_id, data from perceel_{veld}"
+            params = []
+            if perceel_ids is not None:
+                sql += f" where perceel_id in ({','.join('?' * len(perceel_ids))})"
+                params = perceel_ids
+            for pid, data in con.execute(sql + " order by perceel_id, positie", params):
+                kinderen.setdefault(pid, {}).setdefault(veld, []).append(json.loads(data))
+        return kinderen
+
+    def lees_kindrijen(self, veld, kolommen=None):
+        kolommen = _controleer_kolommen(veld, kolommen)
+        namen = ["perceel_id", "positie"] + kolommen
+        with self._verbind() as con:
+            rijen = con.execute(
+                f"select {', '.join(namen)} from perceel_{veld} order by perceel_id, positie"
+            ).fetchall()
+        return [dict(zip(namen, rij)) for rij in rijen]
+
+    @staticmethod
+    def _schrijf_kinderen(con, pid, kinderen: dict):
+        for veld, delta in kinderen.items():
+            if veld not in KINDTABELLEN:
+                raise ValueError(f"Onbekende kindtabel: {veld}")
+            con.execute(f"delete from perceel_{veld} where perceel_id = ? and positie >= ?", (pid, delta["lengte"]))
+            con.executemany(
+                f"insert into perceel_{veld} (perceel_id, positie, data) values (?, ?, ?) "
+                f"on conflict (perceel_id, positie) do update set data = excluded.data "
+                f"where data is not excluded.data",
+                [(pid, r["positie"], json.dumps(r["data"], ensure_ascii=False)) for r in delta.get("rijen") or []],
+            )
+
+    def opslaan(self, upserts, verwijderd):
+        versies, weg, conflicten = {}, [], []
+        con = self._verbind()
+        try:
+            con.execute("begin immediate")
+            nu = _nu()
+
+            for r in upserts:
+                pid, verwacht = r["perceel_id"], r.get("versie")
+                tekst = json.dumps(r["perceel"], ensure_ascii=False)
+                if verwacht is None:
+                    cur = con.execute(
+                        "insert or ignore into percelen (perceel_id, versie, updated_at, perceel) values (?, 1, ?, ?)",
+                        (pid, nu, tekst),
+                    )
+                    nieuw = 1 if cur.rowcount else None
+                else:
+                    cur = con.execute(
+                        "update percelen set perceel = ?, versie = versie + 1, updated_at = ? "
+                        "where perceel_id = ? and versie = ?",
+                        (tekst, nu, pid, verwacht),
+                    )
+                    nieuw = verwacht + 1 if cur.rowcount else None
+
+                if nieuw is None:
+                    conflicten.append(self._huidig(con, pid))
+                else:
+                    versies[pid] = nieuw
+                    if r.get("kinderen"):
+                        self._schrijf_kinderen(con, pid, r["kinderen"])
+                    self._journaal(con, pid, nieuw, r.get("journaal"), nu)
+
+            for r in verwijderd:
+                pid, verwacht = r["perceel_id"], r.get("versie")
+                cur = con.execute(
+                    "delete from percelen where perceel_id = ? and (? is null or versie = ?)",
+                    (pid, verwacht, verwacht),
+                )
+                huidig = None if cur.rowcount else self._huidig(con, pid)
+                if huidig is None or huidig["versie"] is None:
+                    weg.append(pid)
+                    if cur.rowcount:
+                        self._journaal(con, pid, None, r.get("journaal"), nu)
+                else:
+                    conflicten.append(huidig)
+
+            self._snapshot_indien_nodig(con, nu)
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+        finally:
+            con.close()
+
+        return {"versies": versies, "verwijderd": weg, "conflicten": conflicten}
+
+    @staticmethod
+    def _journaal(con, pid, versie, regel, nu):
+        if not regel:
+            return
+        con.execute(
+            "insert into percelen_journaal (tijd, perceel_id, versie, soort, patch, invers, gebruiker) "
+            "values (?, ?, ?, ?, ?, ?, ?)",
+            (nu, pid, versie, regel.get("soort"), json.dumps(regel.get("patch"), ensure_ascii=False),
+             json.dumps(regel.get("invers"), ensure_ascii=False), regel.get("gebruiker")),
+        )
+
+    def _snapshot_indien_nodig(self, con, nu):
+        laatste = con.execute("select coalesce(max(seq), 0) from percelen_journaal").fetchone()[0]
+        vorige = con.execute("select seq, tijd from percelen_snapshots order by seq desc limit 1").fetchone()
+        if not snapshot_nodig(laatste, vorige[0] if vorige else 0, vorige[1] if vorige else None, nu):
+            return
+        rijen = con.execute("select perceel_id, versie, perceel from percelen order by id").fetchall()
+        kinderen = self._lees_kinderen(con)
+        percelen = [
+            {"perceel_id": pid, "versie": versie, "perceel": stel_samen(json.loads(tekst), kinderen.get(pid, {}))}
+            for pid, versie, tekst in rijen
+        ]
+        # gecomprimeerd: een snapshot bevat de hele portfolio
+        con.execute(
+            "insert into percelen_snapshots (seq, tijd, percelen) values (?, ?, ?)",
+            (laatste, nu, zlib.compress(json.dumps(percelen, ensure_ascii=False).encode("utf-8"))),
+        )
+
+    def lees_snapshot(self, voor_tijd):
+        with self._verbind() as con:
+            rij = con.execute(
+                "select seq, tijd, percelen from percelen_snapshots where tijd < ? order by seq desc limit 1",
+                (voor_tijd,),
+            ).fetchone()
+        if rij is None:
+            return None
+        seq, tijd, inhoud = rij
+        if isinstance(inhoud, bytes):
+            inhoud = zlib.decompress(inhoud).decode("utf-8")
+        return {"seq": seq, "tijd": tijd, "percelen": json.loads(inhoud)}
+
+    def lees_journaal(self, perceel_id=None, na_seq=None, tot_seq=None, limiet=None, aflopend=False,
+                      vanaf_tijd=None, voor_tijd=None):
+        sql = "select seq, tijd, perceel_id, versie, soort, patch, invers, gebruiker from percelen_journaal where 1 = 1"
+        params = []
+        if perceel_id is not None:
+            sql += " and perceel_id = ?"
+            params.append(perceel_id)
+        if na_seq is not None:
+            sql += " and seq > ?"
+            params.append(na_seq)
+        if tot_seq is not None:
+            sql += " and seq <= ?"
+            params.append(tot_seq)
+        if vanaf_tijd is not None:
+            sql += " and tijd >= ?"
+            params.append(vanaf_tijd)
+        if voor_tijd is not None:
+            sql += " and tijd < ?"
+            params.append(voor_tijd)
+        sql += " order by seq desc" if aflopend else " order by seq"
+        if limiet is not None:
+            sql += " limit ?"
+            params.append(limiet)
+        with self._verbind() as con:
+            rijen = con.execute(sql, params).fetchall()
+        return [
+            {"seq": seq, "tijd": tijd, "perceel_id": pid, "versie": versie, "soort": soort,
+             "patch": json.loads(patch) if patch else None, "invers": json.loads(invers) if invers else None,
+             "gebruiker": gebruiker}
+            for seq, tijd, pid, versie, soort, patch, invers, gebruiker in rijen
+        ]
+
+    def _huidig(self, con, pid) -> dict:
+        rij = con.execute("select perceel, versie from percelen where perceel_id = ?", (pid,)).fetchone()
+        perceel = None
+        if rij:
+            perceel = stel_samen(json.loads(rij[0]), self._lees_kinderen(con, [pid]).get(pid, {}))
+        return {
+            "perceel_id": pid,
+            "perceel": perceel,
+            "versie": rij[1] if rij else None,
+        }
+
+
+# =========================
+# JSON-BESTAND
+# =========================
+
+class JSONBackend(OpslagBackend):
+    """
+    Eenvoudigste stand-in: één JSON-bestand, in het geheugen gehouden en na
+    elke save atomair vervangen (tijdelijk bestand + os.replace).
+    """
+
+    naam = "json"
+
+    def __init__(self, pad: str):
+        self.pad = pad
+        self._lock = threading.Lock()
+        self._rijen = {}
+        self._journaal = []
+        self._snapshots = []
+        if os.path.exists(pad):
+            with open(pad, "r", encoding="utf-8") as f:
+                inhoud = json.load(f)
+            for rij in inhoud.get("percelen", []):
+                self._rijen[rij["perceel_id"]] = rij
+            self._journaal = inhoud.get("journaal", [])
+            self._snapshots = inhoud.get("snapshots", [])
+
+    def _bewaar(self):
+        map_ = os.path.dirname(os.path.abspath(self.pad))
+        fd, tijdelijk = tempfile.mkstemp(dir=map_, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({
+                "percelen": list(self._rijen.values()),
+                "journaal": self._journaal,
+                "snapshots": self._snapshots,
+            }, f, ensure_ascii=False)
+        os.replace(tijdelijk, self.pad)
+
+    def lees_journaal(self, perceel_id=None, na_seq=None, tot_seq=None, limiet=None, aflopend=False,
+                      vanaf_tijd=None, voor_tijd=None):
+        with self._lock:
+            regels = [
+                r for r in self._journaal
+                if (perceel_id is None or r["perceel_id"] == perceel_id)
+                and (na_seq is None or r["seq"] > na_seq)
+                and (tot_seq is None or r["seq"] <= tot_seq)
+                and (vanaf_tijd is None or r["tijd"] >= vanaf_tijd)
+                and (voor_tijd is None or r["tijd"] < voor_tijd)
+            ]
+        if aflopend:
+            regels.reverse()
+        return json.loads(json.dumps(regels[:limiet] if limiet is not None else regels))
+
+    def lees_snapshot(self, voor_tijd):
+        with self._lock:
+            snapshot = next((s for s in reversed(self._snapshots) if s["tijd"] < voor_tijd), None)
+        return json.loads(json.dumps(snapshot)) if snapshot else None
+
+    def stempel(self):
+        with self._lock:
+            rijen = list(self._rijen.values())
+        return {
+            "aantal": len(rijen),
+            "versiesom": sum(r["versie"] for r in rijen),
+            "laatst": max((r["updated_at"] for r in rijen), default=None),
+        }
+
+    def lees_versies(self):
+        with self._lock:
+            return {pid: r["versie"] for pid, r in self._rijen.items()}
+
+    def lees_rijen(self, perceel_ids=None):
+        with self._lock:
+            if perceel_ids is None:
+                rijen = list(self._rijen.values())
+            else:
+                rijen = [self._rijen[pid] for pid in perceel_ids if pid in self._rijen]
+            # kopieën, zodat aanroepers de opgeslagen staat niet wijzigen
+            return json.loads(json.dumps(
+                [{"perceel_id": r["perceel_id"], "versie": r["versie"], "perceel": r["perceel"]} for r in rijen]
+            ))
+
+    def lees_samenvattingen(self, velden):
+        with self._lock:
+            return json.loads(json.dumps([
+                {
+                    "perceel_id": r["perceel_id"],
+                    "versie": r["versie"],
+                    "perceel": {v: r["perceel"][v] for v in velden if r["perceel"].get(v) is not None},
+                }
+                for r in self._rijen.values()
+            ]))
+
+    def opslaan(self, upserts, verwijderd):
+        versies, weg, conflicten = {}, [], []
+        with self._lock:
+            nieuw = dict(self._rijen)
+            nu = _nu()
+            regels = []
+
+            def _journaal(pid, versie, regel):
+                if regel:
+                    seq = (self._journaal[-1]["seq"] if self._journaal else 0) + len(regels) + 1
+                    regels.append(json.loads(json.dumps({
+                        "seq": seq, "tijd": nu, "perceel_id": pid, "versie": versie,
+                        "soort": regel.get("soort"), "patch": regel.get("patch"),
+                        "invers": regel.get("invers"), "gebruiker": regel.get("gebruiker"),
+                    })))
+
+            for r in upserts:
+                pid, verwacht = r["perceel_id"], r.get("versie")
+                huidig = nieuw.get(pid)
+                if (verwacht is None and huidig is None) or (huidig and huidig["versie"] == verwacht):
+                    versie = huidig["versie"] + 1 if huidig else 1
+                    nieuw[pid] = {
+                        "perceel_id": pid,
+                        "versie": versie,
+                        "updated_at": nu,
+                        "perceel": json.loads(json.dumps(r["perceel"])),
+                    }
+                    versies[pid] = versie
+                    _journaal(pid, versie, r.get("journaal"))
+                else:
+                    conflicten.append({
+                        "perceel_id": pid,
+                        "perceel": huidig["perceel"] if huidig else None,
+                        "versie": huidig["versie"] if huidig else None,
+                    })
+
+            for r in verwijderd:
+                pid, verwacht = r["perceel_id"], r.get("versie")
+                huidig = nieuw.get(pid)
+                if huidig is None or verwacht is None or huidig["versie"] == verwacht:
+                    if nieuw.pop(pid, None) is not None:
+                        _journaal(pid, None, r.get("journaal"))
+                    weg.append(pid)
+                else:
+                    conflicten.append({"perceel_id": pid, "perceel": huidig["perceel"], "versie": huidig["versie"]})
+
+            vorige = (self._rijen, self._journaal, self._snapshots)
+            self._rijen, self._journaal = nieuw, self._journaal + regels
+            laatste = self._journaal[-1]["seq"] if self._journaal else 0
+            laatste_snapshot = self._snapshots[-1] if self._snapshots else {"seq": 0, "tijd": None}
+            if snapshot_nodig(laatste, laatste_snapshot["seq"], laatste_snapshot["tijd"], nu):
+                self._snapshots = self._snapshots + [{
+                    "seq": laatste,
+                    "tijd": nu,
+                    "percelen": json.loads(json.dumps([
+                        {"perceel_id": r["perceel_id"], "versie": r["versie"], "perceel": r["perceel"]}
+                        for r in nieuw.values()
+                    ])),
+                }]
+            try:
+                self._bewaar()
+            except Exception:
+                self._rijen, self._journaal, self._snapshots = vorige
+                raise
+
+        return {"versies": versies, "verwijderd": weg, "conflicten": json.loads(json.dumps(conflicten))}
+
+
+def maak_backend() -> OpslagBackend:
+    """Kies de backend op basis van PERCELEN_BACKEND (env of secrets)."""
+    soort = (instelling("PERCELEN_BACKEND") or "supabase").lower()
+    genormaliseerd = str(instelling("PERCELEN_GENORMALISEERD") or "").lower() in ("1", "true", "ja")
+
+    if soort == "sqlite":
+        return SQLiteBackend(instelling("PERCELEN_DB_PAD") or "percelen.db", genormaliseerd)
+    if soort == "json":
+        if genormaliseerd:
+            raise ValueError("PERCELEN_GENORMALISEERD wordt niet ondersteund door de json-backend")
+        return JSONBackend(instelling("PERCELEN_DB_PAD") or "percelen.json")
+    if soort != "supabase":
+        raise ValueError(f"Onbekende PERCELEN_BACKEND: {soort}")
+
+    # gedeelde client met connectiepool, timeouts en herhalen
+    from supabase_client import supabase_client
+
+    return SupabaseBackend(
+        supabase_client(), genormaliseerd, int(instelling("PERCELEN_PAGINAGROOTTE") or PAGINAGROOTTE)
+    )
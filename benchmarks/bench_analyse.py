@@ -0,0 +1,57 @@
+"""
+Meet de portfolio-analyse per perceel tegen de batchanalyse (financieel/).
+
+    python benchmarks/bench_analyse.py --aantal 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from demo_data import genereer_percelen  # noqa: E402
+from financieel import (  # noqa: E402
+    analyse_portfolio_batch,
+    analyse_portfolio_perceel,
+    analyse_verkocht_batch,
+    analyse_verkocht_perceel,
+)
+
+
+def _meet(label: str, fn, herhalingen: int = 5):
+    tijden = []
+    resultaat = None
+    for _ in range(herhalingen):
+        t0 = time.perf_counter()
+        resultaat = fn()
+        tijden.append(time.perf_counter() - t0)
+    print(f"{label:<40} min {min(tijden) * 1000:8.1f} ms   gem {sum(tijden) / len(tijden) * 1000:8.1f} ms")
+    return resultaat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--aantal", type=int, default=5000)
+    parser.add_argument("--koers", type=float, default=75.0)
+    parser.add_argument("--herhalingen", type=int, default=5)
+    args = parser.parse_args()
+
+    percelen = genereer_percelen(args.aantal, koers=args.koers)
+    print(f"{args.aantal} percelen\n")
+
+    los = _meet("portfolio per perceel", lambda: [
+        analyse_portfolio_perceel(p, 5.0, 3, args.koers) for p in percelen
+    ], args.herhalingen)
+    batch = _meet("portfolio batch", lambda: analyse_portfolio_batch(percelen, 5.0, 3, args.koers),
+                  args.herhalingen)
+    print(f"{'gelijk':<40} {los == batch}\n")
+
+    los = _meet("verkocht per perceel", lambda: [analyse_verkocht_perceel(p, args.koers) for p in percelen],
+                args.herhalingen)
+    batch = _meet("verkocht batch", lambda: analyse_verkocht_batch(percelen, args.koers), args.herhalingen)
+    print(f"{'gelijk':<40} {los == batch}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Meet load/save van DataStore tegen een lokale backend.
+
+    python benchmarks/bench_datastore.py --aantal 500 --backend sqlite
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import JSONBackend, SQLiteBackend  # noqa: E402
+from datastore import DataStore, PerceelTracker  # noqa: E402
+from demo_data import genereer_percelen  # noqa: E402
+
+
+def _meet(label: str, fn, herhalingen: int = 5):
+    tijden = []
+    resultaat = None
+    for _ in range(herhalingen):
+        t0 = time.perf_counter()
+        resultaat = fn()
+        tijden.append(time.perf_counter() - t0)
+    print(f"{label:<40} min {min(tijden) * 1000:8.1f} ms   gem {sum(tijden) / len(tijden) * 1000:8.1f} ms")
+    return resultaat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--aantal", type=int, default=500)
+    parser.add_argument("--backend", choices=["sqlite", "json"], default="sqlite")
+    args = parser.parse_args()
+
+    map_ = tempfile.mkdtemp(prefix="vastgoed_bench_")
+    pad = os.path.join(map_, f"percelen.{'db' if args.backend == 'sqlite' else 'json'}")
+    backend = SQLiteBackend(pad) if args.backend == "sqlite" else JSONBackend(pad)
+
+    percelen = genereer_percelen(args.aantal)
+    store = DataStore(backend)
+    store.save_percelen(percelen, tracker=PerceelTracker())
+    print(f"{args.aantal} percelen in {pad}\n")
+
+    _meet("load (koude cache)", lambda: DataStore(backend).load_percelen())
+    _meet("load (warme cache)", store.load_percelen)
+
+    tracker = PerceelTracker()
+    sessie = store.load_percelen(tracker=tracker)
+
+    def een_wijziging():
+        sessie[0]["status_updates"].append({"datum": "2026-01-01", "tekst": "bench"})
+        return store.save_percelen(sessie, tracker=tracker)
+
+    _meet("save (1 perceel gewijzigd)", een_wijziging)
+    _meet("save (niets gewijzigd)", lambda: store.save_percelen(sessie, tracker=tracker))
+
+
+if __name__ == "__main__":
+    main()
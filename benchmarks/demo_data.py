@@ -0,0 +1,69 @@
+"""Synthetische percelen voor benchmarks, loadtests en offline demo's."""
+import random
+from datetime import date, timedelta
+
+GEBIEDEN = ["Brikama, Sanyang", "Kombo, Tanji", "Serekunda, Bijilo", "Brikama, Gunjur", "Kombo, Farato"]
+FASEN = ["Aankoop", "Omzetting / bewerking", "Verkoop", "Verkocht"]
+RENTETYPES = ["maandelijks", "jaarlijks", "bij verkoop"]
+
+
+def genereer_percelen(aantal: int, seed: int = 42, koers: float = 75.0) -> list[dict]:
+    """Maak `aantal` percelen met dezelfde vorm als die uit Percelenbeheer."""
+    rnd = random.Random(seed)
+    percelen = []
+    for i in range(aantal):
+        gebied = rnd.choice(GEBIEDEN)
+        aankoop_eur = round(rnd.uniform(5_000, 80_000), 2)
+        aankoopdatum = date(2021, 1, 1) + timedelta(days=rnd.randint(0, 1500))
+        lat, lon = 13.2 + rnd.random() * 0.3, -16.8 + rnd.random() * 0.3
+        investeerders = []
+        for j in range(rnd.randint(0, 3)):
+            bedrag_eur = round(aankoop_eur * rnd.uniform(0.1, 0.4), 2)
+            investeerders.append({
+                "naam": f"Investeerder {rnd.randint(1, 40)}",
+                "bedrag": round(bedrag_eur * koers),
+                "bedrag_eur": bedrag_eur,
+                "rente": rnd.choice([0.0, 0.05, 0.08, 0.1]),
+                "winstdeling": rnd.choice([0.0, 0.1, 0.25]),
+                "rentetype": rnd.choice(RENTETYPES),
+            })
+        kosten = [
+            {"omschrijving": f"Kostenpost {k + 1}", "categorie": rnd.choice(["QG", "Extern"]),
+             "bedrag_eur": round(rnd.uniform(50, 2_000), 2)}
+            for k in range(rnd.randint(0, 6))
+        ]
+        verwachte_opbrengst = round(aankoop_eur * rnd.uniform(0.9, 2.5), 2)
+        verwachte_kosten = round(sum(k["bedrag_eur"] for k in kosten), 2)
+        fase = rnd.choice(FASEN)
+        perceel = {
+            "locatie": f"{gebied} {i + 1}",
+            "dealstage": fase,
+            "wordt_gesplitst": False,
+            "investeerders": investeerders,
+            "lengte": rnd.randint(15, 120),
+            "breedte": rnd.randint(15, 120),
+            "eigendomstype": "Geregistreerd land",
+            "polygon": [[lat, lon], [lat + 0.0005, lon], [lat + 0.0005, lon + 0.0005], [lat, lon + 0.0005]],
+            "uploads": {}, "uploads_urls": {},
+            "aankoopdatum": aankoopdatum.isoformat(),
+            "aankoopprijs": round(aankoop_eur * koers),
+            "aankoopprijs_eur": aankoop_eur,
+            "wisselkoers": koers,
+            "strategie": rnd.choice(["short_term", "hold", "split_sell"]),
+            "verwachte_opbrengst_eur": verwachte_opbrengst,
+            "verwachte_kosten_eur": verwachte_kosten,
+            "verwachte_winst_eur": round(verwachte_opbrengst - verwachte_kosten - aankoop_eur, 2),
+            "doorlooptijd": (aankoopdatum + timedelta(days=rnd.randint(180, 1800))).isoformat(),
+            "kosten_items": kosten,
+            "status_updates": [
+                {"datum": (aankoopdatum + timedelta(days=30 * k)).isoformat(), "tekst": f"Update {k + 1} " + "x" * 80}
+                for k in range(rnd.randint(0, 8))
+            ],
+        }
+        if fase == "Verkocht":
+            verkoop_eur = round(aankoop_eur * rnd.uniform(1.0, 2.2), 2)
+            perceel["verkoopdatum"] = (aankoopdatum + timedelta(days=rnd.randint(200, 1200))).isoformat()
+            perceel["verkoopprijs_eur"] = verkoop_eur
+            perceel["verkoopprijs"] = round(verkoop_eur * koers)
+        percelen.append(perceel)
+    return percelen
@@ -0,0 +1,253 @@
+"""
+Export van de portfolio naar Parquet, Excel of GeoJSON.
+
+De percelen komen als stroom uit `store.iter_percelen()` en worden per
+batch van BATCH percelen platgeslagen naar vaste tabellen: percelen (één
+rij per perceel) en investeerders, kosten_items en status_updates (één
+rij per element, met perceel_id en volgnr). Elke batch gaat direct naar
+het uitvoerbestand (Parquet: een row group per batch, Excel: write-only
+sheets, GeoJSON: feature voor feature); de hele set staat dus nooit als
+tabel naast de documenten in het geheugen.
+
+    python bulk_export.py parquet export/          # vier .parquet-bestanden
+    python bulk_export.py xlsx portfolio.xlsx
+    python bulk_export.py geojson percelen.geojson
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import zipfile
+
+from openpyxl import Workbook
+
+from datastore import store
+from logboek import logger, meet
+
+log = logger("bulk_export")
+
+# Percelen per batch (row group / schrijfmoment)
+BATCH = 500
+
+FORMATEN = ("parquet", "xlsx", "geojson")
+
+# Kolommen en type per tabel; vast, zodat elke batch hetzelfde schema heeft
+TABELLEN = {
+    "percelen": {
+        "perceel_id": "text", "locatie": "text", "dealstage": "text", "strategie": "text",
+        "eigendomstype": "text", "lengte": "numeric", "breedte": "numeric",
+        "aankoopdatum": "text", "verkoopdatum": "text", "start_verkooptraject": "text", "doorlooptijd": "text",
+        "aankoopprijs": "numeric", "aankoopprijs_eur": "numeric",
+        "verkoopprijs": "numeric", "verkoopprijs_eur": "numeric", "wisselkoers": "numeric",
+        "verwachte_opbrengst_eur": "numeric", "verwachte_kosten_eur": "numeric", "verwachte_winst_eur": "numeric",
+        "aantal_plots": "numeric", "wordt_gesplitst": "bool",
+        "aantal_investeerders": "int", "lat": "numeric", "lon": "numeric",
+    },
+    "investeerders": {
+        "perceel_id": "text", "volgnr": "int", "naam": "text", "bedrag": "numeric", "bedrag_eur": "numeric",
+        "rente": "numeric", "winstdeling": "numeric", "rentetype": "text",
+    },
+    "kosten_items": {
+        "perceel_id": "text", "volgnr": "int", "omschrijving": "text", "categorie": "text", "bedrag_eur": "numeric",
+    },
+    "status_updates": {
+        "perceel_id": "text", "volgnr": "int", "datum": "text", "tekst": "text",
+    },
+}
+
+_BEREKEND = {"perceel_id", "volgnr", "aantal_investeerders", "lat", "lon"}
+
+
+def _waarde(waarde, soort: str):
+    if waarde is None or waarde == "":
+        return None
+    try:
+        if soort == "numeric":
+            return float(waarde)
+        if soort == "int":
+            return int(waarde)
+        if soort == "bool":
+            return waarde if isinstance(waarde, bool) else str(waarde).lower() in ("1", "true", "ja")
+    except (TypeError, ValueError):
+        return None
+    return waarde if isinstance(waarde, str) else json.dumps(waarde, ensure_ascii=False, default=str)
+
+
+def _punten(perceel: dict) -> list[list[float]]:
+    """Geldige [lat, lon]-punten van de polygon."""
+    punten = []
+    for punt in perceel.get("polygon") or []:
+        try:
+            lat, lon = float(punt[0]), float(punt[1])
+        except (TypeError, ValueError, IndexError):
+            continue
+        if abs(lat) <= 90 and abs(lon) <= 180:
+            punten.append([lat, lon])
+    return punten
+
+
+def plat(perceel: dict) -> dict:
+    """Rijen per tabel voor één perceel."""
+    pid = perceel.get("perceel_id")
+    punten = _punten(perceel)
+    rij = {k: _waarde(perceel.get(k), soort) for k, soort in TABELLEN["percelen"].items() if k not in _BEREKEND}
+    rij.update({
+        "perceel_id": pid,
+        "aantal_investeerders": len([i for i in perceel.get("investeerders") or [] if isinstance(i, dict)]),
+        "lat": sum(p[0] for p in punten) / len(punten) if punten else None,
+        "lon": sum(p[1] for p in punten) / len(punten) if punten else None,
+    })
+
+    rijen = {"percelen": [rij]}
+    for veld in ("investeerders", "kosten_items", "status_updates"):
+        elementen = [e for e in perceel.get(veld) or [] if isinstance(e, dict)]
+        rijen[veld] = [
+            {"perceel_id": pid, "volgnr": nr,
+             **{k: _waarde(e.get(k), soort) for k, soort in TABELLEN[veld].items() if k not in _BEREKEND}}
+            for nr, e in enumerate(elementen, start=1)
+        ]
+    return rijen
+
+
+def batches(percelen, grootte: int = BATCH):
+    """(percelen, {tabel: rijen}) per `grootte` percelen."""
+    documenten, rijen = [], {t: [] for t in TABELLEN}
+    for perceel in percelen:
+        if not isinstance(perceel, dict):
+            continue
+        documenten.append(perceel)
+        for tabel, nieuw in plat(perceel).items():
+            rijen[tabel].extend(nieuw)
+        if len(documenten) >= grootte:
+            yield documenten, rijen
+            documenten, rijen = [], {t: [] for t in TABELLEN}
+    if documenten:
+        yield documenten, rijen
+
+
+def _parquet(percelen, map_: str, grootte: int) -> dict:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    typen = {"text": pa.string(), "numeric": pa.float64(), "int": pa.int64(), "bool": pa.bool_()}
+    schemas = {t: pa.schema([(k, typen[s]) for k, s in kol.items()]) for t, kol in TABELLEN.items()}
+    os.makedirs(map_, exist_ok=True)
+    schrijvers = {
+        t: pq.ParquetWriter(os.path.join(map_, f"{t}.parquet"), schemas[t], compression="zstd")
+        for t in TABELLEN
+    }
+    tellingen = {t: 0 for t in TABELLEN}
+    try:
+        for _documenten, rijen in batches(percelen, grootte):
+            for t, lijst in rijen.items():
+                if lijst:
+                    schrijvers[t].write_table(pa.Table.from_pylist(lijst, schema=schemas[t]))
+                    tellingen[t] += len(lijst)
+    finally:
+        for schrijver in schrijvers.values():
+            schrijver.close()
+    return tellingen
+
+
+def _xlsx(percelen, uit, grootte: int) -> dict:
+    boek = Workbook(write_only=True)
+    sheets = {}
+    for t, kolommen in TABELLEN.items():
+        sheets[t] = boek.create_sheet(t)
+        sheets[t].append(list(kolommen))
+    tellingen = {t: 0 for t in TABELLEN}
+    for _documenten, rijen in batches(percelen, grootte):
+        for t, lijst in rijen.items():
+            for rij in lijst:
+                sheets[t].append([rij[k] for k in TABELLEN[t]])
+            tellingen[t] += len(lijst)
+    boek.save(uit)
+    return tellingen
+
+
+def _geojson(percelen, uit, grootte: int) -> dict:
+    """FeatureCollection (lon/lat, ring gesloten) met de perceelkolommen als properties."""
+    tellingen = {"percelen": 0, "zonder_polygon": 0}
+    uit.write('{"type": "FeatureCollection", "features": [\n')
+    eerste = True
+    for documenten, rijen in batches(percelen, grootte):
+        for perceel, properties in zip(documenten, rijen["percelen"]):
+            ring = [[lon, lat] for lat, lon in _punten(perceel)]
+            if len(ring) >= 3:
+                if ring[0] != ring[-1]:
+                    ring.append(ring[0])
+                geometrie = {"type": "Polygon", "coordinates": [ring]}
+            else:
+                geometrie = None
+                tellingen["zonder_polygon"] += 1
+            feature = {"type": "Feature", "id": properties["perceel_id"], "geometry": geometrie,
+                       "properties": properties}
+            uit.write(("" if eerste else ",\n") + json.dumps(feature, ensure_ascii=False))
+            eerste = False
+            tellingen["percelen"] += 1
+    uit.write("\n]}\n")
+    return tellingen
+
+
+def exporteer(formaat: str, uit, percelen=None, grootte: int = BATCH) -> dict:
+    """
+    Schrijf de portfolio naar `uit`: een pad (parquet: een map) of een
+    binair bestandsobject (parquet: een zip met de vier bestanden).
+    Zonder `percelen` wordt `store.iter_percelen()` gebruikt. Returnt het
+    aantal rijen per tabel.
+    """
+    if formaat not in FORMATEN:
+        raise ValueError(f"Onbekend formaat: {formaat}")
+    percelen = store.iter_percelen() if percelen is None else percelen
+
+    with meet(log, "export", formaat=formaat) as velden:
+        if formaat == "parquet":
+            if isinstance(uit, (str, os.PathLike)):
+                tellingen = _parquet(percelen, uit, grootte)
+            else:
+                with tempfile.TemporaryDirectory(prefix="vastgoed_export_") as map_:
+                    tellingen = _parquet(percelen, map_, grootte)
+                    with zipfile.ZipFile(uit, "w", zipfile.ZIP_STORED) as zf:
+                        for t in TABELLEN:
+                            zf.write(os.path.join(map_, f"{t}.parquet"), f"{t}.parquet")
+        elif formaat == "xlsx":
+            tellingen = _xlsx(percelen, uit, grootte)
+        elif isinstance(uit, (str, os.PathLike)):
+            with open(uit, "w", encoding="utf-8") as f:
+                tellingen = _geojson(percelen, f, grootte)
+        else:
+            tekst = io.TextIOWrapper(uit, encoding="utf-8", write_through=True)
+            tellingen = _geojson(percelen, tekst, grootte)
+            tekst.detach()
+        velden.update(tellingen)
+    return tellingen
+
+
+def export_bytes(formaat: str, percelen=None) -> tuple[bytes, str, str]:
+    """(inhoud, bestandsnaam, mime-type) voor een download."""
+    buffer = io.BytesIO()
+    exporteer(formaat, buffer, percelen)
+    naam, mime = {
+        "parquet": ("portfolio_parquet.zip", "application/zip"),
+        "xlsx": ("portfolio.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+        "geojson": ("percelen.geojson", "application/geo+json"),
+    }[formaat]
+    return buffer.getvalue(), naam, mime
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("formaat", choices=FORMATEN)
+    parser.add_argument("uit", help="map (parquet) of bestand")
+    parser.add_argument("--batch", type=int, default=BATCH)
+    args = parser.parse_args(argv)
+
+    tellingen = exporteer(args.formaat, args.uit, grootte=args.batch)
+    print(json.dumps(tellingen))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,374 @@
+"""
+Bulkimport van percelen uit CSV of Excel.
+
+Eén rij per perceel. Validatie en omrekening gaan per kolom (pandas/numpy),
+niet per rij: datums, EUR ↔ GMD met de wisselkoers en UTM → WGS84 voor alle
+hoekpunten in één pyproj-aanroep. Rijen met fouten worden overgeslagen en
+gemeld (rij, kolom, fout); de rest wordt in batches van CHUNK percelen via
+DataStore weggeschreven (met journaalregels, zoals elke opslag).
+
+Kolommen (kopjes zonder hoofdletters/spaties-gevoeligheid):
+
+- locatie (verplicht), lengte, breedte
+- aankoopdatum (verplicht), verkoopdatum, start_verkooptraject, doorlooptijd
+- aankoopprijs_eur en/of aankoopprijs (GMD); idem verkoopprijs(_eur)
+- wisselkoers (per rij; anders de opgegeven koers)
+- dealstage, strategie, eigendomstype, verwachte_opbrengst_eur, status
+- investeerder, investeerder_bedrag_eur, investeerder_rente (%),
+  investeerder_winstdeling (%), investeerder_rentetype
+- x1/y1 … xN/yN: hoekpunten, UTM zone 28N (EPSG:32628) of lon/lat
+
+    python bulk_import.py percelen.xlsx --wisselkoers 75 --dry-run
+"""
+import argparse
+import json
+import logging
+import re
+import sys
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from pyproj import Transformer
+
+from datastore import DataStore, PerceelTracker, perceel_json, store, zorg_voor_id
+from logboek import logger, gebeurtenis, meet
+
+log = logger("bulk_import")
+
+_ = st.session_state.get("_", lambda x: x)
+
+# Percelen per schrijfbatch
+CHUNK = 500
+
+# Minimaal aantal hoekpunten (zoals het invoerformulier)
+MIN_PUNTEN = 3
+
+UTM_CRS = "epsg:32628"
+
+# Datumnotaties naast ISO (Excel-cellen zijn al datums)
+DATUMNOTATIES = ("%d-%m-%Y", "%d/%m/%Y", "%d.%m.%Y")
+
+DATUMKOLOMMEN = ("aankoopdatum", "verkoopdatum", "start_verkooptraject", "doorlooptijd")
+BEDRAGKOLOMMEN = (
+    "lengte", "breedte", "aankoopprijs", "aankoopprijs_eur", "verkoopprijs", "verkoopprijs_eur",
+    "wisselkoers", "verwachte_opbrengst_eur",
+    "investeerder_bedrag_eur", "investeerder_rente", "investeerder_winstdeling",
+)
+TEKSTKOLOMMEN = (
+    "locatie", "dealstage", "strategie", "eigendomstype", "status",
+    "investeerder", "investeerder_rentetype",
+)
+
+_PUNT = re.compile(r"^([xy])(\d+)$")
+
+
+def lees_bestand(bron, naam: str | None = None) -> pd.DataFrame:
+    """CSV (`,` of `;`) of XLSX als DataFrame met genormaliseerde kolomnamen."""
+    naam = (naam or getattr(bron, "name", None) or str(bron)).lower()
+    if naam.endswith((".xlsx", ".xlsm", ".xls")):
+        df = pd.read_excel(bron, dtype=object, engine="openpyxl")
+    else:
+        df = pd.read_csv(bron, dtype=str, sep=None, engine="python", keep_default_na=False)
+    df.columns = [re.sub(r"\s+", "_", str(k).strip().lower()) for k in df.columns]
+    # lege regels onderaan een sheet
+    return df.replace("", np.nan).dropna(how="all").reset_index(drop=True)
+
+
+def _getallen(kolom: pd.Series) -> pd.Series:
+    """Numeriek; '12.500,50' en '12500,5' worden 12500.5 (een losse punt is een decimaalpunt)."""
+    tekst = kolom.astype("string").str.strip().str.replace(r"[\s€]", "", regex=True)
+    beide = tekst.str.contains(",", regex=False) & tekst.str.contains(".", regex=False)
+    tekst = tekst.mask(beide.fillna(False), tekst.str.replace(".", "", regex=False))
+    tekst = tekst.str.replace(",", ".", regex=False)
+    return pd.to_numeric(tekst, errors="coerce").astype("float64")
+
+
+def _datums(kolom: pd.Series) -> pd.Series:
+    """ISO-datums en de Europese notaties; wat niet lukt wordt NaT."""
+    if pd.api.types.is_datetime64_any_dtype(kolom):
+        return kolom.dt.normalize()
+    tekst = kolom.map(lambda v: v.isoformat() if isinstance(v, date) else v).astype("string").str.strip()
+    uitkomst = pd.to_datetime(tekst, format="ISO8601", errors="coerce")
+    for notatie in DATUMNOTATIES:
+        open_ = uitkomst.isna() & tekst.notna()
+        if not open_.any():
+            break
+        uitkomst = uitkomst.fillna(pd.to_datetime(tekst.where(open_), format=notatie, errors="coerce"))
+    return uitkomst.dt.normalize()
+
+
+def _iso(kolom: pd.Series) -> np.ndarray:
+    return kolom.dt.strftime("%Y-%m-%d").astype(object).where(kolom.notna(), None).to_numpy()
+
+
+def _gmd_eur(gmd: pd.Series, eur: pd.Series, koers: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """Vul ontbrekende GMD/EUR aan: GMD = round(EUR × koers), EUR = round(GMD / koers, 2)."""
+    eur = eur.fillna((gmd / koers).round(2))
+    gmd = gmd.fillna((eur * koers).round())
+    return gmd, eur
+
+
+def _polygonen(df: pd.DataFrame, coordinaten: str) -> tuple[list, np.ndarray]:
+    """
+    Polygon ([lat, lon]-paren) per rij en het aantal punten. UTM of lon/lat
+    per rij bij "auto" (UTM als een waarde buiten ±180 valt).
+    """
+    nummers = sorted({int(m.group(2)) for k in df.columns if (m := _PUNT.match(k))})
+    nummers = [n for n in nummers if f"x{n}" in df.columns and f"y{n}" in df.columns]
+    if not nummers:
+        return [[] for _r in range(len(df))], np.zeros(len(df), dtype=int)
+
+    x = np.column_stack([_getallen(df[f"x{n}"]).to_numpy() for n in nummers])
+    y = np.column_stack([_getallen(df[f"y{n}"]).to_numpy() for n in nummers])
+    geldig = ~(np.isnan(x) | np.isnan(y))
+
+    if coordinaten == "utm":
+        utm = np.ones(len(df), dtype=bool)
+    elif coordinaten == "latlon":
+        utm = np.zeros(len(df), dtype=bool)
+    else:
+        utm = np.where(geldig, np.maximum(np.abs(x), np.abs(y)), 0).max(axis=1) > 180
+
+    lat, lon = y.copy(), x.copy()
+    if utm.any():
+        transformer = Transformer.from_crs(UTM_CRS, "epsg:4326", always_xy=True)
+        blok = geldig & utm[:, None]
+        lon[blok], lat[blok] = transformer.transform(x[blok], y[blok])
+
+    geldig &= np.isfinite(lat) & np.isfinite(lon) & (np.abs(lat) <= 90) & (np.abs(lon) <= 180)
+    lat, lon = np.round(lat, 7).tolist(), np.round(lon, 7).tolist()
+    polygonen = [
+        [[la, lo] for la, lo, ok in zip(rij_lat, rij_lon, rij_ok) if ok]
+        for rij_lat, rij_lon, rij_ok in zip(lat, lon, geldig.tolist())
+    ]
+    return polygonen, geldig.sum(axis=1)
+
+
+def valideer(df: pd.DataFrame, wisselkoers: float | None, coordinaten: str = "auto",
+             bestaande_locaties=()) -> tuple[list[dict], pd.DataFrame]:
+    """
+    Zet de rijen om naar percelen in het formaat van Percelenbeheer.
+
+    Returnt (percelen, fouten); fouten heeft kolommen rij (1 = eerste
+    gegevensrij), kolom en fout. Rijen met een fout worden niet omgezet.
+    """
+    n = len(df)
+    fouten = []
+
+    def fout(masker, kolom: str, tekst: str):
+        for i in np.flatnonzero(np.asarray(masker, dtype=bool)):
+            fouten.append({"rij": int(i) + 1, "kolom": kolom, "fout": tekst})
+
+    def kolom(naam: str) -> pd.Series:
+        return df[naam] if naam in df.columns else pd.Series([np.nan] * n, index=df.index, dtype=object)
+
+    tekst = {k: kolom(k).astype("string").str.strip().replace("", pd.NA) for k in TEKSTKOLOMMEN}
+    getal = {k: _getallen(kolom(k)) for k in BEDRAGKOLOMMEN}
+    datum = {k: _datums(kolom(k)) for k in DATUMKOLOMMEN}
+
+    for k, waarden in getal.items():
+        fout(waarden.isna() & kolom(k).notna(), k, _("geen getal"))
+        fout(waarden < 0, k, _("negatief"))
+    for k, waarden in datum.items():
+        fout(waarden.isna() & kolom(k).notna(), k, _("onbekende datum"))
+
+    locatie = tekst["locatie"]
+    fout(locatie.isna(), "locatie", _("ontbreekt"))
+    fout(locatie.duplicated(keep="first") & locatie.notna(), "locatie", _("dubbel in het bestand"))
+    fout(locatie.isin(set(bestaande_locaties)), "locatie", _("bestaat al"))
+    fout(datum["aankoopdatum"].isna() & kolom("aankoopdatum").isna(), "aankoopdatum", _("ontbreekt"))
+
+    koers = getal["wisselkoers"].fillna(wisselkoers if wisselkoers else np.nan)
+    aankoop_gmd, aankoop_eur = _gmd_eur(getal["aankoopprijs"], getal["aankoopprijs_eur"], koers)
+    verkoop_gmd, verkoop_eur = _gmd_eur(getal["verkoopprijs"], getal["verkoopprijs_eur"], koers)
+    fout(aankoop_eur.isna() | aankoop_gmd.isna(), "aankoopprijs_eur",
+         _("aankoopprijs ontbreekt of kan niet worden omgerekend (wisselkoers?)"))
+
+    investeerder = tekst["investeerder"]
+    inv_eur = getal["investeerder_bedrag_eur"]
+    fout(investeerder.notna() & ~(inv_eur > 0), "investeerder_bedrag_eur", _("bedrag ontbreekt"))
+    fout(investeerder.notna() & koers.isna(), "wisselkoers", _("ontbreekt voor het investeerdersbedrag"))
+    fout(getal["investeerder_rente"] > 100, "investeerder_rente", _("meer dan 100%"))
+    fout(getal["investeerder_winstdeling"] > 100, "investeerder_winstdeling", _("meer dan 100%"))
+
+    polygonen, punten = _polygonen(df, coordinaten)
+    fout(punten < MIN_PUNTEN, "polygon", _("minder dan {n} geldige hoekpunten").format(n=MIN_PUNTEN))
+
+    foute_rijen = {f["rij"] - 1 for f in fouten}
+    fouten_df = pd.DataFrame(fouten, columns=["rij", "kolom", "fout"]).sort_values(["rij", "kolom"], kind="stable")
+
+    # waarden per kolom als python-lijsten; de rijlus hieronder rekent niet meer
+    verkocht = verkoop_eur.notna() | datum["verkoopdatum"].notna()
+    dealstage = tekst["dealstage"].fillna(pd.Series(np.where(verkocht, _("Verkocht"), _("Aankoop")), index=df.index))
+    opbrengst = getal["verwachte_opbrengst_eur"].fillna(0.0)
+    kolommen = {
+        "locatie": locatie.to_numpy(dtype=object),
+        "dealstage": dealstage.to_numpy(dtype=object),
+        "strategie": tekst["strategie"].fillna(_("Nog onbekend")).to_numpy(dtype=object),
+        "eigendomstype": tekst["eigendomstype"].fillna(_("Geregistreerd land")).to_numpy(dtype=object),
+        "status": tekst["status"].to_numpy(dtype=object),
+        "lengte": getal["lengte"].fillna(0).tolist(),
+        "breedte": getal["breedte"].fillna(0).tolist(),
+        "aankoopdatum": _iso(datum["aankoopdatum"]),
+        "verkoopdatum": _iso(datum["verkoopdatum"]),
+        "start_verkooptraject": _iso(datum["start_verkooptraject"]),
+        "doorlooptijd": _iso(datum["doorlooptijd"]),
+        "aankoopprijs": aankoop_gmd.tolist(),
+        "aankoopprijs_eur": aankoop_eur.tolist(),
+        "verkoopprijs": verkoop_gmd.fillna(0).tolist(),
+        "verkoopprijs_eur": verkoop_eur.fillna(0.0).tolist(),
+        "wisselkoers": koers.tolist(),
+        "opbrengst": opbrengst.tolist(),
+        "winst": (opbrengst - aankoop_eur).round(2).tolist(),
+        "investeerder": investeerder.to_numpy(dtype=object),
+        "inv_eur": inv_eur.tolist(),
+        "inv_gmd": (inv_eur * koers).round().tolist(),
+        "inv_rente": (getal["investeerder_rente"].fillna(0) / 100).tolist(),
+        "inv_winst": (getal["investeerder_winstdeling"].fillna(0) / 100).tolist(),
+        "inv_rentetype": tekst["investeerder_rentetype"].fillna(_("bij verkoop")).to_numpy(dtype=object),
+    }
+
+    vandaag = date.today().isoformat()
+    percelen = []
+    for i in range(n):
+        if i in foute_rijen:
+            continue
+        k = {naam: waarden[i] for naam, waarden in kolommen.items()}
+        koers_i = k["wisselkoers"] if k["wisselkoers"] == k["wisselkoers"] else None
+        perceel = {
+            "locatie": k["locatie"],
+            "dealstage": k["dealstage"],
+            "wordt_gesplitst": False,
+            "investeerders": [{
+                "naam": k["investeerder"],
+                "bedrag": int(k["inv_gmd"]),
+                "bedrag_eur": k["inv_eur"],
+                "rente": k["inv_rente"],
+                "winstdeling": k["inv_winst"],
+                "rentetype": k["inv_rentetype"],
+            }] if k["investeerder"] is not pd.NA and k["investeerder"] is not None else [],
+            "lengte": k["lengte"],
+            "breedte": k["breedte"],
+            "eigendomstype": k["eigendomstype"],
+            "polygon": polygonen[i],
+            "uploads": {},
+            "uploads_urls": {},
+            "aankoopdatum": k["aankoopdatum"],
+            "verkoopdatum": k["verkoopdatum"],
+            "aankoopprijs": int(k["aankoopprijs"]),
+            "aankoopprijs_eur": k["aankoopprijs_eur"],
+            "wisselkoers": koers_i,
+            "verkoopprijs": int(k["verkoopprijs"]),
+            # in EUR opgegeven blijft staan; alleen uit GMD zonder koers blijft hij leeg
+            "verkoopprijs_eur": k["verkoopprijs_eur"] if k["verkoopprijs_eur"] or koers_i else None,
+            "strategie": k["strategie"],
+            "verwachte_opbrengst_eur": k["opbrengst"],
+            "verwachte_winst_eur": k["winst"],
+            "doorlooptijd": k["doorlooptijd"] or "",
+            "start_verkooptraject": k["start_verkooptraject"],
+            "status_updates": (
+                [{"datum": vandaag, "tekst": k["status"]}]
+                if k["status"] is not pd.NA and k["status"] is not None else []
+            ),
+            "status_toelichting": "",
+        }
+        zorg_voor_id(perceel)
+        percelen.append(perceel)
+
+    gebeurtenis(log, "gevalideerd", rijen=n, geldig=len(percelen), fouten=len(fouten_df))
+    return percelen, fouten_df
+
+
+class ImportOnderbroken(Exception):
+    """Een batch is mislukt; de percelen van de eerdere batches staan al in de opslag."""
+
+    def __init__(self, fout: Exception, totaal: dict):
+        self.totaal = totaal
+        self.percelen = totaal["percelen"]
+        super().__init__(f"Import afgebroken na {len(self.percelen)} percelen: {fout}")
+
+
+def importeer(percelen: list[dict], datastore: DataStore = store, tracker: PerceelTracker | None = None,
+              chunk: int = CHUNK, voortgang=None) -> dict:
+    """
+    Schrijf nieuwe percelen in batches van `chunk` weg. Met de tracker van
+    een sessie kent die de geïmporteerde versies meteen (de wijzigingsfeed
+    ziet ze dan niet als wijziging van een ander). `voortgang(klaar, totaal)`
+    wordt na elke batch aangeroepen.
+
+    Het totaal bevat de weggeschreven percelen (`percelen`, bij een
+    samengevoegd conflict het samengevoegde document) en de conflicten die
+    niet zijn opgeslagen (`onopgelost`). Mislukt een batch, dan volgt
+    ImportOnderbroken met het totaal tot dan toe: de aanroeper moet die
+    percelen in de sessie opnemen, anders ziet de tracker ze bij de
+    volgende opslag als verwijderd.
+    """
+    tracker = tracker if tracker is not None else PerceelTracker()
+    totaal = {"geschreven": 0, "bytes": 0, "batches": 0, "percelen": [], "onopgelost": []}
+    with meet(log, "import", percelen=len(percelen), chunk=chunk) as velden:
+        for start in range(0, len(percelen), chunk):
+            batch = [
+                {"perceel_id": zorg_voor_id(p), "perceel": p, "versie": None, "tekst": perceel_json(p)}
+                for p in percelen[start:start + chunk]
+            ]
+            try:
+                resultaat, samengevoegd, onopgelost = datastore.schrijf(batch, [], tracker)
+            except Exception as e:
+                velden.update(geschreven=totaal["geschreven"], batches=totaal["batches"])
+                raise ImportOnderbroken(e, totaal) from e
+            niet_opgeslagen = {c["perceel_id"] for c in onopgelost}
+            totaal["percelen"].extend(
+                samengevoegd.get(item["perceel_id"], item["perceel"])
+                for item in batch if item["perceel_id"] not in niet_opgeslagen
+            )
+            totaal["onopgelost"].extend(onopgelost)
+            totaal["geschreven"] += resultaat["geschreven"]
+            totaal["bytes"] += resultaat["bytes"]
+            totaal["batches"] += 1
+            if voortgang:
+                voortgang(start + len(batch), len(percelen))
+        velden.update(geschreven=totaal["geschreven"], bytes=totaal["bytes"], batches=totaal["batches"],
+                      onopgelost=len(totaal["onopgelost"]))
+    return totaal
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("bestand", help="CSV of XLSX")
+    parser.add_argument("--wisselkoers", type=float, default=None,
+                        help="EUR → GMD voor rijen zonder eigen koers (standaard: actuele koers)")
+    parser.add_argument("--coordinaten", choices=["auto", "utm", "latlon"], default="auto")
+    parser.add_argument("--chunk", type=int, default=CHUNK)
+    parser.add_argument("--dry-run", action="store_true", help="alleen valideren, niets opslaan")
+    args = parser.parse_args(argv)
+
+    koers = args.wisselkoers
+    if koers is None:
+        from utils import get_exchange_rate_eur_to_gmd
+        koers = get_exchange_rate_eur_to_gmd()
+
+    df = lees_bestand(args.bestand)
+    bestaande = [s.get("locatie") for s in store.load_samenvattingen()]
+    percelen, fouten = valideer(df, koers, args.coordinaten, bestaande)
+
+    for f in fouten.to_dict("records"):
+        print(f"rij {f['rij']:>6}  {f['kolom']:<24} {f['fout']}")
+    print(f"{len(df)} rijen: {len(percelen)} geldig, {fouten['rij'].nunique()} met fouten")
+
+    if args.dry_run or not percelen:
+        return 1 if len(fouten) else 0
+    try:
+        totaal = importeer(percelen, chunk=args.chunk)
+    except Exception as e:
+        gebeurtenis(log, "import_mislukt", logging.ERROR, fout=repr(e))
+        return 2
+    for c in totaal["onopgelost"]:
+        print(f"niet opgeslagen: {c.get('locatie') or c['perceel_id']} ({', '.join(c.get('velden') or [])})")
+    print(json.dumps({k: v for k, v in totaal.items() if k not in ("percelen", "onopgelost")}))
+    return 1 if len(fouten) or totaal["onopgelost"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,96 +1,820 @@
-from supabase import create_client
 import streamlit as st
-import traceback
+import hashlib
+import json
+import logging
+import uuid
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
 
+from backends import OpslagBackend, maak_backend, instelling, KINDTABELLEN, PAGINAGROOTTE, is_kindlijst
+from logboek import logger, gebeurtenis, meet, payload
+
+log = logger("datastore")
+
+# 🌐 vertalingen (zelfde fallback als utils)
+_ = st.session_state.get("_", lambda x: x)
+
+# Aantal keer dat na een versieconflict samengevoegd en opnieuw geschreven wordt
+MAX_MERGE_POGINGEN = 3
+
+# Aantal historische standen (as_of) dat in het geheugen blijft
+HISTORIE_CACHE = 8
+
+# Velden voor de perceelkeuze en de kaart (incl. popup)
+SAMENVATTING_VELDEN = (
+    "perceel_id", "locatie", "dealstage", "polygon", "aankoopdatum", "aankoopprijs",
+    "aankoopprijs_eur", "eigendomstype", "wordt_gesplitst", "investeerders", "uploads",
+    "uploads_urls", "strategie", "doorlooptijd", "verwachte_opbrengst_eur",
+    "verwachte_kosten_eur", "status_toelichting",
+)
+
+
+def _serialize(obj):
+    if isinstance(obj, date):
+        return obj.isoformat()
+    return obj
+
+
+def perceel_json(perceel: dict) -> str:
+    """Canonieke JSON van een perceel (gesorteerde sleutels, datums als ISO)."""
+    return json.dumps(perceel, sort_keys=True, ensure_ascii=False, default=_serialize)
+
+
+def perceel_hash(perceel: dict) -> str:
+    """Vingerafdruk van de inhoud van een perceel; gelijk bij identieke inhoud."""
+    return hashlib.sha1(perceel_json(perceel).encode("utf-8")).hexdigest()
+
+
+def zorg_voor_id(perceel: dict) -> str:
+    """Geef een perceel een stabiele sleutel (eenmalig) en return die."""
+    if not perceel.get("perceel_id"):
+        perceel["perceel_id"] = uuid.uuid4().hex
+    return perceel["perceel_id"]
 
-class DataStore:
-    def __init__(self):
-        print("=== Initialiseren Supabase ===")
 
-        print("SUPABASE URL:")
-        print(st.secrets["SUPABASE_URL"])
+def splits_kinderen(perceel: dict, basis: dict | None) -> tuple[dict, dict]:
+    """
+    Voor genormaliseerde opslag: het document zonder kindlijsten (lege lijst
+    als plaatshouder) en per kindtabel alleen de gewijzigde posities t.o.v.
+    `basis`, plus de nieuwe lengte. Ongewijzigde lijsten ontbreken.
+    """
+    ouder = dict(perceel)
+    kinderen = {}
+    for veld in KINDTABELLEN:
+        nieuw = perceel.get(veld)
+        oud = (basis or {}).get(veld)
+        nieuw = nieuw if is_kindlijst(nieuw) else []
+        oud = oud if is_kindlijst(oud) else []
+        if nieuw:
+            ouder[veld] = []
+        if nieuw == oud:
+            continue
+        kinderen[veld] = {
+            "lengte": len(nieuw),
+            "rijen": [
+                {"positie": i, "data": e}
+                for i, e in enumerate(nieuw)
+                if i >= len(oud) or oud[i] != e
+            ],
+        }
+    return ouder, kinderen
 
-        print("SUPABASE KEY (eerste 20 tekens):")
-        print(st.secrets["SUPABASE_ANON_KEY"][:20])
 
-        self.client = create_client(
-            st.secrets["SUPABASE_URL"],
-            st.secrets["SUPABASE_ANON_KEY"]
+def samenvatting(perceel: dict, versie: int | None = None) -> dict:
+    """Lichte weergave van een perceel: SAMENVATTING_VELDEN, investeerders alleen met naam."""
+    s = {v: perceel[v] for v in SAMENVATTING_VELDEN if v in perceel}
+    if isinstance(s.get("investeerders"), list):
+        s["investeerders"] = [
+            {"naam": i.get("naam")} if isinstance(i, dict) else i
+            for i in s["investeerders"]
+        ]
+    s["versie"] = versie
+    return s
+
+
+_ONTBREEKT = object()
+
+
+class OpslagConflict(Exception):
+    """Een of meer percelen zijn intussen door een andere sessie gewijzigd."""
+
+    def __init__(self, conflicten: list[dict]):
+        self.conflicten = conflicten
+        delen = []
+        for c in conflicten:
+            velden = ", ".join(c.get("velden") or []) or "—"
+            delen.append(f"{c.get('locatie') or c['perceel_id']} ({velden})")
+        super().__init__(
+            "Conflict bij opslaan: " + "; ".join(delen)
+            + ". Deze percelen zijn intussen door een andere gebruiker gewijzigd."
         )
 
-        print("Supabase client aangemaakt.\n")
 
-    def load_percelen(self):
-        try:
-            print("=== Laden percelen ===")
+def merge_velden(basis: dict, mijn: dict, hun: dict) -> tuple[dict, list[str]]:
+    """
+    Drieweg-merge per veld. Velden die alleen ik óf alleen de ander wijzigde
+    worden overgenomen; velden die beide anders wijzigden zijn conflicten
+    (daar blijft mijn waarde staan). Returnt (samengevoegd, conflictvelden).
+    """
+    samengevoegd = {}
+    conflicten = []
+    for veld in sorted(set(basis) | set(mijn) | set(hun)):
+        b = basis.get(veld, _ONTBREEKT)
+        m = mijn.get(veld, _ONTBREEKT)
+        h = hun.get(veld, _ONTBREEKT)
+        if m == h or h == b:
+            waarde = m
+        elif m == b:
+            waarde = h
+        else:
+            waarde = m
+            conflicten.append(veld)
+        if waarde is not _ONTBREEKT:
+            samengevoegd[veld] = waarde
+    return samengevoegd, conflicten
 
-            response = (
-                self.client
-                .table("percelen")
-                .select("perceel")
-                .execute()
-            )
 
-            print("Load succesvol.")
-            print(response.data)
+class PerceelTracker:
+    """
+    Houdt per perceel de vingerafdruk en versie bij zoals die geladen of
+    opgeslagen is.
 
-            if not response.data:
-                return []
+    Bij een save wordt de lijst één keer doorlopen: alleen percelen met een
+    afwijkende vingerafdruk worden (opnieuw) geserialiseerd en verstuurd,
+    samen met de versie waarop de wijziging gebaseerd is. De basistekst
+    wordt bewaard voor de veld-merge bij een conflict.
+    """
 
-            return [row["perceel"] for row in response.data]
+    def __init__(self):
+        # perceel_id → (hash, versie, json-tekst)
+        self._basis = {}
+        # de schrijfwachtrij werkt de basis bij vanuit een eigen thread
+        self._lock = threading.RLock()
+        # wordt meegeschreven in het wijzigingsjournaal
+        self.gebruiker = None
+        # vaste sleutel per sessie (id() wordt na opruimen hergebruikt)
+        self.sleutel = uuid.uuid4().hex
 
-        except Exception as e:
-            print("\n=== FOUT BIJ LOAD ===")
-            traceback.print_exc()
-            print(repr(e))
-            raise
+    def __len__(self):
+        return len(self._basis)
 
-    def save_percelen(self, percelen):
-        try:
-            print("\n=== SAVE START ===")
+    def registreer(self, percelen, versies: dict | None = None, teksten: dict | None = None):
+        """Leg de geladen staat vast; `teksten` (perceel_id → json) bespaart serialiseren."""
+        versies = versies or {}
+        teksten = teksten or {}
+        with self._lock:
+            self._basis = {}
+            for p in percelen:
+                if isinstance(p, dict) and p.get("perceel_id"):
+                    pid = p["perceel_id"]
+                    self.bevestig(pid, teksten.get(pid) or perceel_json(p), versies.get(pid))
 
-            print("Aantal percelen:")
-            print(len(percelen))
+    def bevestig(self, perceel_id: str, tekst: str, versie: int | None):
+        h = hashlib.sha1(tekst.encode("utf-8")).hexdigest()
+        with self._lock:
+            self._basis[perceel_id] = (h, versie, tekst)
 
-            print("DELETE uitvoeren...")
+    def herbevestig(self, percelen):
+        """
+        Leg de huidige inhoud van al bekende percelen vast als basis, met de
+        bekende versie (na normaliseren in de sessie, zodat ze niet als
+        gewijzigd gelden). Onbekende percelen blijven onbekend.
+        """
+        with self._lock:
+            for p in percelen:
+                if isinstance(p, dict) and p.get("perceel_id") in self._basis:
+                    self.bevestig(p["perceel_id"], perceel_json(p), self.versie(p["perceel_id"]))
 
-            delete_result = (
-                self.client
-                .table("percelen")
-                .delete()
-                .not_.is_("id", None)
-                .execute()
-            )
+    def vergeet(self, perceel_id: str):
+        with self._lock:
+            self._basis.pop(perceel_id, None)
+
+    def versie(self, perceel_id: str) -> int | None:
+        return self._basis.get(perceel_id, (None, None, None))[1]
+
+    def basis(self, perceel_id: str) -> dict | None:
+        """Inhoud van het perceel zoals laatst geladen/opgeslagen."""
+        item = self._basis.get(perceel_id)
+        return json.loads(item[2]) if item else None
+
+    def ongewijzigd(self, perceel: dict) -> bool:
+        """Is de sessiekopie gelijk aan de laatst geladen/opgeslagen inhoud?"""
+        item = self._basis.get(perceel.get("perceel_id"))
+        return item is not None and item[0] == hashlib.sha1(perceel_json(perceel).encode("utf-8")).hexdigest()
 
-            print("DELETE gelukt.")
-            print(delete_result)
+    def delta(self, percelen) -> dict:
+        """Bepaal gewijzigde en verwijderde percelen t.o.v. de laatste registratie."""
+        gewijzigd = []
+        aanwezig = set()
+        with self._lock:
+            basissen = dict(self._basis)
+        for perceel in percelen:
+            perceel_id = zorg_voor_id(perceel)
+            aanwezig.add(perceel_id)
+            tekst = perceel_json(perceel)
+            h = hashlib.sha1(tekst.encode("utf-8")).hexdigest()
+            basis = basissen.get(perceel_id)
+            if basis is None or basis[0] != h:
+                gewijzigd.append({
+                    "perceel_id": perceel_id,
+                    "perceel": json.loads(tekst),
+                    "versie": basis[1] if basis else None,
+                    "tekst": tekst,
+                })
+        verwijderd = [
+            {"perceel_id": pid, "versie": item[1]}
+            for pid, item in basissen.items()
+            if pid not in aanwezig
+        ]
+        return {"gewijzigd": gewijzigd, "verwijderd": verwijderd, "totaal": len(aanwezig)}
 
-            rows = [{"perceel": p} for p in percelen]
 
-            print(f"{len(rows)} records worden ingevoegd.")
+class PercelenCache:
+    """
+    Proces-brede kopie van de percelen-tabel: perceel_id → (versie, json-tekst).
 
-            if rows:
-                insert_result = (
-                    self.client
-                    .table("percelen")
-                    .insert(rows)
-                    .execute()
+    Wordt gedeeld door alle sessies van het proces. Geldig zolang de stempel
+    (aantal, versiesom, laatst gewijzigd) van de tabel niet veranderd is.
+    Optioneel wordt de kopie in een SQLite-bestand bewaard, zodat een
+    herstart van het proces niet met een volledige download begint.
+    """
+
+    def __init__(self, pad: str | None = None):
+        self._lock = threading.Lock()
+        self._rijen = {}
+        self._stempel = None
+        # perceel_id → (versie, samenvatting); alleen opnieuw bij een nieuwe versie
+        self._samenvattingen = {}
+        self._pad = pad
+        if pad:
+            self._laad_schijf()
+
+    @property
+    def leeg(self) -> bool:
+        return not self._rijen and self._stempel is None
+
+    def geldig(self, stempel: dict | None) -> bool:
+        return stempel is not None and self._stempel == stempel
+
+    def versies(self) -> dict:
+        with self._lock:
+            return {pid: rij[0] for pid, rij in self._rijen.items()}
+
+    def percelen(self) -> tuple[list, dict, dict]:
+        """
+        Nieuwe (onafhankelijke) dicts per aanroep; sessies mogen ze wijzigen.
+        Returnt (percelen, versies, teksten), beide laatste per perceel_id.
+        """
+        with self._lock:
+            rijen = list(self._rijen.items())
+        percelen = [json.loads(tekst) for _pid, (_versie, tekst) in rijen]
+        versies = {pid: versie for pid, (versie, _tekst) in rijen}
+        teksten = {pid: tekst for pid, (_versie, tekst) in rijen}
+        return percelen, versies, teksten
+
+    def rijen(self) -> list[tuple]:
+        """Momentopname van (perceel_id, versie, json-tekst), in volgorde."""
+        with self._lock:
+            return [(pid, versie, tekst) for pid, (versie, tekst) in self._rijen.items()]
+
+    def rij(self, perceel_id: str) -> tuple | None:
+        with self._lock:
+            return self._rijen.get(perceel_id)
+
+    def samenvattingen(self) -> list[dict]:
+        """Samenvatting per perceel; alleen percelen met een nieuwe versie worden opnieuw geparsed."""
+        with self._lock:
+            rijen = list(self._rijen.items())
+            resultaat = []
+            for pid, (versie, tekst) in rijen:
+                bekend = self._samenvattingen.get(pid)
+                if bekend is None or bekend[0] != versie:
+                    bekend = (versie, samenvatting(json.loads(tekst), versie))
+                    self._samenvattingen[pid] = bekend
+                resultaat.append(dict(bekend[1]))
+            for pid in set(self._samenvattingen) - set(self._rijen):
+                del self._samenvattingen[pid]
+        return resultaat
+
+    def zet(self, perceel_id: str, versie: int | None, tekst: str):
+        """Eén perceel bijwerken zonder de stempel te wijzigen."""
+        self.werk_bij({perceel_id: (versie, tekst)}, stempel=self._stempel)
+
+    def vervang(self, rijen: dict, stempel: dict | None):
+        with self._lock:
+            self._rijen = dict(rijen)
+            self._stempel = stempel
+        self._schrijf_schijf(volledig=True, gewijzigd=rijen)
+
+    def werk_bij(self, gewijzigd: dict, verwijderd=(), stempel: dict | None = None):
+        with self._lock:
+            self._rijen.update(gewijzigd)
+            for pid in verwijderd:
+                self._rijen.pop(pid, None)
+            self._stempel = stempel
+        self._schrijf_schijf(gewijzigd=gewijzigd, verwijderd=verwijderd)
+
+    # --- optionele kopie op schijf ---------------------------------------
+    def _verbind(self):
+        con = sqlite3.connect(self._pad)
+        con.execute("create table if not exists percelen (perceel_id text primary key, volgnr integer, versie integer, tekst text)")
+        con.execute("create table if not exists meta (sleutel text primary key, waarde text)")
+        return con
+
+    def _laad_schijf(self):
+        try:
+            with self._verbind() as con:
+                rijen = con.execute("select perceel_id, versie, tekst from percelen order by volgnr").fetchall()
+                meta = con.execute("select waarde from meta where sleutel = 'stempel'").fetchone()
+            self._rijen = {pid: (versie, tekst) for pid, versie, tekst in rijen}
+            self._stempel = json.loads(meta[0]) if meta else None
+        except sqlite3.Error as e:
+            gebeurtenis(log, "cachebestand_lezen", logging.WARNING, pad=self._pad, fout=repr(e))
+
+    def _schrijf_schijf(self, volledig=False, gewijzigd=None, verwijderd=()):
+        if not self._pad:
+            return
+        try:
+            with self._lock, self._verbind() as con:
+                if volledig:
+                    con.execute("delete from percelen")
+                volgorde = {pid: i for i, pid in enumerate(self._rijen)}
+                con.executemany(
+                    "insert or replace into percelen values (?, ?, ?, ?)",
+                    [(pid, volgorde.get(pid, 0), versie, tekst) for pid, (versie, tekst) in (gewijzigd or {}).items()],
+                )
+                con.executemany("delete from percelen where perceel_id = ?", [(pid,) for pid in verwijderd])
+                con.execute(
+                    "insert or replace into meta values ('stempel', ?)",
+                    (json.dumps(self._stempel),),
                 )
+        except sqlite3.Error as e:
+            gebeurtenis(log, "cachebestand_schrijven", logging.WARNING, pad=self._pad, fout=repr(e))
+
+
+def sessie_tracker() -> PerceelTracker:
+    """Tracker van de huidige Streamlit-sessie (één per sessie)."""
+    if "percelen_tracker" not in st.session_state:
+        st.session_state["percelen_tracker"] = PerceelTracker()
+    tracker = st.session_state["percelen_tracker"]
+    tracker.gebruiker = st.session_state.get("gebruiker")
+    return tracker
+
+
+class DataStore:
+    """
+    Laden en opslaan van percelen bovenop een OpslagBackend.
+
+    De backend wordt pas bij het eerste gebruik aangemaakt (zie
+    backends.maak_backend), zodat importeren geen verbinding of
+    credentials vereist.
+    """
+
+    def __init__(self, backend: OpslagBackend | None = None):
+        self._backend = backend
+
+        # proces-brede cache, optioneel met kopie op schijf
+        self._cache = PercelenCache(instelling("PERCELEN_CACHE_PAD"))
+
+        # (stempel, samenvattingen) zolang de cache nog leeg is
+        self._samenvattingen = None
+
+        # rijen per pagina bij volledig laden
+        self.paginagrootte = int(instelling("PERCELEN_PAGINAGROOTTE") or PAGINAGROOTTE)
+
+        # tijdgrens → json-tekst van een historische stand (verandert niet meer)
+        self._historie = {}
+
+    @property
+    def backend(self) -> OpslagBackend:
+        if self._backend is None:
+            self._backend = maak_backend()
+        return self._backend
 
-                print("INSERT gelukt.")
-                print(insert_result)
+    def load_percelen(self, tracker: PerceelTracker | None = None):
+        """
+        Laad alle percelen via de proces-brede cache (zie iter_percelen).
+        Alleen met een (sessie)tracker kunnen ze later worden opgeslagen.
+        """
+        return list(self.iter_percelen(tracker=tracker))
 
-            print("=== SAVE VOLTOOID ===")
+    def iter_percelen(self, paginagrootte: int | None = None, tracker: PerceelTracker | None = None):
+        """
+        Laad alle percelen als stroom: elk perceel wordt gegeven zodra zijn
+        pagina binnen is, zodat een aanroeper de sessie of een index kan
+        vullen zonder eerst de hele tabel in het geheugen te hebben.
+
+        Eerst wordt de stempel van de tabel opgevraagd (één kleine query).
+        Is die gelijk aan die van de cache, dan komt alles uit het geheugen.
+        Anders worden alleen de versies opgehaald en daarna alleen de
+        percelen waarvan de versie afwijkt; een lege cache wordt pagina
+        voor pagina (keyset op id, `paginagrootte` rijen) gevuld.
+        """
+        start = time.perf_counter()
+        velden = {"bron": None, "rijen": 0, "bytes": 0}
+        try:
+            stempel = self._stempel()
+
+            if self._cache.geldig(stempel):
+                velden["bron"] = "cache"
+                bron = self._cache.rijen()
+            elif self._cache.leeg:
+                velden["bron"] = "backend"
+                bron = self._stroom_naar_cache(stempel, paginagrootte or self.paginagrootte)
+            else:
+                velden["bron"] = "ververst"
+                self._ververs_cache(stempel)
+                bron = self._cache.rijen()
+
+            if tracker is not None:
+                tracker.registreer([])
+
+            for perceel_id, versie, tekst in bron:
+                perceel = json.loads(tekst)
+                if isinstance(perceel, dict) and tracker is not None:
+                    tracker.bevestig(perceel_id, tekst, versie)
+                velden["rijen"] += 1
+                velden["bytes"] += len(tekst.encode("utf-8"))
+                yield perceel
 
         except Exception as e:
-            print("\n==============================")
-            print("SUPABASE FOUT")
-            print("==============================")
-            traceback.print_exc()
-            print("\nException:")
-            print(repr(e))
-            print("==============================\n")
+            gebeurtenis(log, "load", logging.ERROR, exc_info=True, **velden, fout=repr(e),
+                        ms=round((time.perf_counter() - start) * 1000, 1))
             raise
+        # uit de cache gebeurt dit bij elke sessie/rerun: steekproef
+        gebeurtenis(log, "load", steekproef=velden["bron"] == "cache", **velden,
+                    ms=round((time.perf_counter() - start) * 1000, 1))
+
+    def _stempel(self) -> dict | None:
+        return self.backend.stempel()
+
+    def load_samenvattingen(self) -> list[dict]:
+        """
+        Samenvattingen (SAMENVATTING_VELDEN + versie) van alle percelen voor
+        de perceelkeuze en de kaart.
+
+        Met een gevulde cache komen ze daaruit (na dezelfde stempelcontrole
+        als load_percelen); alleen gewijzigde percelen worden opnieuw
+        opgehaald en geparsed. Zonder cache vraagt de backend alleen deze
+        velden op, zonder kosten_items, status_updates, v_plots enz.
+        """
+        with meet(log, "samenvattingen", steekproef=True) as velden:
+            stempel = self._stempel()
+
+            if not self._cache.leeg:
+                velden["bron"] = "cache"
+                if not self._cache.geldig(stempel):
+                    velden["bron"] = "ververst"
+                    self._ververs_cache(stempel)
+                lijst = self._cache.samenvattingen()
+                velden["rijen"] = len(lijst)
+                return lijst
+
+            velden["bron"] = "geheugen"
+            bekend = self._samenvattingen
+            if bekend is None or stempel is None or bekend[0] != stempel:
+                velden["bron"] = "backend"
+                rijen = self.backend.lees_samenvattingen(SAMENVATTING_VELDEN)
+                lijst = []
+                for row in rijen:
+                    row["perceel"]["perceel_id"] = row["perceel_id"]
+                    lijst.append(samenvatting(row["perceel"], row.get("versie")))
+                bekend = self._samenvattingen = (stempel, lijst)
+            velden["rijen"] = len(bekend[1])
+            return [dict(s) for s in bekend[1]]
+
+    def load_perceel(self, perceel_id: str, tracker: PerceelTracker | None = None) -> dict | None:
+        """
+        Laad één perceel volledig (bijv. het gekozen perceel in de
+        detailweergave) en leg het vast in de tracker, als die er is. Uit de
+        cache als die geldig is, anders één rij uit de backend.
+        """
+
+        with meet(log, "load_perceel", steekproef=True, perceel_id=perceel_id, bron="cache") as velden:
+            rij = self._cache.rij(perceel_id) if self._cache.geldig(self._stempel()) else None
+            if rij is None:
+                velden["bron"] = "backend"
+                rijen = self.backend.lees_rijen([perceel_id])
+                if not rijen:
+                    velden["rijen"] = 0
+                    return None
+                rij = self._cache_rij(rijen[0])
+                self._cache.zet(perceel_id, *rij)
+
+            versie, tekst = rij
+            velden.update(rijen=1, bytes=len(tekst.encode("utf-8")))
+            if tracker is not None:
+                tracker.bevestig(perceel_id, tekst, versie)
+            return json.loads(tekst)
+
+    @staticmethod
+    def _cache_rij(row: dict) -> tuple:
+        perceel = row["perceel"]
+        if isinstance(perceel, dict):
+            perceel["perceel_id"] = row["perceel_id"]
+        return row.get("versie"), perceel_json(perceel)
+
+    def _stroom_naar_cache(self, stempel, paginagrootte: int):
+        """Lees de tabel pagina voor pagina; de cache wordt gevuld als alles binnen is."""
+        rijen = {}
+        for nummer, pagina in enumerate(self.backend.lees_paginas(paginagrootte), 1):
+            gebeurtenis(log, "load_pagina", logging.DEBUG, pagina=nummer, rijen=len(pagina))
+            payload(log, "load_pagina_payload", pagina=nummer, rijen=pagina)
+            for row in pagina:
+                versie, tekst = self._cache_rij(row)
+                rijen[row["perceel_id"]] = (versie, tekst)
+                yield row["perceel_id"], versie, tekst
+
+        self._cache.vervang(rijen, stempel)
+
+    def _ververs_cache(self, stempel):
+        actueel = self.backend.lees_versies()
+        bekend = self._cache.versies()
+
+        te_laden = [pid for pid, versie in actueel.items() if bekend.get(pid) != versie]
+        verwijderd = [pid for pid in bekend if pid not in actueel]
+
+        gewijzigd = {}
+        if te_laden:
+            gewijzigd = {row["perceel_id"]: self._cache_rij(row) for row in self.backend.lees_rijen(te_laden)}
+
+        gebeurtenis(log, "cache_ververst", opgehaald=len(gewijzigd), verwijderd=len(verwijderd))
+        self._cache.werk_bij(gewijzigd, verwijderd, stempel)
+
+    def save_percelen(self, percelen, tracker: PerceelTracker):
+        """
+        Sla alleen de percelen op die sinds het laden (volgens de tracker)
+        gewijzigd of verwijderd zijn. De tracker is verplicht: wat niet in
+        `percelen` staat maar wel in de tracker, geldt als verwijderd, dus
+        een tracker mag niet tussen sessies worden gedeeld.
+
+        Schrijven gebeurt voorwaardelijk op versie. Heeft een andere sessie
+        een perceel intussen gewijzigd, dan worden de wijzigingen per veld
+        samengevoegd (het perceel in `percelen` wordt bijgewerkt) en opnieuw
+        weggeschreven. Lukt dat niet, dan volgt een OpslagConflict; alle
+        overige percelen zijn dan wel opgeslagen.
+        """
+        if tracker is None:
+            raise ValueError("save_percelen heeft de tracker nodig waarmee de percelen zijn geladen")
+        delta = tracker.delta(percelen)
+        index = {p["perceel_id"]: p for p in percelen if isinstance(p, dict)}
+
+        totaal, samengevoegd, onopgelost = self.schrijf(delta["gewijzigd"], delta["verwijderd"], tracker)
+
+        for perceel_id, doc in samengevoegd.items():
+            if perceel_id in index:
+                index[perceel_id].clear()
+                index[perceel_id].update(doc)
+
+        totaal["ongewijzigd"] = delta["totaal"] - len(delta["gewijzigd"])
+        if onopgelost:
+            raise OpslagConflict(onopgelost)
+        return totaal
+
+    def schrijf(self, gewijzigd: list[dict], verwijderd: list[dict], tracker: PerceelTracker):
+        """
+        Schrijf een delta ({perceel_id, perceel, versie, tekst} resp.
+        {perceel_id, versie}) weg, werk tracker en cache bij en voeg
+        conflicten per veld samen.
+
+        Returnt (totaal, samengevoegd, onopgelost): de tellingen, per
+        perceel_id het samengevoegde document (voor de sessie) en de
+        conflicten die niet samen te voegen waren.
+        """
+        totaal = {"geschreven": 0, "verwijderd": 0, "bytes": 0, "samengevoegd": 0}
+        samengevoegde_docs = {}
+        onopgelost = []
+
+        # basis per perceel: voor het journaal en (genormaliseerd) de kindrijen
+        for item in gewijzigd:
+            item.setdefault("basis", tracker.basis(item["perceel_id"]))
+        for item in verwijderd:
+            item.setdefault("basis", tracker.basis(item["perceel_id"]))
+        self._journaalregels(gewijzigd, verwijderd, tracker.gebruiker)
+
+        for _poging in range(MAX_MERGE_POGINGEN):
+            if not gewijzigd and not verwijderd:
+                break
+
+            resultaat = self.save_delta(gewijzigd, verwijderd)
+            for sleutel in ("geschreven", "verwijderd", "bytes"):
+                totaal[sleutel] += resultaat[sleutel]
+
+            geschreven = {}
+            for item in gewijzigd:
+                if item["perceel_id"] in resultaat["versies"]:
+                    versie = resultaat["versies"][item["perceel_id"]]
+                    tracker.bevestig(item["perceel_id"], item["tekst"], versie)
+                    geschreven[item["perceel_id"]] = (versie, item["tekst"])
+            for perceel_id in resultaat["verwijderd_ids"]:
+                tracker.vergeet(perceel_id)
+
+            # eigen writes direct in de cache; de stempel is daarmee onbekend,
+            # dus de volgende load controleert alleen nog de versies
+            self._cache.werk_bij(geschreven, resultaat["verwijderd_ids"], stempel=None)
+
+            mijn_items = {item["perceel_id"]: item for item in gewijzigd}
+            gewijzigd, verwijderd = [], []
+
+            for conflict in resultaat["conflicten"]:
+                perceel_id = conflict["perceel_id"]
+                hun = conflict.get("perceel")
+                item = mijn_items.get(perceel_id)
+                mijn = item["perceel"] if item else None
+
+                if mijn is None or hun is None:
+                    # verwijderd aan de ene kant, gewijzigd aan de andere
+                    onopgelost.append({
+                        "perceel_id": perceel_id,
+                        "locatie": (mijn or hun or {}).get("locatie"),
+                        "velden": [_("verwijderd")],
+                    })
+                    continue
+
+                basis = item["basis"] if "basis" in item else tracker.basis(perceel_id)
+                samengevoegd, velden = merge_velden(basis or {}, mijn, hun)
+                if velden:
+                    onopgelost.append({"perceel_id": perceel_id, "locatie": mijn.get("locatie"), "velden": velden})
+                    continue
+
+                samengevoegde_docs[perceel_id] = samengevoegd
+                totaal["samengevoegd"] += 1
+
+                tekst = perceel_json(samengevoegd)
+                if samengevoegd == hun:
+                    # mijn wijzigingen stonden er al: alleen de basis bijwerken
+                    tracker.bevestig(perceel_id, tekst, conflict.get("versie"))
+                else:
+                    gewijzigd.append({
+                        "perceel_id": perceel_id,
+                        "perceel": samengevoegd,
+                        "versie": conflict.get("versie"),
+                        "tekst": tekst,
+                        "basis": hun,
+                    })
+            self._journaalregels(gewijzigd, [], tracker.gebruiker)
+
+        return totaal, samengevoegde_docs, onopgelost
+
+    @staticmethod
+    def _journaalregels(gewijzigd, verwijderd, gebruiker):
+        """Patch + inverse t.o.v. de basis; de opslag schrijft ze mee in dezelfde transactie."""
+        from journaal import journaal_entry
+
+        for item in gewijzigd:
+            item["journaal"] = journaal_entry(item["perceel_id"], item.get("basis"), item["perceel"])
+            item["journaal"]["gebruiker"] = gebruiker
+        for item in verwijderd:
+            item["journaal"] = journaal_entry(item["perceel_id"], item.get("basis"), None)
+            item["journaal"]["gebruiker"] = gebruiker
+
+    def wijzigingen_sinds(self, seq: int | None, terugkijken: int = 0) -> list[dict]:
+        """
+        Journaalregels na `seq` (en de `terugkijken` seq's daarvóór), oudste
+        eerst. Zonder seq alleen de laatste regel, als startpunt.
+        """
+        if seq is None:
+            return self.backend.lees_journaal(limiet=1, aflopend=True)
+        return self.backend.lees_journaal(na_seq=max(seq - terugkijken, 0))
+
+    def journaal(self, perceel_id: str | None = None, limiet: int = 50) -> list[dict]:
+        """Laatste journaalregels (nieuwste eerst), optioneel van één perceel."""
+        return self.backend.lees_journaal(perceel_id=perceel_id, limiet=limiet, aflopend=True)
+
+    def perceel_op(self, perceel_id: str, seq: int) -> dict | None:
+        """
+        Inhoud van een perceel direct na journaalregel `seq`: de huidige
+        inhoud met de inverse patches van alle latere regels teruggedraaid.
+        None als het perceel toen niet bestond.
+        """
+        from journaal import pas_patch_toe
+
+        rijen = self.backend.lees_rijen([perceel_id])
+        doc = rijen[0]["perceel"] if rijen else None
+        for regel in self.backend.lees_journaal(perceel_id=perceel_id, na_seq=seq, aflopend=True):
+            doc = pas_patch_toe(doc, regel["invers"])
+        return doc
+
+    def as_of(self, datum: date | datetime) -> list[dict]:
+        """
+        Alle percelen zoals ze waren aan het eind van `datum` (of op het
+        tijdstip, bij een datetime; zonder tijdzone = UTC).
+
+        Vanaf de laatste snapshot daarvóór worden alleen de journaalregels
+        tot `datum` vooruit toegepast. Zonder zo'n snapshot (datum vóór de
+        eerste) gaat het terug vanaf de huidige stand met de inverse patches.
+        """
+        from journaal import pas_patch_toe
+
+        if isinstance(datum, datetime):
+            grens = datum if datum.tzinfo else datum.replace(tzinfo=timezone.utc)
+        else:
+            grens = datetime.combine(datum + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+        sleutel = grens.astimezone(timezone.utc).isoformat()
+        if sleutel in self._historie:
+            return json.loads(self._historie[sleutel])
+
+        snapshot = self.backend.lees_snapshot(sleutel)
+        if snapshot is not None:
+            docs = {r["perceel_id"]: r["perceel"] for r in snapshot["percelen"]}
+            for regel in self.backend.lees_journaal(na_seq=snapshot["seq"], voor_tijd=sleutel):
+                doc = pas_patch_toe(docs.get(regel["perceel_id"]), regel["patch"])
+                if doc is None:
+                    docs.pop(regel["perceel_id"], None)
+                else:
+                    docs[regel["perceel_id"]] = doc
+        else:
+            docs = {r["perceel_id"]: r["perceel"] for r in self.backend.lees_rijen()}
+            for regel in self.backend.lees_journaal(vanaf_tijd=sleutel, aflopend=True):
+                doc = pas_patch_toe(docs.get(regel["perceel_id"]), regel["invers"])
+                if doc is None:
+                    docs.pop(regel["perceel_id"], None)
+                else:
+                    docs[regel["perceel_id"]] = doc
+
+        percelen = list(docs.values())
+        tekst = json.dumps(percelen, ensure_ascii=False)
+        if grens <= datetime.now(timezone.utc):
+            # alleen het verleden ligt vast
+            self._historie[sleutel] = tekst
+            while len(self._historie) > HISTORIE_CACHE:
+                self._historie.pop(next(iter(self._historie)))
+        return json.loads(tekst)
+
+    def save_delta(self, gewijzigd: list[dict], verwijderd: list[dict]) -> dict:
+        """
+        Schrijf upserts en verwijderingen in één transactie weg (bij
+        Supabase de rpc percelen_opslaan), voorwaardelijk op de meegegeven
+        versie. Andere
+        sessies zien nooit een half weggeschreven portfolio.
+
+        Returnt een samenvatting met de nieuwe versies, de verwijderde ids en
+        de conflicten (perceel_id, actuele inhoud en versie).
+
+        Bij een genormaliseerde backend gaan alleen de gewijzigde kindrijen
+        mee (t.o.v. `basis` van het item; zonder basis alle rijen).
+        """
+        with meet(log, "save", backend=self.backend.naam) as velden:
+            rows = []
+            for item in gewijzigd:
+                row = {"perceel_id": item["perceel_id"], "perceel": item["perceel"], "versie": item.get("versie")}
+                if self.backend.genormaliseerd:
+                    row["perceel"], row["kinderen"] = splits_kinderen(item["perceel"], item.get("basis"))
+                if item.get("journaal"):
+                    row["journaal"] = item["journaal"]
+                rows.append(row)
+            weg = [
+                {k: item[k] for k in ("perceel_id", "versie", "journaal") if k in item}
+                for item in verwijderd
+            ]
+            payload_bytes = len(json.dumps(rows + weg, ensure_ascii=False).encode("utf-8")) if rows or weg else 0
+
+            payload(log, "save_payload", upserts=rows, verwijderd=weg)
+
+            data = {}
+            if rows or weg:
+                data = self.backend.opslaan(rows, weg)
+
+            resultaat = {
+                "geschreven": len(data.get("versies") or {}),
+                "verwijderd": len(data.get("verwijderd") or []),
+                "bytes": payload_bytes,
+                "versies": data.get("versies") or {},
+                "verwijderd_ids": data.get("verwijderd") or [],
+                "conflicten": data.get("conflicten") or [],
+            }
+            velden.update(
+                rijen=len(rows) + len(weg),
+                geschreven=resultaat["geschreven"],
+                verwijderd=resultaat["verwijderd"],
+                bytes=payload_bytes,
+                conflicten=len(resultaat["conflicten"]),
+            )
+            return resultaat
+
+    def lees_kindrijen(self, veld: str, kolommen=None) -> list[dict]:
+        """
+        Projectie over alle percelen op één kindlijst (bijv. investeerders):
+        {perceel_id, positie, <kolommen>} per element. Genormaliseerd is dat
+        één query op de kindtabel; anders wordt het uit de geladen percelen
+        (via de cache) afgeleid.
+        """
+        if self.backend.genormaliseerd:
+            return self.backend.lees_kindrijen(veld, kolommen)
+
+        kolommen = list(kolommen or KINDTABELLEN[veld])
+        rijen = []
+        for perceel in self.iter_percelen():
+            lijst = perceel.get(veld) if isinstance(perceel, dict) else None
+            if not is_kindlijst(lijst):
+                continue
+            for positie, element in enumerate(lijst):
+                rij = {"perceel_id": perceel.get("perceel_id"), "positie": positie}
+                rij.update({k: element.get(k) for k in kolommen})
+                rijen.append(rij)
+        return rijen
 
 
 store = DataStore()
@@ -0,0 +1,26 @@
+"""
+Financiële rekenkern van de portfolio.
+
+Zonder Streamlit en zonder caches, zodat hij ook in workerprocessen,
+batchjobs en benchmarks bruikbaar is; de functies passen hun invoer niet
+aan. utils.py heeft de Streamlit-varianten (vertaling via `_`, memo).
+"""
+from financieel.analyse import (
+    analyse_portfolio_perceel,
+    analyse_verkocht_perceel,
+    build_rentebetalingen,
+    onvertaald,
+    renteopbouw,
+    veilig_getal,
+    verdeel_winst,
+)
+from financieel.batch import (
+    analyse_portfolio_batch,
+    analyse_verkocht_batch,
+    bereken_portfolio,
+    bereken_verkocht,
+)
+from financieel.gevoeligheid import gevoeligheidsgrid
+from financieel.kasstromen import kasstroomschema, rendementen, xirr
+from financieel.kpis import portfolio_kpis, splits_verkocht
+from financieel.scenario import kalibreer_fx, simuleer_portfolio
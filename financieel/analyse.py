@@ -0,0 +1,259 @@
+"""
+Analyse per perceel: rentebetalingen, portfolio- en verkoopanalyse en
+winstverdeling.
+
+Zuivere functies: geen Streamlit, geen cache en de invoer wordt niet
+aangepast. Teksten voor de gebruiker (namen, kolomkoppen) gaan door
+`vertaal`; de rentetypes worden altijd op hun Nederlandse naam vergeleken.
+"""
+from datetime import date
+from typing import Callable
+
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+Vertaal = Callable[[str], str]
+
+
+def onvertaald(tekst: str) -> str:
+    """Standaard voor `vertaal`: de Nederlandse tekst zelf."""
+    return tekst
+
+
+def veilig_getal(v, default=0.0) -> float:
+    """float(v), of `default` als dat niet lukt."""
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return default
+
+
+def renteopbouw(bedrag: float, rente: float, rentetype: str, maanden: float) -> float:
+    """Opgebouwde rente over `maanden` maanden voor één investeerder."""
+    if rentetype == "maandelijks":
+        return bedrag * ((1 + rente / 12) ** maanden - 1)
+    if rentetype == "jaarlijks":
+        return bedrag * ((1 + rente) ** (maanden / 12) - 1)
+    if rentetype == "bij verkoop":
+        return bedrag * rente
+    return 0.0
+
+
+def build_rentebetalingen(percelen: list[dict], today: date | None = None, vertaal: Vertaal = onvertaald) -> pd.DataFrame:
+    """Volgende rentebetaling en opgebouwde rente per investeerder met maandelijkse/jaarlijkse rente."""
+    if today is None:
+        today = date.today()
+    rows = []
+    for perceel in percelen or []:
+        locatie = perceel.get("locatie", vertaal("Onbekend"))
+        aankoopdatum = pd.to_datetime(perceel.get("aankoopdatum", ""), errors="coerce")
+        if pd.isna(aankoopdatum):
+            aankoopdatum = pd.Timestamp(today)
+        aankoopdatum_date = aankoopdatum.date()
+        for inv in (perceel.get("investeerders") or []):
+            naam = (inv or {}).get("naam", vertaal("Investeerder"))
+            bedrag_eur = float((inv or {}).get("bedrag_eur", 0.0) or 0.0)
+            rente = float((inv or {}).get("rente", 0.0) or 0.0)
+            rentetype = str((inv or {}).get("rentetype", "bij verkoop")).lower()
+            if rente <= 0 or rentetype not in ("maandelijks", "jaarlijks"):
+                continue
+            if rentetype == "maandelijks":
+                maanden = (today.year - aankoopdatum_date.year) * 12 + (today.month - aankoopdatum_date.month)
+                maanden = max(maanden, 0)
+                opgebouwde = bedrag_eur * (rente / 12) * maanden
+                volgende = aankoopdatum_date + relativedelta(months=maanden + 1)
+                volgende_bedrag = bedrag_eur * rente / 12
+            else:
+                jaren = max(today.year - aankoopdatum_date.year, 0)
+                opgebouwde = bedrag_eur * rente * jaren
+                volgende = aankoopdatum_date + relativedelta(years=jaren + 1)
+                volgende_bedrag = bedrag_eur * rente
+            rows.append({
+                vertaal("Perceel"): locatie,
+                vertaal("Investeerder"): naam,
+                vertaal("Rentetype"): rentetype,
+                vertaal("Startdatum"): aankoopdatum_date.strftime("%d-%m-%Y"),
+                vertaal("Volgende betaling"): volgende.strftime("%d-%m-%Y"),
+                vertaal("Bedrag volgende betaling (€)"): round(volgende_bedrag, 2),
+                vertaal("Opgebouwde rente tot nu (€)"): round(opgebouwde, 2),
+                "_volgende_sort": volgende,
+            })
+    df = pd.DataFrame(rows)
+    if not df.empty:
+        df = df.sort_values("_volgende_sort").drop(columns=["_volgende_sort"]).reset_index(drop=True)
+    return df
+
+
+def _investeerder(inv, standaard_rentetype: str, vertaal: Vertaal) -> tuple:
+    """(naam, bedrag, rente, winstdeling, rentetype) van één investeerder."""
+    if isinstance(inv, dict):
+        return (
+            inv.get("naam", vertaal("Investeerder")),
+            veilig_getal(inv.get("bedrag")),
+            veilig_getal(inv.get("rente")),
+            veilig_getal(inv.get("winstdeling")),
+            (inv.get("rentetype") or standaard_rentetype).lower(),
+        )
+    return str(inv), 0.0, 0.0, 0.0, "bij verkoop"
+
+
+def _investeerder_rijen(investeerders: list, maanden: float, waardestijging: float, exchange_rate: float,
+                        standaard_rentetype: str, vertaal: Vertaal) -> tuple[list[dict], float, float]:
+    """Rijen per investeerder plus totale inleg en rente."""
+    totaal_inleg = totaal_rente = 0.0
+    rijen = []
+    for inv in investeerders:
+        naam, bedrag, rente, winstdeling_pct, rentetype = _investeerder(inv, standaard_rentetype, vertaal)
+        rente_opbouw = renteopbouw(bedrag, rente, rentetype, maanden)
+        totaal_inleg += bedrag
+        totaal_rente += rente_opbouw
+        winst_aandeel = waardestijging * winstdeling_pct
+        rijen.append({
+            "naam": naam,
+            "inleg": round(bedrag, 2),
+            "rente": round(rente_opbouw, 2),
+            "kapitaalkosten": round(bedrag + rente_opbouw, 2),
+            "kapitaalkosten_eur": round((bedrag + rente_opbouw) / exchange_rate, 2) if exchange_rate else None,
+            "rentetype": rentetype,
+            "winstdeling_pct": winstdeling_pct,
+            "winstdeling": round(winst_aandeel, 2),
+            "winst_eur": round(winst_aandeel / exchange_rate, 2) if exchange_rate else None,
+        })
+    return rijen, totaal_inleg, totaal_rente
+
+
+def analyse_portfolio_perceel(perceel: dict, groei_pct: float, horizon_jaren: int, exchange_rate: float,
+                              peildatum: date | None = None, vertaal: Vertaal = onvertaald) -> dict | None:
+    """
+    Verwachte uitkomst van een niet-verkocht perceel. Het deel van de
+    aankoopprijs dat niet door investeerders is ingelegd telt als
+    investeerder 'Eigen beheer' (100% winstdeling). None zonder geldige
+    aankoopdatum of aankoopprijs.
+    """
+    aankoopprijs = veilig_getal(perceel.get("aankoopprijs"))
+    aankoopdatum = pd.to_datetime(perceel.get("aankoopdatum"), errors="coerce")
+    if not pd.notnull(aankoopdatum) or aankoopprijs <= 0:
+        return None
+    investeerders = perceel.get("investeerders", [])
+    investeerders = list(investeerders) if isinstance(investeerders, list) else []
+    eigen_inleg = aankoopprijs - sum(veilig_getal(i.get("bedrag")) for i in investeerders if isinstance(i, dict))
+    if eigen_inleg > 0:
+        investeerders.append({
+            "naam": vertaal("Eigen beheer"),
+            "bedrag": eigen_inleg,
+            "rente": 0,
+            "rentetype": "bij verkoop",
+            "winstdeling": 1.0,
+        })
+
+    verkoopprijs_gmd = veilig_getal(perceel.get("verkoopprijs"))
+    verkoopprijs_eur = veilig_getal(perceel.get("verkoopprijs_eur"))
+    if verkoopprijs_gmd > 0:
+        verkoopwaarde = verkoopprijs_gmd
+    else:
+        verkoopwaarde = aankoopprijs * ((1 + groei_pct / 100) ** horizon_jaren)
+    if verkoopprijs_eur <= 0 and exchange_rate:
+        verkoopprijs_eur = round(verkoopwaarde / exchange_rate, 2)
+    vandaag = pd.Timestamp(peildatum) if peildatum else pd.Timestamp.today()
+    maanden = max((vandaag.year - aankoopdatum.year) * 12 + (vandaag.month - aankoopdatum.month), 1)
+
+    inv_rows, totaal_inleg, totaal_rente = _investeerder_rijen(
+        investeerders, maanden, max(0, verkoopwaarde - aankoopprijs), exchange_rate, "maandelijks", vertaal,
+    )
+    netto_winst = verkoopwaarde - totaal_inleg - totaal_rente
+    return {
+        "locatie": perceel.get("locatie"),
+        "verkoopprijs": round(verkoopwaarde, 2),
+        "verkoopprijs_eur": round(verkoopprijs_eur, 2) if verkoopprijs_eur else None,
+        "verkoopwaarde": round(verkoopwaarde, 2),
+        "verkoopwaarde_eur": round(verkoopwaarde / exchange_rate, 2) if exchange_rate else None,
+        "totaal_inleg": round(totaal_inleg, 2),
+        "totaal_rente": round(totaal_rente, 2),
+        "netto_winst": round(netto_winst, 2),
+        "netto_winst_eur": round(netto_winst / exchange_rate, 2) if exchange_rate else None,
+        "investeerders": inv_rows,
+    }
+
+
+def analyse_verkocht_perceel(perceel: dict, exchange_rate: float, vertaal: Vertaal = onvertaald) -> dict:
+    """Gerealiseerde uitkomst van een verkocht perceel; de aankoopprijs telt zelf als inleg."""
+    aankoopprijs = veilig_getal(perceel.get("aankoopprijs"))
+    verkoopprijs_gmd = veilig_getal(perceel.get("verkoopprijs"))
+    verkoopprijs_eur = veilig_getal(perceel.get("verkoopprijs_eur"))
+    aankoopdatum = pd.to_datetime(perceel.get("aankoopdatum"), errors="coerce")
+    verkoopdatum = pd.to_datetime(perceel.get("verkoopdatum"), errors="coerce")
+    investeerders = perceel.get("investeerders", [])
+    if not isinstance(investeerders, list):
+        investeerders = []
+    if verkoopprijs_eur <= 0 and exchange_rate:
+        verkoopprijs_eur = round(verkoopprijs_gmd / exchange_rate, 2)
+    maanden = 0
+    if pd.notnull(aankoopdatum) and pd.notnull(verkoopdatum):
+        maanden = max((verkoopdatum.year - aankoopdatum.year) * 12 + (verkoopdatum.month - aankoopdatum.month), 1)
+
+    inv_rows, inleg, totaal_rente = _investeerder_rijen(
+        investeerders, maanden, max(0, verkoopprijs_gmd - aankoopprijs), exchange_rate, "bij verkoop", vertaal,
+    )
+    totaal_inleg = aankoopprijs + inleg
+    netto_winst = verkoopprijs_gmd - totaal_inleg - totaal_rente
+    return {
+        "locatie": perceel.get("locatie"),
+        "verkoopprijs": round(verkoopprijs_gmd, 2),
+        "verkoopprijs_eur": round(verkoopprijs_eur, 2) if verkoopprijs_eur else None,
+        "verkoopwaarde": round(verkoopprijs_gmd, 2),
+        "verkoopwaarde_eur": round(verkoopprijs_eur, 2) if verkoopprijs_eur else None,
+        "totaal_inleg": round(totaal_inleg, 2),
+        "totaal_rente": round(totaal_rente, 2),
+        "netto_winst": round(netto_winst, 2),
+        "netto_winst_eur": round(netto_winst / exchange_rate, 2) if exchange_rate else None,
+        "investeerders": inv_rows,
+    }
+
+
+def verdeel_winst(perceel_row: dict | pd.Series) -> pd.DataFrame:
+    """Verwachte winst gelijk verdeeld over de maanden van start verkooptraject tot einddatum."""
+    def num(x, d=0.0):
+        try:
+            if x is None or (isinstance(x, float) and pd.isna(x)):
+                return d
+            return float(x)
+        except Exception:
+            return d
+    start_raw = perceel_row.get("start_verkooptraject") or perceel_row.get("aankoopdatum") or date.today()
+    einde_raw = perceel_row.get("doorlooptijd") or perceel_row.get("verkoopdatum")
+    start = pd.to_datetime(start_raw, errors="coerce")
+    einde = pd.to_datetime(einde_raw, errors="coerce")
+    if pd.isna(start) and not pd.isna(einde):
+        start = einde - relativedelta(months=1)
+    if pd.isna(start):
+        start = pd.Timestamp.today().normalize()
+    if pd.isna(einde) or einde < start:
+        einde = start + relativedelta(months=1)
+    opbrengst = num(perceel_row.get("totaal_opbrengst_eur")) or num(perceel_row.get("verwachte_opbrengst_eur"))
+    kosten = num(perceel_row.get("verwachte_kosten_eur"))
+    aankoop = num(perceel_row.get("aankoopprijs_eur"))
+    investering = aankoop + kosten
+    totaal_winst = opbrengst - kosten - aankoop
+    looptijd_jaren = max((einde.year - start.year) + (einde.month - start.month) / 12, 0.01)
+    winst_per_jaar = totaal_winst if looptijd_jaren < 0.5 else totaal_winst / looptijd_jaren
+    rendement_per_jaar_pct = (winst_per_jaar / investering * 100) if investering != 0 else 0.0
+    maanden = int(max((einde.year - start.year) * 12 + (einde.month - start.month) + 1, 1))
+    maand_winst = totaal_winst / maanden
+    rows = []
+    datum = start
+    for _idx in range(maanden):
+        rows.append({
+            "jaar": datum.year,
+            "maand": datum.month,
+            "winst_eur": maand_winst,
+            "looptijd_jaren": looptijd_jaren,
+            "opbrengst": opbrengst,
+            "kosten": kosten,
+            "aankoop": aankoop,
+            "investering": investering,
+            "winst_per_jaar": winst_per_jaar,
+            "rendement_per_jaar_pct": rendement_per_jaar_pct,
+        })
+        datum += relativedelta(months=1)
+    return pd.DataFrame(rows)
+
@@ -0,0 +1,265 @@
+"""
+Analyse van de hele portfolio in één keer.
+
+Zelfde uitkomsten als analyse_portfolio_perceel en analyse_verkocht_perceel
+(financieel.analyse), maar voor alle percelen tegelijk: de percelen en
+investeerders worden één keer naar NumPy-arrays gezet (investeerders met
+de positie van hun perceel), waarna renteopbouw, kapitaalkosten,
+winstdeling en de omrekening naar EUR per kolom worden berekend en per
+perceel opgeteld met np.bincount.
+
+`bereken_*` geeft twee DataFrames (per perceel en per investeerder);
+`analyse_*_batch` geeft per perceel hetzelfde dict als de losse functie.
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from financieel.analyse import Vertaal, onvertaald, veilig_getal
+
+# Renteverdeling: codes voor de rentetype-tekst (na lower())
+RENTETYPES = {"maandelijks": 1, "jaarlijks": 2, "bij verkoop": 3}
+
+
+def _lijst(percelen) -> list:
+    """Percelen uit een lijst of een PortfolioFrame."""
+    return list(getattr(percelen, "percelen", percelen) or [])
+
+
+def _maanden(van: pd.Series, tot) -> np.ndarray:
+    """Kalendermaanden tussen twee datums (zoals de losse analyse), NaN bij een ontbrekende datum."""
+    tot_maand = tot.year * 12 + tot.month if isinstance(tot, pd.Timestamp) else tot.dt.year * 12 + tot.dt.month
+    return np.asarray(tot_maand - (van.dt.year * 12 + van.dt.month), dtype="float64")
+
+
+def _investeerders(lijst: list, standaard_rentetype: str, vertaal: Vertaal,
+                   eigen_inleg: np.ndarray | None = None) -> dict:
+    """
+    Alle investeerders als kolommen, met `perceel` = positie in `lijst`.
+    Met `eigen_inleg` komt er per perceel met een positief bedrag een
+    regel 'Eigen beheer' bij (100% winstdeling), zoals in de losse analyse.
+    """
+    perceel, naam, bedrag, rente, winstdeling, rentetype = [], [], [], [], [], []
+    for i, p in enumerate(lijst):
+        investeerders = p.get("investeerders")
+        for inv in investeerders if isinstance(investeerders, list) else []:
+            perceel.append(i)
+            if isinstance(inv, dict):
+                naam.append(inv.get("naam", vertaal("Investeerder")))
+                bedrag.append(veilig_getal(inv.get("bedrag")))
+                rente.append(veilig_getal(inv.get("rente")))
+                winstdeling.append(veilig_getal(inv.get("winstdeling")))
+                rentetype.append((inv.get("rentetype") or standaard_rentetype).lower())
+            else:
+                naam.append(str(inv))
+                bedrag.append(0.0)
+                rente.append(0.0)
+                winstdeling.append(0.0)
+                rentetype.append("bij verkoop")
+
+    kolommen = {
+        "perceel": np.asarray(perceel, dtype="int64"),
+        "naam": np.asarray(naam, dtype=object),
+        "bedrag": np.asarray(bedrag, dtype="float64"),
+        "rente": np.asarray(rente, dtype="float64"),
+        "winstdeling": np.asarray(winstdeling, dtype="float64"),
+        "rentetype": np.asarray(rentetype, dtype=object),
+    }
+    if eigen_inleg is not None:
+        eigen = np.flatnonzero(eigen_inleg > 0)
+        kolommen = {
+            "perceel": np.concatenate([kolommen["perceel"], eigen]),
+            "naam": np.concatenate([kolommen["naam"], np.full(len(eigen), vertaal("Eigen beheer"), dtype=object)]),
+            "bedrag": np.concatenate([kolommen["bedrag"], eigen_inleg[eigen]]),
+            "rente": np.concatenate([kolommen["rente"], np.zeros(len(eigen))]),
+            "winstdeling": np.concatenate([kolommen["winstdeling"], np.ones(len(eigen))]),
+            "rentetype": np.concatenate([kolommen["rentetype"],
+                                         np.full(len(eigen), "bij verkoop", dtype=object)]),
+        }
+        # per perceel in invoervolgorde, eigen beheer als laatste (zoals append)
+        volgorde = np.argsort(kolommen["perceel"], kind="stable")
+        kolommen = {k: v[volgorde] for k, v in kolommen.items()}
+    return kolommen
+
+
+def _renteopbouw(inv: dict, maanden: np.ndarray) -> np.ndarray:
+    """Opgebouwde rente per investeerder; `maanden` per perceel."""
+    m = maanden[inv["perceel"]]
+    bedrag, rente = inv["bedrag"], inv["rente"]
+    code = np.array([RENTETYPES.get(t, 0) for t in inv["rentetype"]], dtype="int8")
+    with np.errstate(invalid="ignore", over="ignore"):
+        return np.select(
+            [code == 1, code == 2, code == 3],
+            [bedrag * ((1 + rente / 12) ** m - 1), bedrag * ((1 + rente) ** (m / 12) - 1), bedrag * rente],
+            0.0,
+        )
+
+
+def _per_investeerder(inv: dict, rente_opbouw: np.ndarray, waardestijging: np.ndarray,
+                      exchange_rate: float) -> pd.DataFrame:
+    kapitaal = inv["bedrag"] + rente_opbouw
+    winstdeling = waardestijging[inv["perceel"]] * inv["winstdeling"]
+    return pd.DataFrame({
+        "perceel": inv["perceel"],
+        "naam": inv["naam"],
+        "inleg": inv["bedrag"],
+        "rente": rente_opbouw,
+        "kapitaalkosten": kapitaal,
+        "kapitaalkosten_eur": kapitaal / exchange_rate if exchange_rate else np.nan,
+        "rentetype": inv["rentetype"],
+        "winstdeling_pct": inv["winstdeling"],
+        "winstdeling": winstdeling,
+        "winst_eur": winstdeling / exchange_rate if exchange_rate else np.nan,
+    })
+
+
+def _kolom(lijst: list, veld: str) -> np.ndarray:
+    return np.fromiter((veilig_getal(p.get(veld)) for p in lijst), dtype="float64", count=len(lijst))
+
+
+def _rond(waarden: np.ndarray) -> np.ndarray:
+    """round(x, 2) van Python (np.round wijkt bij ,xx5 soms een cent af)."""
+    return np.asarray([round(w, 2) for w in waarden.tolist()], dtype="float64")
+
+
+def _datum(lijst: list, veld: str) -> pd.Series:
+    return pd.to_datetime(pd.Series([p.get(veld) for p in lijst], dtype=object), errors="coerce", format="mixed")
+
+
+def bereken_portfolio(percelen, groei_pct: float, horizon_jaren: int, exchange_rate: float,
+                      peildatum: date | None = None, vertaal: Vertaal = onvertaald) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Niet-verkochte analyse voor alle percelen: (per perceel, per
+    investeerder). `geldig` is False waar de losse analyse None geeft.
+    """
+    lijst = [p for p in _lijst(percelen) if isinstance(p, dict)]
+    aankoop = _kolom(lijst, "aankoopprijs")
+    aankoopdatum = _datum(lijst, "aankoopdatum")
+    verkoop_gmd = _kolom(lijst, "verkoopprijs")
+    verkoop_eur = _kolom(lijst, "verkoopprijs_eur")
+
+    vandaag = pd.Timestamp(peildatum) if peildatum else pd.Timestamp.today()
+    maanden = np.maximum(_maanden(aankoopdatum, vandaag), 1)
+    verkoopwaarde = np.where(verkoop_gmd > 0, verkoop_gmd, aankoop * (1 + groei_pct / 100) ** horizon_jaren)
+    if exchange_rate:
+        verkoop_eur = np.where(verkoop_eur <= 0, _rond(verkoopwaarde / exchange_rate), verkoop_eur)
+
+    extern = np.zeros(len(lijst))
+    inv = _investeerders(lijst, "maandelijks", vertaal)
+    np.add.at(extern, inv["perceel"], inv["bedrag"])
+    inv = _investeerders(lijst, "maandelijks", vertaal, eigen_inleg=aankoop - extern)
+
+    rente_opbouw = _renteopbouw(inv, maanden)
+    totaal_inleg = np.bincount(inv["perceel"], weights=inv["bedrag"], minlength=len(lijst))
+    totaal_rente = np.bincount(inv["perceel"], weights=rente_opbouw, minlength=len(lijst))
+    waardestijging = np.maximum(0, verkoopwaarde - aankoop)
+    netto_winst = verkoopwaarde - totaal_inleg - totaal_rente
+
+    per_perceel = pd.DataFrame({
+        "locatie": [p.get("locatie") for p in lijst],
+        "geldig": aankoopdatum.notna().to_numpy() & (aankoop > 0),
+        "verkoopprijs": verkoopwaarde,
+        "verkoopprijs_eur": verkoop_eur,
+        "verkoopwaarde": verkoopwaarde,
+        "verkoopwaarde_eur": verkoopwaarde / exchange_rate if exchange_rate else np.nan,
+        "totaal_inleg": totaal_inleg,
+        "totaal_rente": totaal_rente,
+        "netto_winst": netto_winst,
+        "netto_winst_eur": netto_winst / exchange_rate if exchange_rate else np.nan,
+    })
+    return per_perceel, _per_investeerder(inv, rente_opbouw, waardestijging, exchange_rate)
+
+
+def bereken_verkocht(percelen, exchange_rate: float, vertaal: Vertaal = onvertaald) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Verkochte analyse voor alle percelen: (per perceel, per investeerder)."""
+    lijst = [p for p in _lijst(percelen) if isinstance(p, dict)]
+    aankoop = _kolom(lijst, "aankoopprijs")
+    verkoop_gmd = _kolom(lijst, "verkoopprijs")
+    verkoop_eur = _kolom(lijst, "verkoopprijs_eur")
+    aankoopdatum = _datum(lijst, "aankoopdatum")
+    verkoopdatum = _datum(lijst, "verkoopdatum")
+
+    if exchange_rate:
+        verkoop_eur = np.where(verkoop_eur <= 0, _rond(verkoop_gmd / exchange_rate), verkoop_eur)
+    maanden = _maanden(aankoopdatum, verkoopdatum)
+    maanden = np.where(np.isnan(maanden), 0, np.maximum(maanden, 1))
+
+    inv = _investeerders(lijst, "bij verkoop", vertaal)
+    rente_opbouw = _renteopbouw(inv, maanden)
+    # de aankoopprijs telt hier zelf als inleg
+    totaal_inleg = aankoop + np.bincount(inv["perceel"], weights=inv["bedrag"], minlength=len(lijst))
+    totaal_rente = np.bincount(inv["perceel"], weights=rente_opbouw, minlength=len(lijst))
+    waardestijging = np.maximum(0, verkoop_gmd - aankoop)
+    netto_winst = verkoop_gmd - totaal_inleg - totaal_rente
+
+    per_perceel = pd.DataFrame({
+        "locatie": [p.get("locatie") for p in lijst],
+        "geldig": np.ones(len(lijst), dtype=bool),
+        "verkoopprijs": verkoop_gmd,
+        "verkoopprijs_eur": verkoop_eur,
+        "verkoopwaarde": verkoop_gmd,
+        "verkoopwaarde_eur": np.where(verkoop_eur != 0, verkoop_eur, np.nan),
+        "totaal_inleg": totaal_inleg,
+        "totaal_rente": totaal_rente,
+        "netto_winst": netto_winst,
+        "netto_winst_eur": netto_winst / exchange_rate if exchange_rate else np.nan,
+    })
+    return per_perceel, _per_investeerder(inv, rente_opbouw, waardestijging, exchange_rate)
+
+
+def _bedrag(waarde, leeg_als_nul: bool = False):
+    """Afronden zoals de losse analyse; NaN (geen koers) wordt None."""
+    if waarde != waarde or (leeg_als_nul and not waarde):
+        return None
+    return round(waarde, 2)
+
+
+def _als_dicts(per_perceel: pd.DataFrame, per_inv: pd.DataFrame) -> list[dict | None]:
+    """Per perceel het dict van de losse analyse (None waar `geldig` False is)."""
+    inv_rijen = [[] for _i in range(len(per_perceel))]
+    for r in zip(*(per_inv[k].tolist() for k in (
+        "perceel", "naam", "inleg", "rente", "kapitaalkosten", "kapitaalkosten_eur",
+        "rentetype", "winstdeling_pct", "winstdeling", "winst_eur",
+    ))):
+        inv_rijen[r[0]].append({
+            "naam": r[1],
+            "inleg": round(r[2], 2),
+            "rente": round(r[3], 2),
+            "kapitaalkosten": round(r[4], 2),
+            "kapitaalkosten_eur": _bedrag(r[5]),
+            "rentetype": r[6],
+            "winstdeling_pct": r[7],
+            "winstdeling": round(r[8], 2),
+            "winst_eur": _bedrag(r[9]),
+        })
+
+    uitkomst = []
+    for i, r in enumerate(per_perceel.itertuples(index=False)):
+        if not r.geldig:
+            uitkomst.append(None)
+            continue
+        uitkomst.append({
+            "locatie": r.locatie,
+            "verkoopprijs": round(r.verkoopprijs, 2),
+            "verkoopprijs_eur": _bedrag(r.verkoopprijs_eur, leeg_als_nul=True),
+            "verkoopwaarde": round(r.verkoopwaarde, 2),
+            "verkoopwaarde_eur": _bedrag(r.verkoopwaarde_eur),
+            "totaal_inleg": round(r.totaal_inleg, 2),
+            "totaal_rente": round(r.totaal_rente, 2),
+            "netto_winst": round(r.netto_winst, 2),
+            "netto_winst_eur": _bedrag(r.netto_winst_eur),
+            "investeerders": inv_rijen[i],
+        })
+    return uitkomst
+
+
+def analyse_portfolio_batch(percelen, groei_pct: float, horizon_jaren: int, exchange_rate: float,
+                            peildatum: date | None = None, vertaal: Vertaal = onvertaald) -> list[dict | None]:
+    """analyse_portfolio_perceel voor elk perceel (zelfde volgorde)."""
+    return _als_dicts(*bereken_portfolio(percelen, groei_pct, horizon_jaren, exchange_rate, peildatum, vertaal))
+
+
+def analyse_verkocht_batch(percelen, exchange_rate: float, vertaal: Vertaal = onvertaald) -> list[dict]:
+    """analyse_verkocht_perceel voor elk perceel (zelfde volgorde)."""
+    return _als_dicts(*bereken_verkocht(percelen, exchange_rate, vertaal))
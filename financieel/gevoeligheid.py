@@ -0,0 +1,79 @@
+"""
+Gevoeligheid van de portfolio voor groei, horizon en een koersschok.
+
+Eén berekening over het volledige rooster groei × horizon × FX-schok:
+inleg en rente komen één keer uit bereken_portfolio, daarna zijn
+verkoopwaarde (groei × horizon × perceel), netto winst en de
+winstdeling per investeerder (via een matrix perceel → investeerder)
+gebroadcaste NumPy-operaties. De koersschok verschuift de EUR/GMD-koers
+bij verkoop met een percentage; bedragen in GMD veranderen daar niet door.
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from financieel.analyse import Vertaal, onvertaald, veilig_getal
+from financieel.batch import bereken_portfolio
+from financieel.kpis import splits_verkocht
+
+# Standaardrooster
+GROEI_PCTS = (0.0, 2.5, 5.0, 7.5, 10.0)
+HORIZONNEN = (1, 2, 3, 5, 7)
+FX_SCHOKKEN_PCT = (-20.0, -10.0, 0.0, 10.0, 20.0)
+
+
+def gevoeligheidsgrid(percelen, exchange_rate: float, groei_pcts=GROEI_PCTS, horizonnen=HORIZONNEN,
+                      fx_schokken_pct=FX_SCHOKKEN_PCT, peildatum: date | None = None,
+                      vertaal: Vertaal = onvertaald) -> dict:
+    """
+    Netto winst van de niet-verkochte percelen en de uitkering per
+    investeerder (inleg + rente + winstdeling, EUR) voor elke combinatie.
+    Returnt `portfolio` (lang: groei_pct, horizon_jaren, fx_schok_pct,
+    netto_winst_eur, verkoopwaarde_eur) en `investeerders` (lang, met naam
+    en uitkering_eur).
+    """
+    if not exchange_rate:
+        raise ValueError("Wisselkoers nodig voor een gevoeligheidsanalyse")
+    peil = pd.Timestamp(peildatum or date.today())
+    _verkocht, lijst = splits_verkocht(getattr(percelen, "percelen", percelen) or [], peil)
+    per_perceel, per_inv = bereken_portfolio(lijst, 0.0, 0, exchange_rate, peil.date(), vertaal)
+
+    geldig = per_perceel["geldig"].to_numpy()
+    aankoop = np.array([veilig_getal(p.get("aankoopprijs")) for p in lijst], dtype="float64")[geldig]
+    kosten = (per_perceel["totaal_inleg"] + per_perceel["totaal_rente"]).to_numpy()[geldig]
+    per_inv = per_inv[geldig[per_inv["perceel"].to_numpy()]] if len(per_inv) else per_inv
+    codes, namen = pd.factorize(per_inv["naam"], sort=True)
+    nieuw = np.cumsum(geldig) - 1
+
+    # winstdeling per (perceel, investeerder) en vaste kapitaalkosten per investeerder
+    aandeel = np.zeros((len(aankoop), len(namen)))
+    np.add.at(aandeel, (nieuw[per_inv["perceel"].to_numpy()], codes), per_inv["winstdeling_pct"].to_numpy())
+    kapitaal = np.bincount(codes, weights=per_inv["kapitaalkosten"].to_numpy(), minlength=len(namen))
+
+    groei = np.asarray(groei_pcts, dtype="float64")
+    horizon = np.asarray(horizonnen, dtype="float64")
+    schok = np.asarray(fx_schokken_pct, dtype="float64")
+    koers = exchange_rate * (1 + schok / 100)                                   # (x,)
+    factor = (1 + groei[:, None] / 100) ** horizon[None, :]                     # (g, h)
+    waarde = aankoop * factor[:, :, None]                                       # (g, h, n)
+    netto = (waarde - kosten).sum(axis=-1)                                      # (g, h)
+    stijging = np.maximum(0, waarde - aankoop)                                  # (g, h, n)
+    uitkering = kapitaal + stijging @ aandeel                                   # (g, h, k)
+
+    g, h, x = np.meshgrid(groei, horizon, schok, indexing="ij")
+    portfolio = pd.DataFrame({
+        "groei_pct": g.ravel(),
+        "horizon_jaren": h.ravel(),
+        "fx_schok_pct": x.ravel(),
+        "netto_winst_eur": (netto[:, :, None] / koers).ravel(),
+        "verkoopwaarde_eur": (waarde.sum(axis=-1)[:, :, None] / koers).ravel(),
+    })
+    investeerders = pd.DataFrame({
+        "naam": np.tile(np.asarray(namen, dtype=object), g.size),
+        "groei_pct": np.repeat(g.ravel(), len(namen)),
+        "horizon_jaren": np.repeat(h.ravel(), len(namen)),
+        "fx_schok_pct": np.repeat(x.ravel(), len(namen)),
+        "uitkering_eur": (uitkering[:, :, None, :] / koers[None, None, :, None]).ravel(),
+    })
+    return {"portfolio": portfolio.round(2), "investeerders": investeerders.round(2)}
@@ -0,0 +1,268 @@
+"""
+Gedateerde kasstromen van de portfolio en XIRR per perceel en investeerder.
+
+Het schema (één rij per kasstroom, EUR) bevat per perceel:
+- aankoop (aankoopdatum) en kosten (kosten_items, anders
+  verwachte_kosten_eur; de items hebben geen datum en staan op de
+  aankoopdatum);
+- opbrengst: de verkoopprijs op de verkoopdatum, of de verwachte opbrengst
+  op de einddatum; bij een perceel dat wordt gesplitst per maand verdeeld
+  van start verkooptraject tot einddatum (zoals verdeel_winst). Verkochte
+  plots uit v_plots met een bedrag en datum staan er als plotverkoop in;
+  de rest van de verwachte opbrengst wordt verdeeld zoals hierboven.
+
+En per investeerder (partij = naam): inleg op de aankoopdatum, rente als
+coupon (maandelijks / jaarlijks, enkelvoudig zoals in de rentebetalingen;
+bij verkoop in één keer op de einddatum), aflossing van de inleg en
+winstdeling (aandeel × max(0, opbrengst − aankoop)) op de einddatum.
+
+Couponreeksen worden met NumPy-maandrekenkunde uitgerold (einde maand
+wordt afgekapt, zoals relativedelta). `xirr` lost alle groepen tegelijk
+op: Newton over de hele vector, daarna bisectie voor de groepen die niet
+convergeren. Geen tekenwissel in de kasstromen geeft NaN.
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from financieel.analyse import veilig_getal
+
+KOLOMMEN = ("perceel", "perceel_id", "locatie", "partij", "datum", "soort", "bedrag_eur")
+
+# Partij voor de kasstromen van het perceel zelf
+PERCEEL = "perceel"
+
+# Velden in v_plots (sync vanuit Lovable/Supabase) met bedrag en datum van een verkochte plot
+PLOT_BEDRAG = ("prijs_eur", "price_eur", "verkoopprijs_eur", "sale_price_eur")
+PLOT_DATUM = ("verkocht_op", "sold_at", "verkoopdatum", "datum", "date")
+
+DAGEN_PER_JAAR = 365.0
+
+
+def plus_maanden(datums, maanden) -> np.ndarray:
+    """datum + n maanden (datetime64[D]); de dag wordt afgekapt op het einde van de maand."""
+    datums = np.asarray(datums, dtype="datetime64[D]")
+    maand = datums.astype("datetime64[M]")
+    dag = (datums - maand.astype("datetime64[D]")).astype("int64")
+    nieuw = maand + np.asarray(maanden, dtype="int64")
+    laatste = (nieuw + 1).astype("datetime64[D]") - 1
+    return np.minimum(nieuw.astype("datetime64[D]") + dag, laatste)
+
+
+def _maanden_tussen(van: np.datetime64, tot: np.datetime64) -> int:
+    return int(tot.astype("datetime64[M]").astype("int64") - van.astype("datetime64[M]").astype("int64"))
+
+
+def _datum(waarde) -> np.datetime64 | None:
+    d = pd.to_datetime(waarde, errors="coerce")
+    return None if pd.isna(d) else np.datetime64(d.date(), "D")
+
+
+def _eur(inv: dict, koers: float) -> float:
+    bedrag = veilig_getal(inv.get("bedrag_eur"))
+    if not bedrag and koers:
+        bedrag = veilig_getal(inv.get("bedrag")) / koers
+    return bedrag
+
+
+def _verkochte_plots(perceel: dict) -> list[tuple]:
+    """(datum, bedrag_eur) van verkochte plots met een bekend bedrag en datum."""
+    plots = []
+    for plot in perceel.get("v_plots") or []:
+        if not isinstance(plot, dict) or plot.get("status") != "sold":
+            continue
+        bedrag = next((veilig_getal(plot[k]) for k in PLOT_BEDRAG if veilig_getal(plot.get(k)) > 0), 0.0)
+        datum = next((d for d in (_datum(plot.get(k)) for k in PLOT_DATUM) if d is not None), None)
+        if bedrag > 0 and datum is not None:
+            plots.append((datum, bedrag))
+    return plots
+
+
+def _datums(lijst: list, veld: str) -> np.ndarray:
+    """Kolom datums (datetime64[D], NaT als onleesbaar) in één keer geparsed."""
+    waarden = pd.Series([p.get(veld) for p in lijst], dtype=object)
+    return pd.to_datetime(waarden, errors="coerce", format="mixed").dt.normalize().to_numpy(dtype="datetime64[D]")
+
+
+def kasstroomschema(percelen, vandaag: date | None = None) -> pd.DataFrame:
+    """Alle kasstromen (EUR) van de percelen, gesorteerd op datum; percelen zonder aankoopdatum vallen weg."""
+    vandaag = np.datetime64(vandaag or date.today(), "D")
+    lijst = [p for p in getattr(percelen, "percelen", percelen) or [] if isinstance(p, dict)]
+    aankoopdatums = _datums(lijst, "aankoopdatum")
+    verkoopdatums = _datums(lijst, "verkoopdatum")
+    einddatums = _datums(lijst, "doorlooptijd")
+    startdatums = _datums(lijst, "start_verkooptraject")
+
+    # losse kasstromen als rijen, couponreeksen e.d. als arrays
+    rijen = []
+    reeksen = []
+
+    for i, p in enumerate(lijst):
+        aankoopdatum = aankoopdatums[i]
+        if np.isnat(aankoopdatum):
+            continue
+        pid, loc = p.get("perceel_id"), p.get("locatie")
+        koers = veilig_getal(p.get("wisselkoers"))
+        aankoop = veilig_getal(p.get("aankoopprijs_eur")) or (
+            veilig_getal(p.get("aankoopprijs")) / koers if koers else 0.0)
+
+        verkoop = veilig_getal(p.get("verkoopprijs_eur")) or (
+            veilig_getal(p.get("verkoopprijs")) / koers if koers else 0.0)
+        verkoopdatum = verkoopdatums[i]
+        verkocht = verkoop > 0 and not np.isnat(verkoopdatum)
+        einde = verkoopdatum if verkocht else (einddatums[i] if not np.isnat(einddatums[i]) else verkoopdatum)
+        if np.isnat(einde) or einde <= aankoopdatum:
+            einde = max(vandaag, plus_maanden(aankoopdatum, 1)[()])
+
+        rijen.append((i, pid, loc, PERCEEL, aankoopdatum, "aankoop", -aankoop))
+        kosten = [veilig_getal(k.get("bedrag_eur")) for k in p.get("kosten_items") or [] if isinstance(k, dict)]
+        if not kosten and veilig_getal(p.get("verwachte_kosten_eur")):
+            kosten = [veilig_getal(p.get("verwachte_kosten_eur"))]
+        rijen.extend((i, pid, loc, PERCEEL, aankoopdatum, "kosten", -k) for k in kosten)
+
+        if verkocht:
+            opbrengst = verkoop
+            rijen.append((i, pid, loc, PERCEEL, verkoopdatum, "opbrengst", verkoop))
+        else:
+            opbrengst = veilig_getal(p.get("totaal_opbrengst_eur")) or veilig_getal(p.get("verwachte_opbrengst_eur"))
+            plots = _verkochte_plots(p)
+            rijen.extend((i, pid, loc, PERCEEL, d, "plotverkoop", b) for d, b in plots)
+            rest = max(0.0, opbrengst - sum(b for _d, b in plots))
+            if rest > 0 and p.get("wordt_gesplitst"):
+                start = startdatums[i] if not np.isnat(startdatums[i]) else aankoopdatum
+                start = min(start, einde)
+                n = max(_maanden_tussen(start, einde) + 1, 1)
+                maanden = plus_maanden(np.full(n, start), np.arange(n))
+                reeksen.append((i, pid, loc, PERCEEL, maanden, "opbrengst", rest / n))
+            elif rest > 0:
+                rijen.append((i, pid, loc, PERCEEL, einde, "opbrengst", rest))
+        waardestijging = max(0.0, opbrengst - aankoop)
+
+        looptijd = max(_maanden_tussen(aankoopdatum, einde), 0)
+        for inv in p.get("investeerders") or []:
+            if not isinstance(inv, dict):
+                continue
+            naam = inv.get("naam") or "Investeerder"
+            inleg = _eur(inv, koers)
+            rente = veilig_getal(inv.get("rente"))
+            rentetype = str(inv.get("rentetype") or "bij verkoop").lower()
+            rijen.append((i, pid, loc, naam, aankoopdatum, "inleg", -inleg))
+            if rente > 0 and rentetype == "maandelijks" and looptijd:
+                coupons = plus_maanden(np.full(looptijd, aankoopdatum), np.arange(1, looptijd + 1))
+                reeksen.append((i, pid, loc, naam, coupons, "rente", inleg * rente / 12))
+            elif rente > 0 and rentetype == "jaarlijks" and looptijd >= 12:
+                coupons = plus_maanden(np.full(looptijd // 12, aankoopdatum), np.arange(1, looptijd // 12 + 1) * 12)
+                reeksen.append((i, pid, loc, naam, coupons, "rente", inleg * rente))
+            elif rente > 0 and rentetype == "bij verkoop":
+                rijen.append((i, pid, loc, naam, einde, "rente", inleg * rente))
+            rijen.append((i, pid, loc, naam, einde, "aflossing", inleg))
+            winst = waardestijging * veilig_getal(inv.get("winstdeling"))
+            if winst:
+                rijen.append((i, pid, loc, naam, einde, "winstdeling", winst))
+
+    lengtes = np.array([1] * len(rijen) + [len(r[4]) for r in reeksen], dtype="int64")
+    alle = rijen + reeksen
+
+    def kolom(j, dtype=object):
+        return np.repeat(np.array([r[j] for r in alle], dtype=dtype), lengtes)
+
+    schema = pd.DataFrame({
+        "perceel": kolom(0, "int64"),
+        "perceel_id": kolom(1),
+        "locatie": kolom(2),
+        "partij": kolom(3),
+        "datum": np.concatenate([np.array([r[4] for r in rijen], dtype="datetime64[D]"), *(r[4] for r in reeksen)]),
+        "soort": kolom(5),
+        "bedrag_eur": kolom(6, "float64"),
+    }, columns=KOLOMMEN)
+    return schema.sort_values("datum", kind="stable").reset_index(drop=True)
+
+
+def xirr(groep: np.ndarray, datums: np.ndarray, bedragen: np.ndarray, iteraties: int = 50,
+         tolerantie: float = 1e-9) -> np.ndarray:
+    """
+    Jaarrendement (fractie) per groep 0..G-1 zodat de contante waarde van
+    de kasstromen 0 is (Act/365, zoals XIRR in Excel). NaN zonder
+    tekenwissel of zonder oplossing tussen -99% en 1000%.
+    """
+    groep = np.asarray(groep, dtype="int64")
+    bedragen = np.asarray(bedragen, dtype="float64")
+    n = int(groep.max()) + 1 if len(groep) else 0
+    datums = np.asarray(datums, dtype="datetime64[D]").astype("int64")
+    eerste = np.full(n, np.iinfo("int64").max)
+    np.minimum.at(eerste, groep, datums)
+    jaren = (datums - eerste[groep]) / DAGEN_PER_JAAR
+
+    def npv(r):
+        return np.bincount(groep, weights=bedragen * (1 + r[groep]) ** -jaren, minlength=n)
+
+    positief = np.bincount(groep, weights=(bedragen > 0), minlength=n) > 0
+    negatief = np.bincount(groep, weights=(bedragen < 0), minlength=n) > 0
+    oplosbaar = positief & negatief
+
+    # Newton voor alle groepen tegelijk
+    r = np.full(n, 0.1)
+    with np.errstate(all="ignore"):
+        for _i in range(iteraties):
+            korting = (1 + r[groep]) ** -jaren
+            f = np.bincount(groep, weights=bedragen * korting, minlength=n)
+            df = np.bincount(groep, weights=-jaren * bedragen * korting / (1 + r[groep]), minlength=n)
+            stap = np.where(df != 0, f / df, 0.0)
+            r = np.clip(r - np.nan_to_num(stap), -0.99, 10.0)
+            if np.all(np.abs(stap[oplosbaar]) < tolerantie):
+                break
+        klaar = oplosbaar & (np.abs(npv(r)) <= 1e-6 * np.maximum(1.0, np.bincount(
+            groep, weights=np.abs(bedragen), minlength=n)))
+
+        # bisectie voor de rest
+        open_ = oplosbaar & ~klaar
+        if open_.any():
+            laag, hoog = np.full(n, -0.99), np.full(n, 10.0)
+            f_laag = npv(laag)
+            open_ &= np.sign(f_laag) != np.sign(npv(hoog))
+            for _i in range(200):
+                midden = (laag + hoog) / 2
+                f_midden = npv(midden)
+                links = np.sign(f_midden) == np.sign(f_laag)
+                laag = np.where(links, midden, laag)
+                f_laag = np.where(links, f_midden, f_laag)
+                hoog = np.where(links, hoog, midden)
+            r = np.where(open_, (laag + hoog) / 2, r)
+            klaar |= open_
+    return np.where(klaar, r, np.nan)
+
+
+def rendementen(percelen, vandaag: date | None = None) -> dict:
+    """
+    Kasstroomschema plus XIRR (%) per perceel (alleen de kasstromen van het
+    perceel zelf), per investeerder per perceel en per investeerder over
+    alle percelen.
+    """
+    schema = kasstroomschema(percelen, vandaag)
+    datums = schema["datum"].to_numpy()
+    bedragen = schema["bedrag_eur"].to_numpy()
+
+    def per(masker: np.ndarray, kolommen: list[str], tonen: list[str]) -> pd.DataFrame:
+        """Totalen en XIRR per groep van `kolommen`; de uitkomst heeft de kolommen `tonen`."""
+        deel = schema[masker]
+        if deel.empty:
+            return pd.DataFrame(columns=[*tonen, "uit_eur", "in_eur", "xirr_pct"])
+        groepen = deel.groupby(kolommen, dropna=False)
+        codes = groepen.ngroup().to_numpy()
+        b = bedragen[masker]
+        uitkomst = groepen[tonen].first(skipna=False).reset_index(drop=True) if set(tonen) - set(kolommen) \
+            else groepen.size().reset_index()[tonen]
+        n = len(uitkomst)
+        uitkomst["uit_eur"] = np.bincount(codes, weights=np.minimum(b, 0), minlength=n).round(2)
+        uitkomst["in_eur"] = np.bincount(codes, weights=np.maximum(b, 0), minlength=n).round(2)
+        uitkomst["xirr_pct"] = (xirr(codes, datums[masker], b) * 100).round(2)
+        return uitkomst
+
+    eigen = (schema["partij"] == PERCEEL).to_numpy()
+    return {
+        "schema": schema,
+        "percelen": per(eigen, ["perceel"], ["perceel_id", "locatie"]),
+        "investeringen": per(~eigen, ["partij", "perceel"], ["partij", "perceel_id", "locatie"]),
+        "investeerders": per(~eigen, ["partij"], ["partij"]),
+    }
@@ -0,0 +1,56 @@
+"""KPI's van de portfolio op een peildatum."""
+from datetime import date
+
+import pandas as pd
+
+from financieel.analyse import veilig_getal
+from financieel.batch import analyse_portfolio_batch, analyse_verkocht_batch
+
+
+def splits_verkocht(percelen, peil: pd.Timestamp) -> tuple[list[dict], list[dict]]:
+    """
+    (verkocht, portfolio) op peildatum `peil`. Verkocht: verkoopprijs en een
+    verkoopdatum op of vóór de peildatum; de rest krijgt een kopie zonder
+    verkoopprijs (die was toen nog niet bekend).
+    """
+    verkocht, portfolio = [], []
+    for perceel in percelen:
+        if not isinstance(perceel, dict):
+            continue
+        verkoopdatum = pd.to_datetime(perceel.get("verkoopdatum"), errors="coerce")
+        if veilig_getal(perceel.get("verkoopprijs")) > 0 and pd.notnull(verkoopdatum) and verkoopdatum <= peil:
+            verkocht.append(perceel)
+        else:
+            portfolio.append({**perceel, "verkoopprijs": None, "verkoopprijs_eur": None})
+    return verkocht, portfolio
+
+
+def portfolio_kpis(percelen: list[dict], exchange_rate: float, peildatum: date | None = None,
+                   groei_pct: float = 5.0, horizon_jaren: int = 3) -> dict:
+    """
+    Totalen (EUR) over analyse_verkocht_perceel en analyse_portfolio_perceel,
+    met verkocht/portfolio volgens splits_verkocht.
+    """
+    peil = pd.Timestamp(peildatum or date.today())
+    kpis = {
+        "aantal": 0,
+        "aantal_verkocht": 0,
+        "verkoopwaarde_eur": 0.0,
+        "gerealiseerde_winst_eur": 0.0,
+        "verwachte_winst_eur": 0.0,
+    }
+    # per perceel verkocht of nog in portfolio; daarna één batchanalyse per groep
+    verkocht, portfolio = splits_verkocht(percelen, peil)
+
+    for analyse in analyse_verkocht_batch(verkocht, exchange_rate):
+        kpis["aantal_verkocht"] += 1
+        kpis["gerealiseerde_winst_eur"] += analyse["netto_winst_eur"] or 0.0
+        kpis["aantal"] += 1
+        kpis["verkoopwaarde_eur"] += analyse["verkoopwaarde_eur"] or 0.0
+    for analyse in analyse_portfolio_batch(portfolio, groei_pct, horizon_jaren, exchange_rate, peildatum=peil.date()):
+        if analyse is None:
+            continue
+        kpis["verwachte_winst_eur"] += analyse["netto_winst_eur"] or 0.0
+        kpis["aantal"] += 1
+        kpis["verkoopwaarde_eur"] += analyse["verkoopwaarde_eur"] or 0.0
+    return {k: round(v, 2) if isinstance(v, float) else v for k, v in kpis.items()}
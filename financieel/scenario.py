@@ -0,0 +1,129 @@
+"""
+Monte Carlo-scenario's voor groei, horizon en EUR/GMD-koers.
+
+Per pad worden een jaarlijkse groei (normaal rond `groei_pct`), een
+horizon (uniform rond `horizon_jaren`) en een koers bij verkoop
+(geometrische Brownse beweging, gekalibreerd op een koersreeks met
+`kalibreer_fx`) getrokken. Het rekenmodel is dat van
+analyse_portfolio_perceel: verkoopwaarde = aankoopprijs × (1 + groei) ^
+horizon (of de vaste verkoopprijs), renteopbouw tot de peildatum. Inleg
+en rente komen één keer uit bereken_portfolio; per pad verandert alleen
+de verkoopwaarde en de koers, dus alle paden gaan als één matrix
+(paden × percelen, per blok van BLOK percelen) door NumPy.
+
+Zonder spreiding (sd 0, spreiding 0, vol 0) is P50 gelijk aan de
+deterministische analyse.
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from financieel.analyse import Vertaal, onvertaald, veilig_getal
+from financieel.batch import bereken_portfolio
+
+PERCENTIELEN = (5, 50, 95)
+
+# Standaard aantal paden en percelen per rekenblok (geheugen: paden × BLOK)
+PADEN = 5000
+BLOK = 256
+
+
+def kalibreer_fx(koersen, dagen_per_jaar: int = 365) -> tuple[float, float]:
+    """(drift, volatiliteit) per jaar van de log-rendementen van een dagelijkse koersreeks."""
+    k = np.asarray([veilig_getal(x) for x in ([] if koersen is None else koersen)], dtype="float64")
+    k = k[k > 0]
+    if len(k) < 3:
+        return 0.0, 0.0
+    rendementen = np.diff(np.log(k))
+    return float(rendementen.mean() * dagen_per_jaar), float(rendementen.std(ddof=1) * np.sqrt(dagen_per_jaar))
+
+
+def trek_paden(paden: int, groei_pct: float, groei_sd_pct: float, horizon_jaren: float,
+               horizon_spreiding: float, exchange_rate: float, fx_drift: float = 0.0, fx_vol: float = 0.0,
+               seed: int | None = None) -> dict:
+    """Groei (fractie per jaar), horizon (jaren) en koers bij verkoop per pad."""
+    rng = np.random.default_rng(seed)
+    groei = np.maximum(rng.normal(groei_pct, groei_sd_pct, paden) / 100, -0.99)
+    horizon = np.maximum(rng.uniform(horizon_jaren - horizon_spreiding, horizon_jaren + horizon_spreiding, paden), 0)
+    z = rng.standard_normal(paden)
+    koers = exchange_rate * np.exp((fx_drift - fx_vol ** 2 / 2) * horizon + fx_vol * np.sqrt(horizon) * z)
+    return {"groei": groei, "horizon": horizon, "koers": koers}
+
+
+def _percentielen(waarden: np.ndarray) -> dict:
+    """Percentielen (en gemiddelde) over de paden, per kolom."""
+    p = np.percentile(waarden, PERCENTIELEN, axis=0)
+    return {**{f"p{q}": p[i] for i, q in enumerate(PERCENTIELEN)}, "gemiddeld": waarden.mean(axis=0)}
+
+
+def simuleer_portfolio(percelen, groei_pct: float, horizon_jaren: float, exchange_rate: float,
+                       groei_sd_pct: float = 2.0, horizon_spreiding: float = 1.0, fx_drift: float = 0.0,
+                       fx_vol: float = 0.0, paden: int = PADEN, seed: int | None = None,
+                       peildatum: date | None = None, vertaal: Vertaal = onvertaald) -> dict:
+    """
+    Simuleer de niet-verkochte percelen. Returnt een dict met:
+    `portfolio` (netto winst en verkoopwaarde in EUR, P5/P50/P95 en
+    gemiddelde), `percelen` (netto winst EUR per perceel), `investeerders`
+    (uitkering EUR = inleg + rente + winstdeling, per naam over alle
+    percelen), `kans_verlies` en `netto_winst_eur` (alle paden).
+    """
+    if not exchange_rate:
+        raise ValueError("Wisselkoers nodig voor een simulatie")
+    lijst = [p for p in getattr(percelen, "percelen", percelen) or [] if isinstance(p, dict)]
+    per_perceel, per_inv = bereken_portfolio(lijst, groei_pct, horizon_jaren, exchange_rate, peildatum, vertaal)
+
+    geldig = per_perceel["geldig"].to_numpy()
+    aankoop = np.array([veilig_getal(p.get("aankoopprijs")) for p in lijst], dtype="float64")[geldig]
+    vast = np.array([veilig_getal(p.get("verkoopprijs")) for p in lijst], dtype="float64")[geldig]
+    kosten = (per_perceel["totaal_inleg"] + per_perceel["totaal_rente"]).to_numpy()[geldig]
+    nieuw = np.cumsum(geldig) - 1  # positie onder de geldige percelen
+
+    per_inv = per_inv[geldig[per_inv["perceel"].to_numpy()]] if len(per_inv) else per_inv
+    inv_perceel = nieuw[per_inv["perceel"].to_numpy()]
+    codes, namen = pd.factorize(per_inv["naam"], sort=True)
+    inv_kapitaal = per_inv["kapitaalkosten"].to_numpy()
+    inv_pct = per_inv["winstdeling_pct"].to_numpy()
+
+    trek = trek_paden(paden, groei_pct, groei_sd_pct, horizon_jaren, horizon_spreiding,
+                      exchange_rate, fx_drift, fx_vol, seed)
+    factor = (1 + trek["groei"]) ** trek["horizon"]
+    koers = trek["koers"][:, None]
+
+    n = len(aankoop)
+    netto_totaal = np.zeros(paden)
+    waarde_totaal = np.zeros(paden)
+    uitkering = np.zeros((paden, len(namen)))
+    perceel_stats = {k: np.empty(n) for k in (*(f"p{q}" for q in PERCENTIELEN), "gemiddeld")}
+    for a in range(0, n, BLOK):
+        b = min(a + BLOK, n)
+        waarde = np.where(vast[a:b] > 0, vast[a:b], aankoop[a:b] * factor[:, None])
+        netto_eur = (waarde - kosten[a:b]) / koers
+        netto_totaal += netto_eur.sum(axis=1)
+        waarde_totaal += waarde.sum(axis=1) / koers[:, 0]
+        for k, v in _percentielen(netto_eur).items():
+            perceel_stats[k][a:b] = v
+
+        rijen = np.flatnonzero((inv_perceel >= a) & (inv_perceel < b))
+        if len(rijen):
+            pos = inv_perceel[rijen]
+            stijging = np.maximum(0, waarde[:, pos - a] - aankoop[pos])
+            np.add.at(uitkering, (slice(None), codes[rijen]), (inv_kapitaal[rijen] + stijging * inv_pct[rijen]) / koers)
+
+    locaties = per_perceel["locatie"][geldig].tolist()
+    portfolio = pd.DataFrame(
+        [_percentielen(netto_totaal), _percentielen(waarde_totaal)],
+        index=pd.Index(["netto_winst_eur", "verkoopwaarde_eur"], name="grootheid"),
+    )
+    if len(namen):
+        investeerders = pd.DataFrame({"naam": list(namen), **_percentielen(uitkering)})
+    else:
+        investeerders = pd.DataFrame(columns=["naam", *(f"p{q}" for q in PERCENTIELEN), "gemiddeld"])
+    return {
+        "paden": paden,
+        "portfolio": portfolio.round(2),
+        "percelen": pd.DataFrame({"locatie": locaties, **perceel_stats}).round(2),
+        "investeerders": investeerders.round(2),
+        "kans_verlies": float((netto_totaal < 0).mean()),
+        "netto_winst_eur": netto_totaal,
+    }
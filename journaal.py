@@ -0,0 +1,271 @@
+"""
+Wijzigingsjournaal voor percelen.
+
+Elke wijziging wordt vastgelegd als patch op de bovenste velden van één
+perceel, met de inverse patch erbij: {"zet": {veld: waarde}, "weg": [veld]};
+None betekent "perceel bestaat niet" (nieuw resp. verwijderd). Zo groeit
+het geheugen met de grootte van een wijziging, niet met de portfolio.
+
+De opslag bewaart het journaal append-only (zelfde transactie als de
+write) met periodieke snapshots; SessieJournaal gebruikt dezelfde patches
+voor undo/redo binnen een sessie.
+"""
+import copy
+import itertools
+import json
+from collections import deque
+
+import streamlit as st
+
+from datastore import perceel_json, zorg_voor_id
+
+# Aantal stappen dat een sessie ongedaan kan maken
+UNDO_DIEPTE = 50
+
+# Inhoudsversies zijn uniek binnen het proces, ook over sessies heen (memo-sleutels)
+_inhoudsversies = itertools.count(1)
+
+
+def maak_patch(oud: dict | None, nieuw: dict | None) -> dict | None:
+    """Patch zodat pas_patch_toe(oud, patch) == nieuw."""
+    if nieuw is None:
+        return None
+    oud = oud or {}
+    return {
+        "zet": {k: v for k, v in nieuw.items() if k not in oud or oud[k] != v},
+        "weg": [k for k in oud if k not in nieuw],
+    }
+
+
+def pas_patch_toe(doc: dict | None, patch: dict | None) -> dict | None:
+    """Nieuw document; `doc` blijft ongewijzigd."""
+    if patch is None:
+        return None
+    nieuw = dict(doc or {})
+    for veld in patch.get("weg") or []:
+        nieuw.pop(veld, None)
+    nieuw.update(copy.deepcopy(patch.get("zet") or {}))
+    return nieuw
+
+
+def journaal_entry(perceel_id: str, oud: dict | None, nieuw: dict | None) -> dict:
+    """Journaalregel (zonder seq/tijd, die geeft de opslag) voor één perceel."""
+    if oud is None:
+        soort = "nieuw"
+    elif nieuw is None:
+        soort = "verwijderd"
+    else:
+        soort = "gewijzigd"
+    return {
+        "perceel_id": perceel_id,
+        "soort": soort,
+        "patch": maak_patch(oud, nieuw),
+        "invers": maak_patch(nieuw, oud),
+    }
+
+
+def gewijzigde_velden(entry: dict) -> list[str]:
+    """Velden die een journaalregel raakt (voor de historie)."""
+    patch = entry.get("patch") or entry.get("invers") or {}
+    return sorted(set(patch.get("zet") or {}) | set(patch.get("weg") or []))
+
+
+class SessieJournaal:
+    """
+    Undo/redo voor één sessie. Een stap is de lijst journaalregels van één
+    opslagmoment (één gebruikersactie); alleen de patches worden bewaard.
+    Daarnaast per perceel de laatst vastgelegde json-tekst, om de volgende
+    stap te kunnen bepalen.
+
+    `versie` telt elke wijziging van de sessie-inhoud die het journaal
+    ziet (laden, overnemen, vastleggen, undo/redo); afgeleide gegevens
+    zoals het PortfolioFrame gebruiken hem als sleutel. Per perceel is er
+    ook een inhoudsversie (zie `inhoudsversie`), voor memo.py.
+    """
+
+    def __init__(self, diepte: int = UNDO_DIEPTE):
+        self._laatst = {}
+        self._volgorde = []
+        self._undo = deque(maxlen=diepte)
+        self._redo = deque(maxlen=diepte)
+        self.versie = 0
+        # perceel_id → (dict-object, inhoudsversie, json-tekst bij het stempelen)
+        self._inhoud = {}
+        # pas na begin() is _laatst de uitgangssituatie
+        self._begonnen = False
+
+    @property
+    def kan_undo(self) -> bool:
+        return bool(self._undo)
+
+    @property
+    def kan_redo(self) -> bool:
+        return bool(self._redo)
+
+    def begin(self, percelen):
+        """Nieuwe uitgangssituatie (na laden); undo/redo beginnen leeg."""
+        self._begonnen = True
+        self._laatst = {}
+        self._inhoud = {}
+        self._undo.clear()
+        self._redo.clear()
+        self.versie += 1
+        self.neem_over(percelen)
+
+    def neem_over(self, percelen):
+        """
+        Inhoud van buiten (verversen, samenvoegen) overnemen zonder er een
+        stap van te maken. De versie gaat alleen omhoog als er iets is
+        overgenomen (lege lijsten komen bij elke rerun voorbij).
+        """
+        overgenomen = False
+        for p in percelen:
+            if isinstance(p, dict):
+                pid = zorg_voor_id(p)
+                self._laatst[pid] = perceel_json(p)
+                self._stempel(pid, p, self._laatst[pid])
+                if pid not in self._volgorde:
+                    self._volgorde.append(pid)
+                overgenomen = True
+        if overgenomen:
+            self.versie += 1
+
+    def vergeet(self, perceel_id: str):
+        """Perceel is van buiten verwijderd: geen undo-stap van maken."""
+        if perceel_id not in self._laatst and perceel_id not in self._volgorde:
+            return
+        self.versie += 1
+        self._laatst.pop(perceel_id, None)
+        self._inhoud.pop(perceel_id, None)
+        if perceel_id in self._volgorde:
+            self._volgorde.remove(perceel_id)
+
+    def leg_vast(self, percelen) -> int:
+        """
+        Maak één stap van alles wat sinds de vorige keer gewijzigd is. Returnt
+        het aantal regels. Zonder begin() (percelen door een andere pagina
+        geladen) wordt de huidige inhoud de uitgangssituatie, in plaats van
+        de hele portfolio als "nieuw" vast te leggen.
+        """
+        if not self._begonnen:
+            self.begin(percelen)
+            return 0
+        stap = []
+        volgorde = []
+        for p in percelen:
+            if not isinstance(p, dict):
+                continue
+            pid = zorg_voor_id(p)
+            volgorde.append(pid)
+            tekst = perceel_json(p)
+            oud = self._laatst.get(pid)
+            if oud != tekst:
+                entry = journaal_entry(pid, json.loads(oud) if oud else None, json.loads(tekst))
+                if oud is None:
+                    # redo zet een nieuw perceel terug op zijn plek
+                    entry["positie"] = len(volgorde) - 1
+                stap.append(entry)
+                self._laatst[pid] = tekst
+                self._stempel(pid, p, tekst)
+            else:
+                item = self._inhoud.get(pid)
+                if item is None or item[0] is not p or item[2] != tekst:
+                    if item is not None and item[2] != tekst:
+                        # bewerking (raak_aan) weer teruggedraaid
+                        self.versie += 1
+                    self._stempel(pid, p, tekst)
+
+        aanwezig = set(volgorde)
+        for positie, pid in enumerate(self._volgorde):
+            if pid not in aanwezig and pid in self._laatst:
+                entry = journaal_entry(pid, json.loads(self._laatst.pop(pid)), None)
+                self._inhoud.pop(pid, None)
+                entry["positie"] = positie
+                stap.append(entry)
+        self._volgorde = volgorde
+
+        if stap:
+            self._undo.append(stap)
+            self._redo.clear()
+            self.versie += 1
+        return len(stap)
+
+    def _stempel(self, perceel_id: str, perceel: dict, tekst: str):
+        self._inhoud[perceel_id] = (perceel, next(_inhoudsversies), tekst)
+
+    def raak_aan(self, perceel: dict) -> bool:
+        """
+        Het perceel is in de sessie bewerkt (widgets wijzigen het object
+        direct) maar nog niet vastgelegd. Wijkt de inhoud af van wat het
+        journaal laatst zag, dan krijgt het een nieuwe inhoudsversie en gaat
+        `versie` omhoog, zonder undo-stap. Returnt of er iets veranderd is.
+        """
+        pid = perceel.get("perceel_id")
+        if not pid:
+            return False
+        tekst = perceel_json(perceel)
+        item = self._inhoud.get(pid)
+        if item is not None and item[0] is perceel and item[2] == tekst:
+            return False
+        self._stempel(pid, perceel, tekst)
+        self.versie += 1
+        return True
+
+    def inhoudsversie(self, perceel: dict) -> int | None:
+        """
+        Versie van de inhoud van dit perceel-object zoals het journaal hem
+        laatst zag (laden, overnemen, vastleggen, undo/redo); None voor een
+        ander object (kopie) of een onbekend perceel. Wijzigingen in het
+        object tellen mee zodra raak_aan, leg_vast of neem_over ze ziet;
+        Percelenbeheer roept raak_aan aan na de bewerkwidgets, dus ook nog
+        niet opgeslagen bewerkingen krijgen meteen een nieuwe versie.
+        """
+        item = self._inhoud.get(perceel.get("perceel_id"))
+        return item[1] if item is not None and item[0] is perceel else None
+
+    def undo(self, percelen: list) -> bool:
+        if not self._undo:
+            return False
+        stap = self._undo.pop()
+        for entry in reversed(stap):
+            self._pas_toe(percelen, entry, entry["invers"])
+        self._redo.append(stap)
+        return True
+
+    def redo(self, percelen: list) -> bool:
+        if not self._redo:
+            return False
+        stap = self._redo.pop()
+        for entry in stap:
+            self._pas_toe(percelen, entry, entry["patch"])
+        self._undo.append(stap)
+        return True
+
+    def _pas_toe(self, percelen: list, entry: dict, patch: dict | None):
+        self.versie += 1
+        pid = entry["perceel_id"]
+        idx = next((j for j, p in enumerate(percelen) if isinstance(p, dict) and p.get("perceel_id") == pid), None)
+        doc = pas_patch_toe(percelen[idx] if idx is not None else None, patch)
+
+        if doc is None:
+            if idx is not None:
+                percelen.pop(idx)
+            self._laatst.pop(pid, None)
+            self._inhoud.pop(pid, None)
+        else:
+            if idx is None:
+                percelen.insert(min(entry.get("positie", len(percelen)), len(percelen)), doc)
+            else:
+                percelen[idx].clear()
+                percelen[idx].update(doc)
+                doc = percelen[idx]
+            self._laatst[pid] = perceel_json(doc)
+            self._stempel(pid, doc, self._laatst[pid])
+        self._volgorde = [p.get("perceel_id") for p in percelen if isinstance(p, dict)]
+
+
+def sessie_journaal() -> SessieJournaal:
+    """Undo/redo-journaal van de huidige Streamlit-sessie."""
+    if "percelen_journaal" not in st.session_state:
+        st.session_state["percelen_journaal"] = SessieJournaal()
+    return st.session_state["percelen_journaal"]
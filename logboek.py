@@ -0,0 +1,126 @@
+"""
+Gestructureerde logging.
+
+Eén regel per gebeurtenis met vaste velden, als logfmt-tekst
+(`event=save rijen=3 bytes=2048 ms=41.2`) of als JSON. Instellingen (env
+of secrets):
+
+- PERCELEN_LOG_NIVEAU: DEBUG, INFO (standaard), WARNING, ...
+- PERCELEN_LOG_FORMAAT: tekst (standaard) of json
+- PERCELEN_LOG_STEEKPROEF: fractie (0-1) van de frequente INFO/DEBUG-regels
+  die gelogd wordt, bijv. een geldige cache bij elke rerun; standaard 1
+- PERCELEN_LOG_PAYLOAD: 1 = volledige payloads loggen (op DEBUG); standaard uit
+"""
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from backends import instelling
+
+# Naam van de bovenste logger; modules loggen onder vastgoedtool.<naam>
+BASIS = "vastgoedtool"
+
+_lock = threading.Lock()
+_payload = None
+
+
+class StructuurFormatter(logging.Formatter):
+    """Tijd, niveau, logger, event en de extra velden van de regel."""
+
+    def __init__(self, formaat: str = "tekst"):
+        super().__init__()
+        self.formaat = formaat
+
+    def format(self, record: logging.LogRecord) -> str:
+        velden = {
+            "tijd": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "niveau": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+            **getattr(record, "velden", {}),
+        }
+        traceback = self.formatException(record.exc_info) if record.exc_info else None
+
+        if self.formaat == "json":
+            if traceback:
+                velden["traceback"] = traceback
+            return json.dumps(velden, ensure_ascii=False, default=str)
+
+        regel = " ".join(f"{k}={_logfmt(v)}" for k, v in velden.items())
+        return f"{regel}\n{traceback}" if traceback else regel
+
+
+def _logfmt(waarde) -> str:
+    if isinstance(waarde, float):
+        return f"{waarde:.1f}"
+    tekst = waarde if isinstance(waarde, str) else json.dumps(waarde, ensure_ascii=False, default=str)
+    if not tekst or any(c in tekst for c in ' ="'):
+        return json.dumps(tekst, ensure_ascii=False)
+    return tekst
+
+
+class SteekproefFilter(logging.Filter):
+    """Laat van regels met steekproef=True (onder WARNING) een fractie door."""
+
+    def __init__(self, fractie: float):
+        super().__init__()
+        self.fractie = fractie
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "steekproef", False) and record.levelno < logging.WARNING:
+            return random.random() < self.fractie
+        return True
+
+
+def _configureer():
+    global _payload
+    with _lock:
+        if _payload is not None:
+            return
+        basis = logging.getLogger(BASIS)
+        handler = logging.StreamHandler()
+        handler.setFormatter(StructuurFormatter((instelling("PERCELEN_LOG_FORMAAT") or "tekst").lower()))
+        handler.addFilter(SteekproefFilter(float(instelling("PERCELEN_LOG_STEEKPROEF") or 1.0)))
+        basis.addHandler(handler)
+        basis.setLevel((instelling("PERCELEN_LOG_NIVEAU") or "INFO").upper())
+        basis.propagate = False
+        _payload = str(instelling("PERCELEN_LOG_PAYLOAD") or "").lower() in ("1", "true", "ja")
+
+
+def logger(naam: str) -> logging.Logger:
+    """Logger vastgoedtool.<naam>; de eerste aanroep configureert de handler."""
+    _configureer()
+    return logging.getLogger(f"{BASIS}.{naam}")
+
+
+def gebeurtenis(log: logging.Logger, event: str, niveau: int = logging.INFO,
+                steekproef: bool = False, exc_info=None, **velden):
+    """Eén gestructureerde regel; steekproef=True voor frequente regels."""
+    if log.isEnabledFor(niveau):
+        log.log(niveau, event, extra={"velden": velden, "steekproef": steekproef}, exc_info=exc_info)
+
+
+@contextmanager
+def meet(log: logging.Logger, event: str, niveau: int = logging.INFO, steekproef: bool = False, **velden):
+    """
+    Logt `event` met de duur (ms) als het blok klaar is. De velden kunnen in
+    het blok worden aangevuld (`with meet(...) as velden`). Bij een fout
+    volgt een ERROR-regel met traceback en gaat de fout door.
+    """
+    start = time.perf_counter()
+    try:
+        yield velden
+    except Exception as e:
+        gebeurtenis(log, event, logging.ERROR, exc_info=True, **velden, fout=repr(e),
+                    ms=round((time.perf_counter() - start) * 1000, 1))
+        raise
+    gebeurtenis(log, event, niveau, steekproef, **velden, ms=round((time.perf_counter() - start) * 1000, 1))
+
+
+def payload(log: logging.Logger, event: str, **velden):
+    """Volledige inhoud loggen, alleen met PERCELEN_LOG_PAYLOAD en op DEBUG."""
+    if _payload and log.isEnabledFor(logging.DEBUG):
+        gebeurtenis(log, event, logging.DEBUG, **velden)
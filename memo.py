@@ -0,0 +1,145 @@
+"""
+Memoisatie van de analysefuncties op perceelversie.
+
+st.cache_data pickelt en hasht bij elke aanroep het volledige argument
+(bij build_rentebetalingen de hele portfolio). Hier is de sleutel klein:
+per perceel (perceel_id, inhoudsversie) plus de overige parameters. De
+inhoudsversie geeft het sessiejournaal (SessieJournaal.inhoudsversie)
+zolang het om hetzelfde dict-object gaat dat het journaal het laatst zag;
+voor andere dicts (kopieën, een stand op peildatum) is het de
+inhoudshash. Een opzoeking kost dan O(1) per perceel.
+
+Per functie een LRU van MAX_ITEMS uitkomsten met tellers voor hits,
+misses en verdrongen items (`overzicht()`, zie Beheer). Uitkomsten worden
+als kopie teruggegeven, zoals st.cache_data dat doet.
+"""
+import copy
+import functools
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+from datastore import perceel_hash
+
+# Uitkomsten per functie
+MAX_ITEMS = 2048
+
+
+class Memo:
+    """LRU-cache van één functie, met hit/miss-tellers."""
+
+    def __init__(self, naam: str, max_items: int = MAX_ITEMS):
+        self.naam = naam
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.verdrongen = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def haal(self, sleutel, bereken):
+        """Uitkomst voor `sleutel`; bij een miss `bereken()` en bewaren."""
+        with self._lock:
+            if sleutel in self._items:
+                self._items.move_to_end(sleutel)
+                self.hits += 1
+                return self._items[sleutel]
+            self.misses += 1
+        waarde = bereken()
+        with self._lock:
+            self._items[sleutel] = waarde
+            self._items.move_to_end(sleutel)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+                self.verdrongen += 1
+        return waarde
+
+    def wis(self, tellers: bool = False):
+        with self._lock:
+            self._items.clear()
+            if tellers:
+                self.hits = self.misses = self.verdrongen = 0
+
+    def stand(self) -> dict:
+        totaal = self.hits + self.misses
+        return {
+            "functie": self.naam,
+            "items": len(self._items),
+            "hits": self.hits,
+            "misses": self.misses,
+            "verdrongen": self.verdrongen,
+            "hit_pct": round(self.hits / totaal * 100, 1) if totaal else None,
+        }
+
+
+_caches: dict[str, Memo] = {}
+
+
+def _kopie(waarde):
+    if isinstance(waarde, (pd.DataFrame, pd.Series)):
+        return waarde.copy(deep=True)
+    return copy.deepcopy(waarde)
+
+
+def memoiseer(sleutel, max_items: int = MAX_ITEMS):
+    """
+    Decorator: cache de functie op `sleutel(*args, **kwargs)` (hashbaar).
+    De originele functie blijft bereikbaar als `__wrapped__`, de cache als
+    `.memo`.
+    """
+    def decorator(fn):
+        memo = _caches.setdefault(fn.__qualname__, Memo(fn.__qualname__, max_items))
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return _kopie(memo.haal(sleutel(*args, **kwargs), lambda: fn(*args, **kwargs)))
+
+        wrapper.memo = memo
+        return wrapper
+    return decorator
+
+
+def _journaal():
+    return st.session_state.get("percelen_journaal")
+
+
+def perceel_sleutel(perceel, journaal=None) -> tuple:
+    """
+    (perceel_id, inhoudsversie) of, zonder versie, (perceel_id, inhoudshash).
+    De inhoudsversie volgt ook nog niet opgeslagen bewerkingen (zie
+    SessieJournaal.raak_aan).
+    """
+    if isinstance(perceel, pd.Series):
+        perceel = perceel.to_dict()
+    if not isinstance(perceel, dict):
+        return (None, repr(perceel))
+    if journaal is None:
+        journaal = _journaal()
+    versie = journaal.inhoudsversie(perceel) if journaal is not None else None
+    if versie is None:
+        try:
+            versie = perceel_hash(perceel)
+        except (TypeError, ValueError):
+            # bijv. numpy-getallen uit een DataFrame-rij
+            versie = repr(sorted(perceel.items(), key=lambda kv: str(kv[0])))
+    return (perceel.get("perceel_id"), versie)
+
+
+def percelen_sleutel(percelen) -> tuple:
+    """perceel_sleutel van elk perceel in de lijst (journaal één keer opgezocht)."""
+    journaal = _journaal()
+    return tuple(perceel_sleutel(p, journaal) for p in percelen or [])
+
+
+def overzicht() -> list[dict]:
+    """Per gememoiseerde functie: items, hits, misses, verdrongen en hit-percentage."""
+    return [memo.stand() for memo in _caches.values()]
+
+
+def wis_alle(tellers: bool = False):
+    """Leeg alle caches (naast st.cache_data.clear()); met `tellers` ook de tellers."""
+    for memo in _caches.values():
+        memo.wis(tellers)
@@ -0,0 +1,66 @@
+"""
+Eén opslag per scriptrun.
+
+Knoppen en migraties in een pagina vragen opslaan (en eventueel het legen
+van st.cache_data) alleen aan; de coördinator voert dat één keer uit: aan
+het eind van de run, vlak vóór een st.rerun() (die het script afbreekt),
+of aan het begin van de volgende run als de vorige onderweg stopte.
+Runs zonder verzoek doen niets, dus ook geen delta-berekening.
+"""
+import streamlit as st
+
+
+class OpslagCoordinator:
+    """Verzamelt opslagverzoeken binnen een scriptrun en voert ze één keer uit."""
+
+    def __init__(self, opslaan):
+        # opslaan: functie zonder argumenten die de sessie wegschrijft
+        self._opslaan = opslaan
+        self._opslaan_gevraagd = False
+        self._cache_wissen = False
+        self.verzoeken = 0
+        self.flushes = 0
+
+    def vraag_opslaan(self, cache_wissen: bool = False):
+        self.verzoeken += 1
+        self._opslaan_gevraagd = True
+        self._cache_wissen = self._cache_wissen or cache_wissen
+
+    def vraag_cache_wissen(self):
+        self._cache_wissen = True
+
+    @property
+    def open(self) -> bool:
+        return self._opslaan_gevraagd or self._cache_wissen
+
+    def flush(self):
+        """Voer de verzamelde verzoeken uit; returnt het resultaat van opslaan (of None)."""
+        resultaat = None
+        opslaan, wissen = self._opslaan_gevraagd, self._cache_wissen
+        self._opslaan_gevraagd = self._cache_wissen = False
+
+        if opslaan:
+            self.flushes += 1
+            resultaat = self._opslaan()
+        if wissen:
+            st.cache_data.clear()
+        return resultaat
+
+    def rerun(self):
+        """Flush en daarna st.rerun()."""
+        self.flush()
+        st.rerun()
+
+
+def opslag_coordinator(sleutel: str, opslaan) -> OpslagCoordinator:
+    """
+    Coördinator van de huidige sessie (per pagina-sleutel). Verzoeken die
+    een afgebroken run achterliet worden meteen uitgevoerd.
+    """
+    if sleutel not in st.session_state:
+        st.session_state[sleutel] = OpslagCoordinator(opslaan)
+    coordinator = st.session_state[sleutel]
+    coordinator._opslaan = opslaan
+    if coordinator.open:
+        coordinator.flush()
+    return coordinator
@@ -12,7 +12,13 @@ from utils import (
     format_currency,
 )
 
-from datastore import store
+from datastore import samenvatting, store, sessie_tracker
+from schrijfwachtrij import wachtrij
+from opslagcoordinator import opslag_coordinator
+from journaal import sessie_journaal, gewijzigde_velden
+from wijzigingsfeed import feed
+import bulk_import
+from portfolio_frame import portfolio_frame
 
 # 🌐 taal instellen
 _, n_ = language_selector()
@@ -202,11 +208,10 @@ def migrate_percelen():
             changed = True
 
     if changed:
-        store.save_percelen(prepare_percelen_for_saving(st.session_state["percelen"]))
-        st.cache_data.clear()
+        sla_percelen_op(cache_wissen=True)
         st.success(_("✅ Migratie uitgevoerd: fasen gemapt, records opgeschoond, winst én statusupdates bijgewerkt."))
-        st.session_state["skip_load"] = True
-        st.rerun()
+        markeer_lokaal(st.session_state.get("percelen", []))
+        rerun()
 
 
 PIPELINE_FASEN = [
@@ -235,16 +240,70 @@ documentvereisten_per_fase = {
     ]
 }
 
-def prepare_percelen_for_saving(percelen: list[dict]) -> list[dict]:
-    def serialize(obj):
-        if isinstance(obj, date):
-            return obj.isoformat()
-        return obj
-    return [json.loads(json.dumps(p, default=serialize)) for p in percelen]
+def _schrijf_sessie() -> int | None:
+    """
+    Zet de sinds het laden gewijzigde percelen van deze sessie in de
+    schrijfwachtrij; het wegschrijven gebeurt op de achtergrond.
+    """
+    if "percelen" not in st.session_state:
+        return None
+    # één undo-stap per opslagmoment
+    sessie_journaal().leg_vast(st.session_state["percelen"])
+    return wachtrij.plaats(st.session_state["percelen"], sessie_tracker())
+
+
+# Alle opslagverzoeken van deze run worden één keer uitgevoerd (eind van de
+# run of vlak vóór een rerun)
+coordinator = opslag_coordinator("opslag_coordinator_beheer", _schrijf_sessie)
+
+
+def sla_percelen_op(cache_wissen: bool = False):
+    """Vraag opslaan aan (en eventueel st.cache_data legen); zie coordinator."""
+    coordinator.vraag_opslaan(cache_wissen=cache_wissen)
+
+
+def markeer_lokaal(percelen):
+    """
+    Deze percelen hebben lokale wijzigingen: niet op aanvraag herladen
+    (skip_load) tot hun write is bevestigd, zie lokaal_gewijzigd.
+    """
+    lokaal = st.session_state.setdefault("skip_load", set())
+    lokaal.update(p["perceel_id"] for p in percelen if isinstance(p, dict) and p.get("perceel_id"))
+
+
+def lokaal_gewijzigd() -> set:
+    """perceel_ids met lokale wijzigingen; percelen waarvan de write bevestigd is vallen af."""
+    lokaal = st.session_state.get("skip_load") or set()
+    if lokaal:
+        tracker = sessie_tracker()
+        sessie = {p.get("perceel_id"): p for p in st.session_state.get("percelen", []) if isinstance(p, dict)}
+        lokaal -= {pid for pid in lokaal if pid not in sessie or tracker.ongewijzigd(sessie[pid])}
+    return lokaal
+
+
+def rerun():
+    """st.rerun() na het uitvoeren van de openstaande opslagverzoeken."""
+    coordinator.rerun()
+
+
+def toon_opslagstatus():
+    """Openstaande en mislukte writes van deze sessie in de sidebar."""
+    status = wachtrij.status(sessie_tracker())
+    if status["wachtend"]:
+        st.sidebar.caption(_("💾 {n} wijziging(en) worden opgeslagen…").format(n=status["wachtend"]))
+    for fout in status["mislukt"]:
+        st.sidebar.error(_("Opslaan mislukt voor {loc}: {fout}").format(
+            loc=fout["locatie"] or fout["perceel_id"], fout=fout["fout"]
+        ))
+    if status["mislukt"]:
+        st.sidebar.info(_("Gebruik '📤 Percelen opnieuw laden' om de actuele versie op te halen."))
+        if st.sidebar.button(_("🔁 Opnieuw proberen"), key="wachtrij_opnieuw"):
+            wachtrij.opnieuw(sessie_tracker())
+            rerun()
 
 if st.session_state.get("rerun_trigger") is True:
     st.session_state["rerun_trigger"] = False
-    st.rerun()
+    rerun()
 
 st.markdown("""<script>window.scrollTo(0, 0);</script>""", unsafe_allow_html=True)
 st.title(_("Percelenbeheer"))
@@ -270,9 +329,13 @@ def convert_dates_to_eu(percelen):
                 pass
     return percelen
 
-# Percelen inladen
-if "percelen" not in st.session_state or st.session_state.get("skip_load") != True:
-    loaded = store.load_percelen()
+def bereid_percelen_voor(loaded, tracker=None) -> list:
+    """
+    Geldige percelen, datums in Europese notatie en defaults. Met `tracker`
+    wordt de voorbereide inhoud als geladen stand bevestigd; anders zou
+    elk omgezet perceel meteen als gewijzigd gelden en bij de volgende
+    opslag opnieuw worden weggeschreven.
+    """
     percelen_valid = []
     for i, p in enumerate(loaded):
         if isinstance(p, dict):
@@ -280,22 +343,156 @@ if "percelen" not in st.session_state or st.session_state.get("skip_load") != Tr
         else:
             st.warning(_("Percel index {i} is ongeldig en wordt genegeerd.").format(i=i))
 
-    # Zet in session_state
-    st.session_state.percelen = percelen_valid
-
     # ➡️ Zet alle datums direct om naar Europese notatie
-    st.session_state.percelen = convert_dates_to_eu(st.session_state.percelen)
+    percelen_valid = convert_dates_to_eu(percelen_valid)
 
     # defaults
-    for perceel in st.session_state["percelen"]:
+    for perceel in percelen_valid:
         perceel.setdefault("wordt_gesplitst", False)
         perceel.setdefault("dealstage", _("Aankoop"))
+    if tracker is not None:
+        tracker.herbevestig(percelen_valid)
+    return percelen_valid
+
+
+def ververs_gekozen_perceel(samenvatting: dict):
+    """Haal het gekozen perceel volledig op als de sessie een andere versie heeft."""
+    tracker = sessie_tracker()
+    pid = samenvatting.get("perceel_id")
+    lijst = st.session_state["percelen"]
+    idx = next((j for j, p in enumerate(lijst) if isinstance(p, dict) and p.get("perceel_id") == pid), None)
+    if pid is None or (idx is not None and tracker.versie(pid) == samenvatting.get("versie")):
+        return
+    if wachtrij.bezig(tracker, pid):
+        # eigen wijziging nog onderweg: de sessie is actueler dan de opslag
+        return
+
+    perceel = store.load_perceel(pid, tracker=tracker)
+    if perceel is None:
+        return
+    perceel = bereid_percelen_voor([perceel], tracker)[0]
+    if idx is None:
+        lijst.append(perceel)
+    else:
+        lijst[idx] = perceel
+    # wijziging van buiten: geen undo-stap
+    sessie_journaal().neem_over([perceel])
+
+
+# Percelen inladen: de volledige lijst één keer per sessie (of na "opnieuw
+# laden"); kaart en perceelkeuze gebruiken per rerun alleen samenvattingen
+# en het gekozen perceel wordt op aanvraag ververst.
+if "percelen" not in st.session_state:
+    # cursor vóór het laden: wat tijdens het laden wijzigt komt via de feed alsnog binnen
+    st.session_state["feed_cursor"] = feed.cursor()
+    st.session_state.percelen = bereid_percelen_voor(store.iter_percelen(tracker=sessie_tracker()), sessie_tracker())
+    sessie_journaal().begin(st.session_state.percelen)
+
+# samengevoegde versies uit de schrijfwachtrij (conflict met een andere sessie) overnemen
+sessie_journaal().neem_over(wachtrij.pas_toe(st.session_state["percelen"], sessie_tracker()))
+
+
+def ververs_wijzigingen_van_anderen() -> int:
+    """
+    Haal alleen de percelen opnieuw op die volgens de wijzigingsfeed sinds
+    de vorige keer door anderen gewijzigd of verwijderd zijn. Percelen met
+    eigen, nog niet opgeslagen of onderweg zijnde wijzigingen blijven staan
+    (die worden bij het opslaan samengevoegd). Returnt het aantal.
+    """
+    tracker = sessie_tracker()
+    lijst = st.session_state["percelen"]
+    versies, st.session_state["feed_cursor"] = feed.sinds(st.session_state.get("feed_cursor", 0))
+    if versies is None:
+        # te ver achter voor de buffer: vergelijk met de samenvattingen
+        versies = {s["perceel_id"]: s.get("versie") for s in store.load_samenvattingen()}
+        versies.update({
+            p["perceel_id"]: None for p in lijst
+            if isinstance(p, dict) and p.get("perceel_id") not in versies and tracker.versie(p.get("perceel_id"))
+        })
+
+    aantal = 0
+    for pid, versie in versies.items():
+        if versie is not None and tracker.versie(pid) == versie:
+            continue
+        if wachtrij.bezig(tracker, pid):
+            continue
+        idx = next((j for j, p in enumerate(lijst) if isinstance(p, dict) and p.get("perceel_id") == pid), None)
+        if idx is not None and not tracker.ongewijzigd(lijst[idx]):
+            continue
+
+        if versie is None:
+            if idx is None:
+                continue
+            lijst.pop(idx)
+            tracker.vergeet(pid)
+            sessie_journaal().vergeet(pid)
+        else:
+            perceel = store.load_perceel(pid, tracker=tracker)
+            if perceel is None:
+                continue
+            perceel = bereid_percelen_voor([perceel], tracker)[0]
+            if idx is None:
+                lijst.append(perceel)
+            else:
+                lijst[idx] = perceel
+            sessie_journaal().neem_over([perceel])
+        aantal += 1
+    return aantal
+
+
+@st.fragment(run_every=feed.interval or None)
+def volg_wijzigingen():
+    """Pollt de feed; bij wijzigingen van anderen wordt de pagina opnieuw opgebouwd."""
+    aantal = ververs_wijzigingen_van_anderen()
+    if aantal:
+        st.toast(_("🔔 {n} perceel/percelen bijgewerkt door een andere gebruiker.").format(n=aantal))
+        if not _volledige_run:
+            rerun()
+
+
+# in een volledige run gebruikt de rest van het script de verversing meteen;
+# alleen een losse fragment-run (run_every) moet de pagina laten herbouwen
+_volledige_run = True
+with st.sidebar:
+    volg_wijzigingen()
+_volledige_run = False
+
+def samenvattingen_met_sessie() -> list[dict]:
+    """
+    Samenvattingen uit de opslag, bijgewerkt met wat deze sessie nog in de
+    schrijfwachtrij heeft staan (write-behind): nieuwe en gewijzigde
+    percelen zoals in de sessie, verwijderde niet meer. De versie blijft
+    die van de tracker, zodat het gekozen perceel niet opnieuw wordt geladen.
+    """
+    lijst = store.load_samenvattingen()
+    tracker = sessie_tracker()
+    openstaand = wachtrij.openstaand(tracker)
+    if not openstaand:
+        return lijst
+    sessie = {
+        p.get("perceel_id"): p for p in st.session_state["percelen"]
+        if isinstance(p, dict) and p.get("perceel_id") in openstaand
+    }
+    bijgewerkt = []
+    for s in lijst:
+        pid = s.get("perceel_id")
+        if pid not in openstaand:
+            bijgewerkt.append(s)
+        elif pid in sessie:
+            bijgewerkt.append(samenvatting(sessie.pop(pid), tracker.versie(pid)))
+    bijgewerkt.extend(samenvatting(p, tracker.versie(pid)) for pid, p in sessie.items())
+    return bijgewerkt
+
+
+samenvattingen = samenvattingen_met_sessie()
 
 
+toon_opslagstatus()
+
 # Sidebar invoer voor nieuw perceel
 st.sidebar.header(_("📝 Perceelinvoer"))
 
-bestaande_labels = [p.get("locatie", "") for p in st.session_state.get("percelen", [])]
+bestaande_labels = [p.get("locatie", "") for p in samenvattingen]
 prefixes = sorted(set(l.rsplit(" ", 1)[0] for l in bestaande_labels if l.strip() and l.rsplit(" ", 1)[-1].isdigit()))
 
 keuze = st.sidebar.selectbox(_("📍 Gebied & Subzone"), prefixes + [_("➕ Nieuw gebied...")])
@@ -605,14 +802,14 @@ for doc in docs_sidebar:
             unsafe_allow_html=True
         )
 
-# 📍 Verzamel alle polygon-coördinaten
-alle_coords = []
-for perceel in st.session_state.get("percelen", []):
-    polygon = perceel.get("polygon", [])
-    if polygon and isinstance(polygon, list):
-        for point in polygon:
-            if isinstance(point, list) and len(point) == 2:
-                alle_coords.append(point)
+# 📍 Grenzen van alle polygonen (frame van de samenvattingen, per versie)
+kaart_frame = portfolio_frame(
+    samenvattingen,
+    versie=tuple((s.get("perceel_id"), s.get("versie")) for s in samenvattingen)
+    + ((sessie_journaal().versie,) if wachtrij.openstaand(sessie_tracker()) else ()),
+    sleutel="kaart_frame",
+)
+alle_grenzen = kaart_frame.grenzen()
 
 # 📌 Kaartfocus
 kaart_focus = st.session_state.get("kaart_focus_buffer")
@@ -623,17 +820,12 @@ if kaart_focus and isinstance(kaart_focus, list) and len(kaart_focus) >= 1:
         attr="Google Hybrid"
     )
     m.fit_bounds(kaart_focus)
-elif alle_coords:
-    min_lat = min(p[0] for p in alle_coords)
-    max_lat = max(p[0] for p in alle_coords)
-    min_lon = min(p[1] for p in alle_coords)
-    max_lon = max(p[1] for p in alle_coords)
-    bounds = [[min_lat, min_lon], [max_lat, max_lon]]
+elif alle_grenzen:
     m = folium.Map(
         tiles="https://mt1.google.com/vt/lyrs=y&x={x}&y={y}&z={z}",
         attr="Google Hybrid"
     )
-    m.fit_bounds(bounds)
+    m.fit_bounds(alle_grenzen)
 else:
     m = folium.Map(
         location=[13.29583, -16.74694],
@@ -645,12 +837,8 @@ else:
 # ➕ Teken-tool
 Draw(export=False).add_to(m)
 
-# ✅ Zorg dat uploads_urls altijd bestaat
-for perceel in st.session_state.percelen:
-    perceel.setdefault("uploads_urls", {})
-
 # 📍 Plaats markers/polygons
-for perceel in st.session_state.percelen:
+for perceel in samenvattingen:
     if not isinstance(perceel, dict):
         st.warning(_("Percel is geen dict maar {t}, wordt overgeslagen.").format(t=type(perceel)))
         continue
@@ -719,30 +907,41 @@ with st.container():
     output = st_folium(m, width=1000, height=500)
     if output and output.get("last_object_clicked_tooltip"):
         st.session_state["active_locatie"] = output["last_object_clicked_tooltip"]
-        for perceel in st.session_state["percelen"]:
+        for perceel in samenvattingen:
             if perceel.get("locatie") == st.session_state["active_locatie"]:
                 st.session_state["kaart_focus_buffer"] = perceel.get("polygon")
                 break
     st.markdown("", unsafe_allow_html=True)
 
-# 🔄 Actiebalk Undo & Reload
-col_undo, col_reload = st.columns(2)
+# 🔄 Actiebalk Undo, Redo & Reload
+col_undo, col_redo, col_reload = st.columns(3)
 
 with col_undo:
-    if st.button(_("↩ Undo laatste wijziging"), key="undo_main", use_container_width=True):
-        undo()
-        st.rerun()
+    if st.button(_("↩ Undo laatste wijziging"), key="undo_main", use_container_width=True,
+                 disabled=not sessie_journaal().kan_undo):
+        if sessie_journaal().undo(st.session_state["percelen"]):
+            sla_percelen_op(cache_wissen=True)
+        rerun()
+
+with col_redo:
+    if st.button(_("↪ Redo"), key="redo_main", use_container_width=True,
+                 disabled=not sessie_journaal().kan_redo):
+        if sessie_journaal().redo(st.session_state["percelen"]):
+            sla_percelen_op(cache_wissen=True)
+        rerun()
 
 with col_reload:
     if st.button(_("📤 Percelen opnieuw laden"), key="reload_main", use_container_width=True):
-        st.session_state["percelen"] = store.load_percelen()
+        # eerst openstaande writes afronden, anders overschrijft de oude sessie-inhoud ze later
+        wachtrij.wacht(sessie_tracker(), timeout=10)
+        wachtrij.vergeet(sessie_tracker())
+        st.session_state.pop("percelen", None)
         st.success(_("Percelen zijn opnieuw geladen."))
         st.session_state.pop("skip_load", None)
-        st.rerun()
+        rerun()
 
 # --- 📍 Perceel selectie ---
-percelen = st.session_state.get("percelen", [])
-locaties = [p.get("locatie", _("Perceel {i}")).format(i=i+1) for i, p in enumerate(percelen)]
+locaties = [p.get("locatie", _("Perceel {i}")).format(i=i+1) for i, p in enumerate(samenvattingen)]
 
 if "active_locatie" not in st.session_state and locaties:
     st.session_state["active_locatie"] = locaties[0]
@@ -783,42 +982,47 @@ for rij in chunk(locaties, per_row):
         with col:
             if st.button(f"📍 {loc}", key=f"btn_{loc}", use_container_width=True):
                 st.session_state["active_locatie"] = loc
-                st.rerun()
+                rerun()
 
 st.markdown("</div>", unsafe_allow_html=True)
 
 # Keuze ophalen
 keuze = st.session_state.get("active_locatie")
 
+# Alleen het gekozen perceel volledig (opnieuw) laden; niet zolang het
+# lokale, nog niet bevestigde wijzigingen heeft (skip_load)
+gekozen = next((s for s in samenvattingen if s.get("locatie") == keuze), None)
+if gekozen and gekozen.get("perceel_id") not in lokaal_gewijzigd():
+    ververs_gekozen_perceel(gekozen)
+percelen = st.session_state.get("percelen", [])
+
 # ===== Centrale afhandeling van ?del= en ?delask= =====
 _qp = get_qp()
 if "del" in _qp:
     try:
         idx = int(_qp["del"])
         if 0 <= idx < len(st.session_state["percelen"]):
-            save_state()
             st.session_state["percelen"].pop(idx)
-            store.save_percelen(prepare_percelen_for_saving(st.session_state["percelen"]))
+            sla_percelen_op()
             st.success(_("Perceel verwijderd."))
     except Exception:
         st.error(_("Verwijderen mislukt."))
     set_qp()
-    st.rerun()
+    rerun()
 elif "delask" in _qp:
     pass
 
-# --- Toon alleen het geselecteerde perceel ---
-for i, perceel in enumerate(percelen):
-    if not isinstance(perceel, dict):
-        st.warning(_("Percel op index {i} is ongeldig en wordt overgeslagen.").format(i=i))
-        continue
+# --- Toon alleen het geselecteerde perceel (plek via het PortfolioFrame) ---
+gekozen_positie = portfolio_frame().positie(keuze) if keuze else None
+if gekozen_positie is None or gekozen_positie >= len(percelen) or percelen[gekozen_positie].get("locatie") != keuze:
+    gekozen_positie = next(
+        (j for j, p in enumerate(percelen) if isinstance(p, dict) and p.get("locatie") == keuze), None
+    )
 
+for i, perceel in ([(gekozen_positie, percelen[gekozen_positie])] if gekozen_positie is not None else []):
     perceel.setdefault("uploads", {})
     perceel.setdefault("uploads_urls", {})
 
-    if perceel.get("locatie") != keuze:
-        continue
-
     huidige_fase = perceel.get("dealstage", _("Aankoop"))
 
     with st.expander(
@@ -836,7 +1040,7 @@ for i, perceel in enumerate(percelen):
 
         if st.button(_("🔍 Zoom in op {loc}").format(loc=perceel.get("locatie")), key=f"zoom_knop_{i}"):
             st.session_state["kaart_focus_buffer"] = perceel.get("polygon")
-            st.rerun()
+            rerun()
 
         if perceel.get("investeerders"):
             st.warning(_("ℹ️ Dit perceel heeft **externe investeerders**."))
@@ -983,8 +1187,8 @@ for i, perceel in enumerate(percelen):
                 "agreement_link": ""
             })
         
-            st.session_state["skip_load"] = True
-            st.rerun()
+            markeer_lokaal([perceel])
+            rerun()
 
         # 📋 Documenten
         st.markdown("#### " + _("📋 Documenten"))
@@ -1034,17 +1238,17 @@ for i, perceel in enumerate(percelen):
                 vorige_fase = _PIPELINE_FASEN[fase_index - 1]
                 if st.button(_("⬅️ Vorige fase ({fase})").format(fase=vorige_fase), key=f"vorige_fase_{i}"):
                     perceel["dealstage"] = vorige_fase
-                    store.save_percelen(prepare_percelen_for_saving(st.session_state["percelen"]))
-                    st.session_state["skip_load"] = True
-                    st.rerun()
+                    sla_percelen_op()
+                    markeer_lokaal([perceel])
+                    rerun()
         with col_f2:
             if fase_index < len(_PIPELINE_FASEN) - 1:
                 volgende_fase = _PIPELINE_FASEN[fase_index + 1]
                 if st.button(_("➡️ Volgende fase ({fase})").format(fase=volgende_fase), key=f"volgende_fase_{i}"):
                     perceel["dealstage"] = volgende_fase
-                    store.save_percelen(prepare_percelen_for_saving(st.session_state["percelen"]))
-                    st.session_state["skip_load"] = True
-                    st.rerun()
+                    sla_percelen_op()
+                    markeer_lokaal([perceel])
+                    rerun()
 
         # Verkoopgegevens (gerealiseerd) — alleen bij fase Verkocht
         if huidige_fase == _("Verkocht"):
@@ -1354,6 +1558,31 @@ for i, perceel in enumerate(percelen):
             st.success(_("📈 Netto verwachte winst: € {v:,.2f}").format(v=perceel["verwachte_winst_eur"]))
 
 
+        # 🕘 Wijzigingshistorie uit het journaal
+        if st.checkbox(_("🕘 Wijzigingshistorie tonen"), key=f"historie_{i}"):
+            regels = store.journaal(perceel.get("perceel_id"), limiet=20)
+            if not regels:
+                st.caption(_("Nog geen wijzigingen vastgelegd."))
+            for regel in regels:
+                col_h1, col_h2 = st.columns([8, 2])
+                with col_h1:
+                    st.markdown(
+                        f"**{str(regel.get('tijd', ''))[:19]}** · {regel.get('soort')} · "
+                        f"{regel.get('gebruiker') or '-'} · {', '.join(gewijzigde_velden(regel))}"
+                    )
+                with col_h2:
+                    if is_admin and regel.get("soort") != "verwijderd" and st.button(
+                        _("Herstel"), key=f"herstel_{i}_{regel['seq']}"
+                    ):
+                        doc = store.perceel_op(perceel["perceel_id"], regel["seq"])
+                        if doc is None:
+                            st.warning(_("Deze versie kan niet hersteld worden."))
+                        else:
+                            perceel.clear()
+                            perceel.update(bereid_percelen_voor([doc])[0])
+                            sla_percelen_op(cache_wissen=True)
+                            rerun()
+
         # Admin-sectie: opslaan & perceel verwijderen
         if is_admin:
             col1, col2 = st.columns([8, 2])
@@ -1366,13 +1595,7 @@ for i, perceel in enumerate(percelen):
                     key=f"opslaan_bewerken_{i}"
                 ):
                     try:
-                        store.save_percelen(
-                            prepare_percelen_for_saving(
-                                st.session_state["percelen"]
-                            )
-                        )
-        
-                        st.cache_data.clear()
+                        sla_percelen_op(cache_wissen=True)
         
                         st.success(
                             _("Wijzigingen aan {loc} opgeslagen.").format(
@@ -1401,14 +1624,10 @@ for i, perceel in enumerate(percelen):
         
                                 st.session_state["percelen"].pop(i)
         
-                                store.save_percelen(
-                                    prepare_percelen_for_saving(st.session_state["percelen"])
-                                )
-        
-                                st.cache_data.clear()
+                                sla_percelen_op(cache_wissen=True)
                                 st.session_state.pop(confirm_key, None)
                                 st.success(_("Perceel verwijderd."))
-                                st.rerun()
+                                rerun()
         
                         with c2:
                             if st.button(_("↩ Nee, annuleren"), key=f"cancel_delete_{i}"):
@@ -1463,10 +1682,9 @@ for i, perceel in enumerate(percelen):
                         "datum": new_dt.isoformat(),   # opslaan in ISO (2025-09-19)
                         "tekst": new_txt.strip()
                     })
-                    store.save_percelen(prepare_percelen_for_saving(st.session_state["percelen"]))
-                    st.cache_data.clear()
+                    sla_percelen_op(cache_wissen=True)
                     st.success("✅ Update toegevoegd en opgeslagen.")
-                    st.rerun()
+                    rerun()
                 else:
                     st.warning("⚠️ Voer eerst een notitie in.")
 
@@ -1498,10 +1716,9 @@ for i, perceel in enumerate(percelen):
                         with k3:
                             if st.button("🗑", key=f"status_del_{i}_{j}"):
                                 perceel["status_updates"].pop(j)
-                                store.save_percelen(prepare_percelen_for_saving(st.session_state["percelen"]))
-                                st.cache_data.clear()
+                                sla_percelen_op(cache_wissen=True)
                                 st.success("✅ Notitie verwijderd.")
-                                st.rerun()
+                                rerun()
 
                     # notitietekst alleen tonen bij openen
                     if st.session_state.get(note_key, False):
@@ -1513,6 +1730,9 @@ for i, perceel in enumerate(percelen):
                         )
                         upd["tekst"] = nieuwe_txt
 
+    # de widgets hierboven wijzigen het perceel direct: frame- en memo-sleutels bijwerken
+    sessie_journaal().raak_aan(perceel)
+
 
             
 
@@ -1563,8 +1783,6 @@ else:
     toevoegen = False
 
 if is_admin and toevoegen:
-    store.save_percelen(prepare_percelen_for_saving(st.session_state["percelen"]))
-
     if not locatie:
         st.sidebar.error(_("❗ Vul een locatie in."))
     elif any(p.get("locatie") == locatie for p in st.session_state["percelen"]):
@@ -1661,12 +1879,89 @@ if is_admin and toevoegen:
         }
 
         st.session_state.percelen.append(perceel)
-        store.save_percelen(prepare_percelen_for_saving(st.session_state["percelen"]))
+        sla_percelen_op(cache_wissen=True)
         st.sidebar.success(_("Perceel '{loc}' toegevoegd en opgeslagen.").format(loc=locatie))
 
-        st.session_state["skip_load"] = False
-        st.cache_data.clear()
-        st.rerun()
+        rerun()
+
+# 📥 Bulkimport uit CSV/Excel (alleen admin)
+if is_admin:
+    with st.sidebar.expander(_("📥 Bulkimport (CSV/Excel)")):
+        st.caption(_("Eén rij per perceel; kolommen en notaties: zie bulk_import.py. Hoekpunten als x1/y1 … xN/yN (UTM of lon/lat)."))
+        if st.session_state.get("bulkimport_conflicten"):
+            st.warning(_("Niet geïmporteerd (conflict met een bestaand perceel): {lijst}").format(
+                lijst="; ".join(c.get("locatie") or c["perceel_id"] for c in st.session_state["bulkimport_conflicten"])))
+        bestand = st.file_uploader(_("Bestand"), type=["csv", "xlsx"], key="bulkimport_bestand")
+        import_coordinaten = st.radio(_("Coördinatentype"), ["auto", "utm", "latlon"], horizontal=True,
+                                      key="bulkimport_coordinaten")
+        if bestand is not None:
+            sleutel = (bestand.file_id, wisselkoers, import_coordinaten)
+            if st.session_state.get("bulkimport", {}).get("sleutel") != sleutel:
+                try:
+                    df_import = bulk_import.lees_bestand(bestand)
+                except Exception as e:
+                    st.error(_("Bestand niet te lezen: {fout}").format(fout=e))
+                    df_import = None
+                if df_import is not None:
+                    bestaande = [p.get("locatie") for p in samenvattingen] + [
+                        p.get("locatie") for p in st.session_state["percelen"] if isinstance(p, dict)
+                    ]
+                    import_percelen, import_fouten = bulk_import.valideer(
+                        df_import, wisselkoers, import_coordinaten, bestaande
+                    )
+                    st.session_state["bulkimport"] = {
+                        "sleutel": sleutel, "rijen": len(df_import),
+                        "percelen": import_percelen, "fouten": import_fouten,
+                    }
+
+            resultaat = st.session_state.get("bulkimport", {})
+            if resultaat.get("sleutel") == sleutel:
+                st.write(_("{n} rijen: {geldig} geldig, {fout} met fouten").format(
+                    n=resultaat["rijen"], geldig=len(resultaat["percelen"]),
+                    fout=resultaat["fouten"]["rij"].nunique(),
+                ))
+                if len(resultaat["fouten"]):
+                    st.dataframe(resultaat["fouten"], hide_index=True, use_container_width=True)
+                if resultaat["percelen"]:
+                    st.dataframe(
+                        pd.DataFrame(resultaat["percelen"])[
+                            ["locatie", "aankoopdatum", "aankoopprijs_eur", "aankoopprijs", "dealstage"]
+                        ].head(50),
+                        hide_index=True, use_container_width=True,
+                    )
+                    if st.button(_("📥 Importeer {n} percelen").format(n=len(resultaat["percelen"])),
+                                 key="bulkimport_start"):
+                        balk = st.progress(0.0)
+                        st.session_state.pop("bulkimport_conflicten", None)
+
+                        def neem_geimporteerd_over(geschreven: list[dict]):
+                            # opgeslagen met de sessietracker: direct in de sessie, geen undo-stap;
+                            # zonder dit ziet de tracker ze bij de volgende opslag als verwijderd
+                            nieuw = bereid_percelen_voor(geschreven, sessie_tracker())
+                            st.session_state["percelen"].extend(nieuw)
+                            sessie_journaal().neem_over(nieuw)
+                            coordinator.vraag_cache_wissen()
+
+                        try:
+                            totaal = bulk_import.importeer(
+                                resultaat["percelen"], tracker=sessie_tracker(),
+                                voortgang=lambda klaar, alle: balk.progress(klaar / alle),
+                            )
+                        except bulk_import.ImportOnderbroken as e:
+                            neem_geimporteerd_over(e.percelen)
+                            st.session_state.pop("bulkimport", None)
+                            st.error(_("Import mislukt na {n} percelen: {fout}. De eerder geïmporteerde percelen "
+                                       "zijn opgeslagen; importeer de rest opnieuw.").format(
+                                n=len(e.percelen), fout=e.__cause__))
+                        except Exception as e:
+                            st.error(_("Import mislukt: {fout}").format(fout=e))
+                        else:
+                            neem_geimporteerd_over(totaal["percelen"])
+                            st.session_state.pop("bulkimport", None)
+                            if totaal["onopgelost"]:
+                                st.session_state["bulkimport_conflicten"] = totaal["onopgelost"]
+                            st.success(_("✅ {n} percelen geïmporteerd.").format(n=len(totaal["percelen"])))
+                            rerun()
 
 # ==== Groq-chatblok – Percelenbeheer =========================================
 
@@ -1705,16 +2000,16 @@ with tab_chat:
 
     def _resolve_loc(name: str):
         """Exact → fuzzy → None. Return (perceel_dict, suggestie)."""
-        for p in _percelen_norm():
-            if (p.get("locatie","").lower().strip() == (name or "").lower().strip()):
-                return p, None
-        guess = _closest_loc(name)
-        if guess:
-            for p in _percelen_norm():
-                if p.get("locatie")==guess:
-                    return p, None
-            return None, guess
-        return None, None
+        frame = portfolio_frame()
+        pos = frame.positie(name)
+        if pos is None:
+            guess = _closest_loc(name)
+            if not guess:
+                return None, None
+            pos = frame.positie(guess)
+            if pos is None:
+                return None, guess
+        return _normalize_perceel(_percelen_raw()[pos]), None
 
     def _parse_loc_list(txt: str) -> list[str]:
         """Sta lijsten toe: 'Sanyang 1, Kunkujang 2 en Tanji' → ['Sanyang 1','Kunkujang 2','Tanji']"""
@@ -1841,33 +2136,11 @@ with tab_chat:
 
     # ---------- Extra tools: geo & metrics ----------
     def get_totale_winst():
-        ps = _percelen_norm()
-        opb = sum(float(p.get("verwachte_opbrengst_eur") or 0) for p in ps)
-        kos = sum(float(p.get("verwachte_kosten_eur") or 0) for p in ps)
-        ank = sum(float(p.get("aankoopprijs_eur") or 0) for p in ps)
-        return {"opbrengst": opb, "kosten": kos, "aankoop": ank, "winst": opb - kos - ank}
+        return portfolio_frame().totalen()
 
     def find_deadlines(days: int = 30):
-        ps = _percelen_raw()
-        today = date.today()
-        due = []
-        for p in ps:
-            d = p.get("doorlooptijd")
-            if not d:
-                continue
-            try:
-                dt = datetime.fromisoformat(d).date()
-                delta = (dt - today).days
-                if delta <= days:
-                    due.append({
-                        "locatie": p.get("locatie"),
-                        "fase": p.get("dealstage"),
-                        "einddatum": d,
-                        "dagen_tot": delta
-                    })
-            except Exception:
-                pass
-        return {"horizon_dagen": days, "items": sorted(due, key=lambda x: x["dagen_tot"])}
+        items = portfolio_frame().deadlines(int(days)).to_dict("records")
+        return {"horizon_dagen": days, "items": items}
 
     def score_readiness():
         req = _get_doc_requirements()
@@ -1908,19 +2181,8 @@ with tab_chat:
         return {"locatie": p.get("locatie"), "fase": p.get("dealstage"), "docs": docs}
 
     def simulate_fx(delta_pct: float = -10):
-        ps = _percelen_norm()
-        out = []
-        for p in ps:
-            opb = float(p.get("verwachte_opbrengst_eur") or 0)
-            kos = float(p.get("verwachte_kosten_eur") or 0)
-            ank = float(p.get("aankoopprijs_eur") or 0)
-            opb_new = opb * (1 + delta_pct/100.0)
-            out.append({
-                "locatie": p.get("locatie"),
-                "winst_oud": opb - kos - ank,
-                "winst_nieuw": round(opb_new - kos - ank, 2)
-            })
-        return {"delta_pct": delta_pct, "items": out}
+        items = portfolio_frame().fx_scenario(float(delta_pct)).to_dict("records")
+        return {"delta_pct": delta_pct, "items": items}
 
     def get_coordinaten(locatie: str):
         p, sug = _resolve_loc(locatie)
@@ -2014,13 +2276,7 @@ with tab_chat:
         return {"adviezen": out}
 
     def rank_by(field: str = "verwachte_winst_eur", n: int = 5, desc: bool = True):
-        ps = _percelen_norm()
-        rows = []
-        for p in ps:
-            val = float(p.get(field) or 0)
-            rows.append({"locatie": p.get("locatie"), field: val})
-        rows.sort(key=lambda r: r[field], reverse=bool(desc))
-        return {"veld": field, "top": rows[:max(1, int(n))]}
+        return {"veld": field, "top": portfolio_frame().rangschik(field, int(n), bool(desc))}
 
     # ---------- Mapping functies ----------
     FUNCTIONS = {
@@ -2234,7 +2490,7 @@ with tab_chat:
                     with c1:
                         if st.button(_("🔍 Zoom op kaart"), key=f"zoom_{fargs['locatie']}"):
                             FUNCTIONS["focus_map_perceel"](locatie=fargs["locatie"])
-                            st.rerun()
+                            rerun()
                     with c2:
                         st.write(_("📄 Typ: documenten van {loc}").format(loc=fargs["locatie"]))
                     with c3:
@@ -2246,7 +2502,5 @@ with tab_chat:
 
 # ==== einde Groq-chatblok – Percelenbeheer ====================================
 
-
-
-
-
+# 💾 openstaande opslagverzoeken van deze run
+coordinator.flush()
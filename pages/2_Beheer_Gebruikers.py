@@ -1,6 +1,7 @@
 import streamlit as st
 import json
 import os
+import memo
 from auth import login_check
 from utils import language_selector  # ✅ vertalingen importeren
 
@@ -66,3 +67,32 @@ if st.button(_("Gebruiker toevoegen")):
         st.success(_("Gebruiker '{naam}' toegevoegd.").format(naam=nieuwe_naam))
         st.rerun()
 
+
+st.divider()
+st.subheader(_("📶 Supabase-verbindingen"))
+
+# latency per endpoint van dit proces (gedeelde client, zie supabase_client.py)
+from supabase_client import metingen
+
+overzicht = metingen.overzicht()
+if overzicht:
+    st.dataframe(overzicht, hide_index=True, use_container_width=True)
+    if st.button(_("Metingen wissen")):
+        metingen.wis()
+        st.rerun()
+else:
+    st.caption(_("Nog geen Supabase-aanroepen in dit proces."))
+
+
+st.divider()
+st.subheader(_("🧮 Analysecache"))
+
+# hits/misses per gememoiseerde analysefunctie van dit proces (zie memo.py)
+stand = memo.overzicht()
+if any(r["hits"] or r["misses"] for r in stand):
+    st.dataframe(stand, hide_index=True, use_container_width=True)
+    if st.button(_("Analysecache legen")):
+        memo.wis_alle(tellers=True)
+        st.rerun()
+else:
+    st.caption(_("Nog geen analyses in dit proces."))
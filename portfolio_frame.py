@@ -0,0 +1,154 @@
+"""
+De portfolio als kolommen.
+
+Een PortfolioFrame zet een lijst percelen één keer om naar een DataFrame
+met vaste dtypes (index op perceel_id, `positie` = plek in de lijst) plus
+de polygonpunten als losse lat/lon-kolommen. Totalen, rangschikkingen,
+scenario's en kaartgrenzen zijn daarna vectoroperaties in plaats van een
+lus met `float(p.get(...) or 0)` per aanroep.
+
+`portfolio_frame()` bewaart het frame per sessie en bouwt het alleen
+opnieuw als de versie van de lijst verandert (standaard: dezelfde lijst,
+lengte en journaalversie, zie SessieJournaal.versie).
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from journaal import sessie_journaal
+
+# Kolommen en dtype; ontbrekende of onleesbare bedragen worden 0 (zoals in de tools)
+BEDRAGEN = (
+    "lengte", "breedte", "aankoopprijs", "aankoopprijs_eur", "verkoopprijs_eur", "wisselkoers",
+    "verwachte_opbrengst_eur", "verwachte_kosten_eur", "verwachte_winst_eur",
+)
+TEKSTEN = ("locatie", "dealstage", "strategie", "eigendomstype")
+DATUMS = ("aankoopdatum", "verkoopdatum", "doorlooptijd")
+
+
+def _datums(waarden: list) -> pd.Series:
+    """ISO (ook met tijd) en DD-MM-YYYY; de rest wordt NaT."""
+    tekst = pd.Series(waarden, dtype="string").str.strip()
+    uitkomst = pd.to_datetime(tekst.str.slice(0, 10), format="%Y-%m-%d", errors="coerce")
+    open_ = uitkomst.isna() & tekst.notna()
+    if open_.any():
+        uitkomst = uitkomst.fillna(pd.to_datetime(tekst.where(open_), format="%d-%m-%Y", errors="coerce"))
+    return uitkomst
+
+
+class PortfolioFrame:
+    """Kolommen van een lijst percelen, met index op perceel_id."""
+
+    def __init__(self, percelen: list):
+        lijst = [p for p in percelen if isinstance(p, dict)]
+        posities = [i for i, p in enumerate(percelen) if isinstance(p, dict)]
+
+        kolommen = {"positie": np.asarray(posities, dtype="int64")}
+        for k in TEKSTEN:
+            # object met None i.p.v. NA: de tools geven de waarden als JSON door
+            kolommen[k] = pd.Series([p.get(k) if isinstance(p.get(k), str) else None for p in lijst], dtype=object)
+        for k in BEDRAGEN:
+            kolommen[k] = pd.to_numeric(pd.Series([p.get(k) for p in lijst], dtype=object),
+                                        errors="coerce").fillna(0.0).to_numpy(dtype="float64")
+        for k in DATUMS:
+            kolommen[k] = _datums([p.get(k) for p in lijst]).to_numpy()
+        kolommen["aantal_investeerders"] = np.asarray(
+            [len(p.get("investeerders") or []) if isinstance(p.get("investeerders"), list) else 0 for p in lijst],
+            dtype="int64",
+        )
+
+        self.df = pd.DataFrame(kolommen)
+        self.df.index = pd.Index([p.get("perceel_id") for p in lijst], name="perceel_id")
+        self.df["winst"] = (
+            self.df["verwachte_opbrengst_eur"] - self.df["verwachte_kosten_eur"] - self.df["aankoopprijs_eur"]
+        )
+        self._locaties = self.df["locatie"].astype("string").str.lower().str.strip()
+        self.percelen = lijst
+
+        # polygonpunten: één rij per punt, met de positie van het perceel
+        rij, lat, lon = [], [], []
+        for positie, p in zip(posities, lijst):
+            for punt in p.get("polygon") or []:
+                if isinstance(punt, (list, tuple)) and len(punt) == 2:
+                    rij.append(positie)
+                    lat.append(punt[0])
+                    lon.append(punt[1])
+        self.punten = pd.DataFrame({
+            "positie": np.asarray(rij, dtype="int64"),
+            "lat": pd.to_numeric(pd.Series(lat, dtype=object), errors="coerce").to_numpy(dtype="float64"),
+            "lon": pd.to_numeric(pd.Series(lon, dtype=object), errors="coerce").to_numpy(dtype="float64"),
+        }).dropna()
+
+    def __len__(self):
+        return len(self.df)
+
+    def positie(self, locatie: str) -> int | None:
+        """Plek in de lijst van het perceel met deze locatie (hoofdletterongevoelig)."""
+        treffers = np.flatnonzero((self._locaties == (locatie or "").lower().strip()).fillna(False).to_numpy())
+        return int(self.df["positie"].iat[treffers[0]]) if len(treffers) else None
+
+    def totalen(self) -> dict:
+        """Som van opbrengst, kosten, aankoop en winst (EUR)."""
+        opb, kos, ank = self.df[["verwachte_opbrengst_eur", "verwachte_kosten_eur", "aankoopprijs_eur"]].sum()
+        return {"opbrengst": float(opb), "kosten": float(kos), "aankoop": float(ank), "winst": float(opb - kos - ank)}
+
+    def rangschik(self, veld: str, n: int = 5, aflopend: bool = True) -> list[dict]:
+        """Top-n op een kolom (of een ander veld van de percelen); niet-numeriek telt als 0."""
+        if veld in self.df.columns:
+            waarden = self.df[veld]
+        else:
+            waarden = pd.Series([p.get(veld) for p in self.percelen], index=self.df.index, dtype=object)
+        waarden = pd.to_numeric(waarden, errors="coerce").fillna(0.0)
+        volgorde = np.argsort(-waarden.to_numpy() if aflopend else waarden.to_numpy(), kind="stable")[:max(1, n)]
+        return [
+            {"locatie": self.df["locatie"].iat[i], veld: float(waarden.iat[i])}
+            for i in volgorde
+        ]
+
+    def fx_scenario(self, delta_pct: float) -> pd.DataFrame:
+        """Winst nu en bij een opbrengst die `delta_pct` procent verschuift."""
+        nieuw = self.df["verwachte_opbrengst_eur"] * (1 + delta_pct / 100.0)
+        return pd.DataFrame({
+            "locatie": self.df["locatie"],
+            "winst_oud": self.df["winst"],
+            "winst_nieuw": (nieuw - self.df["verwachte_kosten_eur"] - self.df["aankoopprijs_eur"]).round(2),
+        })
+
+    def deadlines(self, dagen: int, vandaag: date | None = None) -> pd.DataFrame:
+        """Percelen met een einddatum (doorlooptijd) binnen `dagen` dagen, ook verlopen."""
+        vandaag = pd.Timestamp(vandaag or date.today())
+        dagen_tot = (self.df["doorlooptijd"] - vandaag).dt.days
+        masker = dagen_tot.notna() & (dagen_tot <= dagen)
+        return pd.DataFrame({
+            "locatie": self.df["locatie"][masker],
+            "fase": self.df["dealstage"][masker],
+            "einddatum": self.df["doorlooptijd"][masker].dt.strftime("%Y-%m-%d"),
+            "dagen_tot": dagen_tot[masker].astype("int64"),
+        }).sort_values("dagen_tot", kind="stable")
+
+    def grenzen(self) -> list[list[float]] | None:
+        """[[min_lat, min_lon], [max_lat, max_lon]] van alle polygonpunten."""
+        if self.punten.empty:
+            return None
+        lat, lon = self.punten["lat"], self.punten["lon"]
+        return [[float(lat.min()), float(lon.min())], [float(lat.max()), float(lon.max())]]
+
+
+def portfolio_frame(percelen: list | None = None, versie=None, sleutel: str = "portfolio_frame") -> PortfolioFrame:
+    """
+    PortfolioFrame van `percelen` (standaard de percelen van de sessie),
+    per sessie onder `sleutel` bewaard zolang `versie` gelijk blijft.
+    """
+    if percelen is None:
+        percelen = st.session_state.get("percelen", []) or []
+    if versie is None:
+        versie = (id(percelen), sessie_journaal().versie, len(percelen))
+
+    bewaard = st.session_state.get(sleutel)
+    if bewaard is None or bewaard[0] != versie:
+        # de lijst blijft bewaard zodat zijn id niet hergebruikt kan worden
+        bewaard = (versie, PortfolioFrame(percelen), percelen)
+        st.session_state[sleutel] = bewaard
+    return bewaard[1]
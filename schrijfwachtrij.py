@@ -0,0 +1,290 @@
+"""
+Write-behind voor percelen.
+
+Knoppen in Percelenbeheer zetten hun wijzigingen in de wachtrij en gaan
+direct verder; één achtergrondthread per proces schrijft ze weg via
+DataStore.schrijf. Meerdere wijzigingen aan hetzelfde perceel kort na
+elkaar worden samengevoegd tot één write (alleen de laatste inhoud telt).
+Mislukte writes worden met oplopende wachttijd opnieuw geprobeerd; de
+status (wachtend / mislukt) is per sessie op te vragen voor de sidebar.
+"""
+import atexit
+import json
+import logging
+import threading
+import time
+import weakref
+
+from datastore import store, DataStore, PerceelTracker, OpslagConflict, merge_velden, perceel_json
+from logboek import logger, gebeurtenis
+
+log = logger("schrijfwachtrij")
+
+# Pogingen per write voordat die als mislukt geldt
+MAX_POGINGEN = 5
+
+# Wachttijd na de eerste mislukte poging (seconden); verdubbelt per poging
+WACHTTIJD = 0.5
+MAX_WACHTTIJD = 30.0
+
+
+class SchrijfWachtrij:
+    """Wachtrij per (tracker, perceel_id) met één schrijvende thread."""
+
+    def __init__(self, datastore: DataStore, max_pogingen: int = MAX_POGINGEN, wachttijd: float = WACHTTIJD):
+        self.datastore = datastore
+        self.max_pogingen = max_pogingen
+        self.wachttijd = wachttijd
+
+        self._cond = threading.Condition()
+        self._thread = None
+        # (tracker.sleutel, perceel_id) → item; tekst None = verwijderen.
+        # Wachtende writes houden hun tracker vast (ze moeten nog weg), mislukte
+        # niet: die worden opgeruimd zodra de sessie en haar tracker weg zijn.
+        self._wachtend = {}
+        self._onderweg = {}
+        self._mislukt = {}
+        # tracker.sleutel → {perceel_id: (verstuurde tekst, samengevoegd document)}
+        self._samengevoegd = {}
+        # sleutels met een weakref.finalize die hun resten opruimt
+        self._gevolgd = set()
+
+    # --- vanuit de sessie -----------------------------------------------
+    def plaats(self, percelen, tracker: PerceelTracker) -> int:
+        """
+        Zet de sinds de laatste bevestiging gewijzigde en verwijderde
+        percelen in de wachtrij. Returnt het aantal nieuwe writes.
+        """
+        self.pas_toe(percelen, tracker)
+        delta = tracker.delta(percelen)
+
+        nieuw = 0
+        with self._cond:
+            for item in delta["gewijzigd"]:
+                nieuw += self._zet(tracker, item["perceel_id"], item["tekst"], item["perceel"])
+            for item in delta["verwijderd"]:
+                nieuw += self._zet(tracker, item["perceel_id"], None, None)
+            if nieuw:
+                self._start()
+                self._cond.notify_all()
+        return nieuw
+
+    def pas_toe(self, percelen, tracker: PerceelTracker) -> list:
+        """
+        Neem samengevoegde documenten (na een conflict met een andere sessie)
+        over in de sessie. Wat de gebruiker na het versturen nog wijzigde,
+        blijft staan. Returnt de bijgewerkte percelen.
+        """
+        with self._cond:
+            docs = self._samengevoegd.pop(tracker.sleutel, {})
+        if not docs:
+            return []
+
+        bijgewerkt = []
+        for perceel in percelen:
+            if not isinstance(perceel, dict) or perceel.get("perceel_id") not in docs:
+                continue
+            verstuurd, hun = docs[perceel["perceel_id"]]
+            mijn = json.loads(perceel_json(perceel))
+            samengevoegd, _velden = merge_velden(json.loads(verstuurd), mijn, hun)
+            perceel.clear()
+            perceel.update(samengevoegd)
+            bijgewerkt.append(perceel)
+        return bijgewerkt
+
+    def status(self, tracker: PerceelTracker) -> dict:
+        """{"wachtend": n, "mislukt": [{perceel_id, locatie, fout}]} voor deze sessie."""
+        t = tracker.sleutel
+        with self._cond:
+            wachtend = sum(1 for k in list(self._wachtend) + list(self._onderweg) if k[0] == t)
+            mislukt = [
+                {"perceel_id": k[1], "locatie": (item["perceel"] or {}).get("locatie"), "fout": item["fout"]}
+                for k, item in self._mislukt.items()
+                if k[0] == t
+            ]
+        return {"wachtend": wachtend, "mislukt": mislukt}
+
+    def bezig(self, tracker: PerceelTracker, perceel_id: str) -> bool:
+        """Staat er voor dit perceel nog een write open?"""
+        sleutel = (tracker.sleutel, perceel_id)
+        with self._cond:
+            return sleutel in self._wachtend or sleutel in self._onderweg
+
+    def openstaand(self, tracker: PerceelTracker) -> set:
+        """perceel_ids van deze sessie die nog niet (of niet) in de opslag staan: wachtend, onderweg of mislukt."""
+        t = tracker.sleutel
+        with self._cond:
+            return {k[1] for k in [*self._wachtend, *self._onderweg, *self._mislukt] if k[0] == t}
+
+    def opnieuw(self, tracker: PerceelTracker) -> int:
+        """Zet de mislukte writes van deze sessie opnieuw in de wachtrij."""
+        t = tracker.sleutel
+        with self._cond:
+            sleutels = [k for k in self._mislukt if k[0] == t]
+            for k in sleutels:
+                item = self._mislukt.pop(k)
+                item.update(tracker=tracker, pogingen=0, na=0.0, fout=None)
+                self._wachtend.setdefault(k, item)
+            if sleutels:
+                self._start()
+                self._cond.notify_all()
+        return len(sleutels)
+
+    def vergeet(self, tracker: PerceelTracker):
+        """Laat mislukte writes en samengevoegde documenten van deze sessie los (bij opnieuw laden)."""
+        self._ruim_op(tracker.sleutel)
+
+    def wacht(self, tracker: PerceelTracker | None = None, timeout: float | None = None) -> bool:
+        """Wacht tot alle (of alle writes van `tracker`) verwerkt zijn. False bij timeout."""
+        einde = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while any(tracker is None or k[0] == tracker.sleutel for k in list(self._wachtend) + list(self._onderweg)):
+                rest = None if einde is None else einde - time.monotonic()
+                if rest is not None and rest <= 0:
+                    return False
+                self._cond.wait(rest)
+        return True
+
+    # --- intern -----------------------------------------------------------
+    def _ruim_op(self, t: str):
+        with self._cond:
+            for k in [k for k in self._mislukt if k[0] == t]:
+                del self._mislukt[k]
+            self._samengevoegd.pop(t, None)
+
+    def _volg(self, tracker: PerceelTracker):
+        """Ruim de resten van een sessie op als haar tracker wordt opgeruimd."""
+        if tracker.sleutel not in self._gevolgd:
+            self._gevolgd.add(tracker.sleutel)
+            weakref.finalize(tracker, self._vergeet_sleutel, tracker.sleutel)
+
+    def _vergeet_sleutel(self, t: str):
+        self._ruim_op(t)
+        with self._cond:
+            self._gevolgd.discard(t)
+
+    def _mislukt_zetten(self, k, item):
+        # zonder tracker: een mislukte write houdt de sessie niet in leven
+        item["tracker"] = None
+        self._mislukt[k] = item
+
+    def _zet(self, tracker, perceel_id, tekst, perceel) -> int:
+        self._volg(tracker)
+        sleutel = (tracker.sleutel, perceel_id)
+        huidig = self._wachtend.get(sleutel)
+        if huidig is not None and huidig["tekst"] == tekst:
+            return 0
+        if huidig is None and sleutel in self._onderweg and self._onderweg[sleutel] == tekst:
+            return 0
+        mislukt = self._mislukt.get(sleutel)
+        if mislukt is not None:
+            if mislukt["tekst"] == tekst:
+                # dezelfde inhoud is al mislukt: pas weer na "opnieuw proberen"
+                return 0
+            del self._mislukt[sleutel]
+
+        self._wachtend[sleutel] = {
+            "tracker": tracker,
+            "perceel_id": perceel_id,
+            "tekst": tekst,
+            "perceel": perceel,
+            "pogingen": 0,
+            "na": 0.0,
+            "fout": None,
+        }
+        return 1
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._werk, name="schrijfwachtrij", daemon=True)
+            self._thread.start()
+
+    def _volgende_batch(self) -> dict:
+        with self._cond:
+            while True:
+                nu = time.monotonic()
+                klaar = {k: item for k, item in self._wachtend.items() if item["na"] <= nu}
+                if klaar:
+                    break
+                eerste = min((item["na"] for item in self._wachtend.values()), default=None)
+                self._cond.wait(None if eerste is None else max(eerste - nu, 0.01))
+            for k, item in klaar.items():
+                del self._wachtend[k]
+                self._onderweg[k] = item["tekst"]
+        return klaar
+
+    def _werk(self):
+        while True:
+            klaar = self._volgende_batch()
+
+            per_tracker = {}
+            for k, item in klaar.items():
+                per_tracker.setdefault(k[0], []).append((k, item))
+
+            for items in per_tracker.values():
+                try:
+                    self._schrijf(items)
+                except Exception as e:
+                    gebeurtenis(log, "onverwachte_fout", logging.ERROR, exc_info=True, fout=repr(e))
+
+            with self._cond:
+                for k in klaar:
+                    self._onderweg.pop(k, None)
+                self._cond.notify_all()
+
+    def _schrijf(self, items):
+        tracker = items[0][1]["tracker"]
+
+        # versies pas nu lezen: eerdere writes uit de wachtrij zijn dan bevestigd
+        gewijzigd = [
+            {
+                "perceel_id": item["perceel_id"],
+                "perceel": item["perceel"],
+                "versie": tracker.versie(item["perceel_id"]),
+                "tekst": item["tekst"],
+            }
+            for _k, item in items
+            if item["tekst"] is not None
+        ]
+        verwijderd = [
+            {"perceel_id": item["perceel_id"], "versie": tracker.versie(item["perceel_id"])}
+            for _k, item in items
+            if item["tekst"] is None
+        ]
+
+        try:
+            _totaal, samengevoegd, onopgelost = self.datastore.schrijf(gewijzigd, verwijderd, tracker)
+        except Exception as e:
+            gebeurtenis(log, "write_mislukt", logging.WARNING, percelen=len(items), fout=repr(e),
+                        poging=max(item["pogingen"] for _k, item in items) + 1)
+            nu = time.monotonic()
+            with self._cond:
+                for k, item in items:
+                    item["pogingen"] += 1
+                    item["fout"] = repr(e)
+                    if item["pogingen"] >= self.max_pogingen:
+                        self._mislukt_zetten(k, item)
+                    elif k not in self._wachtend:
+                        # geen nieuwere inhoud in de wachtrij: later opnieuw
+                        item["na"] = nu + min(self.wachttijd * 2 ** (item["pogingen"] - 1), MAX_WACHTTIJD)
+                        self._wachtend[k] = item
+            return
+
+        with self._cond:
+            teksten = {item["perceel_id"]: item["tekst"] for _k, item in items}
+            if samengevoegd:
+                self._samengevoegd.setdefault(tracker.sleutel, {}).update(
+                    {pid: (teksten[pid], doc) for pid, doc in samengevoegd.items()}
+                )
+            for conflict in onopgelost:
+                k = (tracker.sleutel, conflict["perceel_id"])
+                item = next((item for kk, item in items if kk == k), None)
+                if item is not None:
+                    item["fout"] = str(OpslagConflict([conflict]))
+                    self._mislukt_zetten(k, item)
+
+
+wachtrij = SchrijfWachtrij(store)
+
+# openstaande writes nog wegschrijven als het proces stopt
+atexit.register(wachtrij.wacht, None, 10)
@@ -0,0 +1,21 @@
+-- Stabiele sleutel per perceel, zodat DataStore.save_percelen per perceel
+-- kan upserten in plaats van de hele tabel te legen en opnieuw te vullen.
+
+alter table public.percelen
+    add column if not exists perceel_id text;
+
+-- Bestaande rijen: hergebruik een eventueel al aanwezige sleutel in de
+-- JSON, anders de numerieke rij-id.
+update public.percelen
+set perceel_id = coalesce(perceel->>'perceel_id', id::text)
+where perceel_id is null;
+
+update public.percelen
+set perceel = jsonb_set(perceel, '{perceel_id}', to_jsonb(perceel_id))
+where perceel->>'perceel_id' is distinct from perceel_id;
+
+alter table public.percelen
+    alter column perceel_id set not null;
+
+create unique index if not exists percelen_perceel_id_key
+    on public.percelen (perceel_id);
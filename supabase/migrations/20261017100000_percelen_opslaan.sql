@@ -0,0 +1,32 @@
+-- Atomair opslaan van een delta: upserts en verwijderingen gebeuren in één
+-- transactie. Lezers zien de portfolio óf vóór, óf na de save, nooit een
+-- halve (of lege) tabel; bij een fout wordt niets weggeschreven.
+
+create or replace function public.percelen_opslaan(
+    p_upserts jsonb default '[]'::jsonb,
+    p_verwijderd text[] default '{}'
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_geschreven integer := 0;
+    v_verwijderd integer := 0;
+begin
+    insert into public.percelen (perceel_id, perceel)
+    select r->>'perceel_id', r->'perceel'
+    from jsonb_array_elements(coalesce(p_upserts, '[]'::jsonb)) as r
+    on conflict (perceel_id) do update
+        set perceel = excluded.perceel;
+    get diagnostics v_geschreven = row_count;
+
+    delete from public.percelen
+    where perceel_id = any(coalesce(p_verwijderd, '{}'));
+    get diagnostics v_verwijderd = row_count;
+
+    return jsonb_build_object(
+        'geschreven', v_geschreven,
+        'verwijderd', v_verwijderd
+    );
+end;
+$$;
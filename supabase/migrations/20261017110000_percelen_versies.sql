@@ -0,0 +1,102 @@
+-- Optimistische concurrency: elk perceel krijgt een versienummer en een
+-- updated_at. percelen_opslaan schrijft alleen als de versie waarop de
+-- sessie zijn wijziging baseerde nog actueel is; anders wordt het perceel
+-- als conflict (met de actuele inhoud) teruggegeven, zodat de client per
+-- veld kan samenvoegen in plaats van blind te overschrijven.
+
+alter table public.percelen
+    add column if not exists versie integer not null default 1,
+    add column if not exists updated_at timestamptz not null default now();
+
+create index if not exists percelen_updated_at_idx
+    on public.percelen (updated_at);
+
+drop function if exists public.percelen_opslaan(jsonb, text[]);
+
+create or replace function public.percelen_opslaan(
+    p_upserts jsonb default '[]'::jsonb,
+    p_verwijderd jsonb default '[]'::jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    r jsonb;
+    v_id text;
+    v_verwacht integer;
+    v_nieuw integer;
+    v_huidig record;
+    v_versies jsonb := '{}'::jsonb;
+    v_verwijderd jsonb := '[]'::jsonb;
+    v_conflicten jsonb := '[]'::jsonb;
+begin
+    for r in select * from jsonb_array_elements(coalesce(p_upserts, '[]'::jsonb)) loop
+        v_id := r->>'perceel_id';
+        v_verwacht := (r->>'versie')::integer;
+        v_nieuw := null;
+
+        if v_verwacht is null then
+            insert into public.percelen (perceel_id, perceel, versie, updated_at)
+            values (v_id, r->'perceel', 1, now())
+            on conflict (perceel_id) do nothing
+            returning versie into v_nieuw;
+        else
+            update public.percelen
+            set perceel = r->'perceel',
+                versie = versie + 1,
+                updated_at = now()
+            where perceel_id = v_id
+              and versie = v_verwacht
+            returning versie into v_nieuw;
+        end if;
+
+        if v_nieuw is null then
+            select perceel, versie into v_huidig
+            from public.percelen
+            where perceel_id = v_id;
+
+            v_conflicten := v_conflicten || jsonb_build_array(jsonb_build_object(
+                'perceel_id', v_id,
+                'perceel', v_huidig.perceel,
+                'versie', v_huidig.versie
+            ));
+        else
+            v_versies := v_versies || jsonb_build_object(v_id, v_nieuw);
+        end if;
+    end loop;
+
+    for r in select * from jsonb_array_elements(coalesce(p_verwijderd, '[]'::jsonb)) loop
+        v_id := r->>'perceel_id';
+        v_verwacht := (r->>'versie')::integer;
+
+        delete from public.percelen
+        where perceel_id = v_id
+          and (v_verwacht is null or versie = v_verwacht);
+
+        if found then
+            v_verwijderd := v_verwijderd || to_jsonb(v_id);
+        else
+            select perceel, versie into v_huidig
+            from public.percelen
+            where perceel_id = v_id;
+
+            if found then
+                v_conflicten := v_conflicten || jsonb_build_array(jsonb_build_object(
+                    'perceel_id', v_id,
+                    'perceel', v_huidig.perceel,
+                    'versie', v_huidig.versie
+                ));
+            else
+                -- al door een ander verwijderd: het gewenste eindresultaat
+                v_verwijderd := v_verwijderd || to_jsonb(v_id);
+            end if;
+        end if;
+    end loop;
+
+    return jsonb_build_object(
+        'versies', v_versies,
+        'verwijderd', v_verwijderd,
+        'conflicten', v_conflicten
+    );
+end;
+$$;
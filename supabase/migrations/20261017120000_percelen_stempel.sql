@@ -0,0 +1,17 @@
+-- Goedkope controle of de percelen-tabel veranderd is sinds de laatste
+-- load: aantal rijen, som van de versies (stijgt bij elke update) en de
+-- laatste updated_at. De DataStore-cache vergelijkt deze stempel en haalt
+-- alleen bij verschil (een deel van) de tabel opnieuw op.
+
+create or replace function public.percelen_stempel()
+returns jsonb
+language sql
+stable
+as $$
+    select jsonb_build_object(
+        'aantal', count(*),
+        'versiesom', coalesce(sum(versie), 0),
+        'laatst', max(updated_at)
+    )
+    from public.percelen;
+$$;
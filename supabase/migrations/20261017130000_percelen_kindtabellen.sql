@@ -0,0 +1,268 @@
+-- Optioneel genormaliseerd schema: de lijsten investeerders, kosten_items,
+-- status_updates en v_plots krijgen elk een eigen tabel met één rij per
+-- element (perceel_id, positie, data) en gegenereerde projectiekolommen.
+-- In het perceel-document staat op die plek dan een lege lijst.
+--
+-- Lezen gaat via de view percelen_volledig, die de documenten weer
+-- samenstelt. percelen_opslaan accepteert per upsert een optioneel
+-- 'kinderen'-object (veld → {lengte, rijen: [{positie, data}]}) met alleen
+-- de gewijzigde posities; posities vanaf 'lengte' worden verwijderd.
+--
+-- Zonder PERCELEN_GENORMALISEERD blijft alles werken als voorheen. Bij
+-- het aanzetten eenmalig: select public.percelen_normaliseren();
+
+create table if not exists public.perceel_investeerders (
+    perceel_id text not null references public.percelen (perceel_id) on delete cascade,
+    positie integer not null,
+    data jsonb not null,
+    naam text generated always as (data->>'naam') stored,
+    bedrag_eur numeric generated always as (
+        case when jsonb_typeof(data->'bedrag_eur') = 'number' then (data->>'bedrag_eur')::numeric end
+    ) stored,
+    rente numeric generated always as (
+        case when jsonb_typeof(data->'rente') = 'number' then (data->>'rente')::numeric end
+    ) stored,
+    winstdeling numeric generated always as (
+        case when jsonb_typeof(data->'winstdeling') = 'number' then (data->>'winstdeling')::numeric end
+    ) stored,
+    rentetype text generated always as (data->>'rentetype') stored,
+    primary key (perceel_id, positie)
+);
+
+create index if not exists perceel_investeerders_naam_idx
+    on public.perceel_investeerders (naam);
+
+create table if not exists public.perceel_kosten_items (
+    perceel_id text not null references public.percelen (perceel_id) on delete cascade,
+    positie integer not null,
+    data jsonb not null,
+    omschrijving text generated always as (data->>'omschrijving') stored,
+    categorie text generated always as (data->>'categorie') stored,
+    bedrag_eur numeric generated always as (
+        case when jsonb_typeof(data->'bedrag_eur') = 'number' then (data->>'bedrag_eur')::numeric end
+    ) stored,
+    primary key (perceel_id, positie)
+);
+
+create table if not exists public.perceel_status_updates (
+    perceel_id text not null references public.percelen (perceel_id) on delete cascade,
+    positie integer not null,
+    data jsonb not null,
+    datum text generated always as (data->>'datum') stored,
+    primary key (perceel_id, positie)
+);
+
+create table if not exists public.perceel_v_plots (
+    perceel_id text not null references public.percelen (perceel_id) on delete cascade,
+    positie integer not null,
+    data jsonb not null,
+    plot_id text generated always as (data->>'plot_id') stored,
+    plot_number text generated always as (data->>'plot_number') stored,
+    status text generated always as (data->>'status') stored,
+    primary key (perceel_id, positie)
+);
+
+
+-- Document + kindrijen → volledig perceel (alleen lege lijsten worden gevuld)
+create or replace function public.percelen_samenstellen(p_perceel_id text, p_perceel jsonb)
+returns jsonb
+language sql
+stable
+as $$
+    select p_perceel
+        || case when p_perceel->'investeerders' = '[]'::jsonb then jsonb_build_object('investeerders', coalesce(
+            (select jsonb_agg(k.data order by k.positie) from public.perceel_investeerders k where k.perceel_id = p_perceel_id),
+            '[]'::jsonb)) else '{}'::jsonb end
+        || case when p_perceel->'kosten_items' = '[]'::jsonb then jsonb_build_object('kosten_items', coalesce(
+            (select jsonb_agg(k.data order by k.positie) from public.perceel_kosten_items k where k.perceel_id = p_perceel_id),
+            '[]'::jsonb)) else '{}'::jsonb end
+        || case when p_perceel->'status_updates' = '[]'::jsonb then jsonb_build_object('status_updates', coalesce(
+            (select jsonb_agg(k.data order by k.positie) from public.perceel_status_updates k where k.perceel_id = p_perceel_id),
+            '[]'::jsonb)) else '{}'::jsonb end
+        || case when p_perceel->'v_plots' = '[]'::jsonb then jsonb_build_object('v_plots', coalesce(
+            (select jsonb_agg(k.data order by k.positie) from public.perceel_v_plots k where k.perceel_id = p_perceel_id),
+            '[]'::jsonb)) else '{}'::jsonb end;
+$$;
+
+create or replace view public.percelen_volledig
+with (security_invoker = true)
+as
+select
+    id,
+    perceel_id,
+    versie,
+    updated_at,
+    public.percelen_samenstellen(perceel_id, perceel) as perceel
+from public.percelen;
+
+
+-- Positionele diff op de kindtabellen van één perceel
+create or replace function public.percelen_kinderen_schrijven(p_perceel_id text, p_kinderen jsonb)
+returns void
+language plpgsql
+as $$
+declare
+    v_veld text;
+    v_delta jsonb;
+begin
+    for v_veld, v_delta in select key, value from jsonb_each(coalesce(p_kinderen, '{}'::jsonb)) loop
+        if v_veld not in ('investeerders', 'kosten_items', 'status_updates', 'v_plots') then
+            raise exception 'Onbekende kindtabel: %', v_veld;
+        end if;
+
+        execute format(
+            'delete from public.%I where perceel_id = $1 and positie >= $2',
+            'perceel_' || v_veld
+        ) using p_perceel_id, (v_delta->>'lengte')::integer;
+
+        execute format(
+            'insert into public.%1$I as t (perceel_id, positie, data)
+             select $1, (e->>''positie'')::integer, e->''data''
+             from jsonb_array_elements($2) e
+             on conflict (perceel_id, positie) do update
+             set data = excluded.data
+             where t.data is distinct from excluded.data',
+            'perceel_' || v_veld
+        ) using p_perceel_id, coalesce(v_delta->'rijen', '[]'::jsonb);
+    end loop;
+end;
+$$;
+
+
+-- Bestaande lijsten naar de kindtabellen verplaatsen (idempotent)
+create or replace function public.percelen_normaliseren()
+returns integer
+language plpgsql
+as $$
+declare
+    v_rij record;
+    v_veld text;
+    v_doc jsonb;
+    v_kinderen jsonb;
+    v_aantal integer := 0;
+begin
+    for v_rij in select perceel_id, perceel from public.percelen for update loop
+        v_doc := v_rij.perceel;
+        v_kinderen := '{}'::jsonb;
+
+        foreach v_veld in array array['investeerders', 'kosten_items', 'status_updates', 'v_plots'] loop
+            if jsonb_typeof(v_doc->v_veld) = 'array'
+               and jsonb_array_length(v_doc->v_veld) > 0
+               and not exists (
+                   select 1 from jsonb_array_elements(v_doc->v_veld) e where jsonb_typeof(e) <> 'object'
+               )
+            then
+                v_kinderen := v_kinderen || jsonb_build_object(v_veld, jsonb_build_object(
+                    'lengte', jsonb_array_length(v_doc->v_veld),
+                    'rijen', (
+                        select jsonb_agg(jsonb_build_object('positie', e.nr - 1, 'data', e.data) order by e.nr)
+                        from jsonb_array_elements(v_doc->v_veld) with ordinality as e(data, nr)
+                    )
+                ));
+                v_doc := jsonb_set(v_doc, array[v_veld], '[]'::jsonb);
+            end if;
+        end loop;
+
+        if v_kinderen <> '{}'::jsonb then
+            perform public.percelen_kinderen_schrijven(v_rij.perceel_id, v_kinderen);
+            update public.percelen set perceel = v_doc where perceel_id = v_rij.perceel_id;
+            v_aantal := v_aantal + 1;
+        end if;
+    end loop;
+
+    return v_aantal;
+end;
+$$;
+
+
+create or replace function public.percelen_opslaan(
+    p_upserts jsonb default '[]'::jsonb,
+    p_verwijderd jsonb default '[]'::jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    r jsonb;
+    v_id text;
+    v_verwacht integer;
+    v_nieuw integer;
+    v_huidig record;
+    v_versies jsonb := '{}'::jsonb;
+    v_verwijderd jsonb := '[]'::jsonb;
+    v_conflicten jsonb := '[]'::jsonb;
+begin
+    for r in select * from jsonb_array_elements(coalesce(p_upserts, '[]'::jsonb)) loop
+        v_id := r->>'perceel_id';
+        v_verwacht := (r->>'versie')::integer;
+        v_nieuw := null;
+
+        if v_verwacht is null then
+            insert into public.percelen (perceel_id, perceel, versie, updated_at)
+            values (v_id, r->'perceel', 1, now())
+            on conflict (perceel_id) do nothing
+            returning versie into v_nieuw;
+        else
+            update public.percelen
+            set perceel = r->'perceel',
+                versie = versie + 1,
+                updated_at = now()
+            where perceel_id = v_id
+              and versie = v_verwacht
+            returning versie into v_nieuw;
+        end if;
+
+        if v_nieuw is null then
+            select public.percelen_samenstellen(perceel_id, perceel) as perceel, versie into v_huidig
+            from public.percelen
+            where perceel_id = v_id;
+
+            v_conflicten := v_conflicten || jsonb_build_array(jsonb_build_object(
+                'perceel_id', v_id,
+                'perceel', v_huidig.perceel,
+                'versie', v_huidig.versie
+            ));
+        else
+            if r ? 'kinderen' then
+                perform public.percelen_kinderen_schrijven(v_id, r->'kinderen');
+            end if;
+            v_versies := v_versies || jsonb_build_object(v_id, v_nieuw);
+        end if;
+    end loop;
+
+    for r in select * from jsonb_array_elements(coalesce(p_verwijderd, '[]'::jsonb)) loop
+        v_id := r->>'perceel_id';
+        v_verwacht := (r->>'versie')::integer;
+
+        -- kindrijen gaan mee via on delete cascade
+        delete from public.percelen
+        where perceel_id = v_id
+          and (v_verwacht is null or versie = v_verwacht);
+
+        if found then
+            v_verwijderd := v_verwijderd || to_jsonb(v_id);
+        else
+            select public.percelen_samenstellen(perceel_id, perceel) as perceel, versie into v_huidig
+            from public.percelen
+            where perceel_id = v_id;
+
+            if found then
+                v_conflicten := v_conflicten || jsonb_build_array(jsonb_build_object(
+                    'perceel_id', v_id,
+                    'perceel', v_huidig.perceel,
+                    'versie', v_huidig.versie
+                ));
+            else
+                -- al door een ander verwijderd: het gewenste eindresultaat
+                v_verwijderd := v_verwijderd || to_jsonb(v_id);
+            end if;
+        end if;
+    end loop;
+
+    return jsonb_build_object(
+        'versies', v_versies,
+        'verwijderd', v_verwijderd,
+        'conflicten', v_conflicten
+    );
+end;
+$$;
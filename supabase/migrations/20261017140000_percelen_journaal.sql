@@ -0,0 +1,161 @@
+-- Append-only wijzigingsjournaal. Elke geslaagde upsert of verwijdering
+-- met een 'journaal'-regel ({soort, patch, invers, gebruiker}) komt in
+-- dezelfde transactie in percelen_journaal; patch/invers zijn patches op
+-- de bovenste velden ({zet, weg}, null = perceel bestaat niet).
+--
+-- Elke 500 regels legt percelen_opslaan een snapshot van alle percelen
+-- vast, zodat een eerdere stand niet vanaf het begin opgebouwd hoeft te
+-- worden. Het interval hoort gelijk te zijn aan SNAPSHOT_ELKE in backends.py.
+
+create table if not exists public.percelen_journaal (
+    seq bigint generated always as identity primary key,
+    tijd timestamptz not null default now(),
+    perceel_id text not null,
+    versie integer,
+    soort text not null,
+    patch jsonb,
+    invers jsonb,
+    gebruiker text
+);
+
+create index if not exists percelen_journaal_perceel_idx
+    on public.percelen_journaal (perceel_id, seq);
+
+create table if not exists public.percelen_snapshots (
+    id bigint generated always as identity primary key,
+    seq bigint not null,
+    tijd timestamptz not null default now(),
+    percelen jsonb not null
+);
+
+create index if not exists percelen_snapshots_seq_idx
+    on public.percelen_snapshots (seq);
+
+
+create or replace function public.percelen_journaal_toevoegen(p_perceel_id text, p_versie integer, p_regel jsonb)
+returns void
+language sql
+as $$
+    insert into public.percelen_journaal (perceel_id, versie, soort, patch, invers, gebruiker)
+    values (
+        p_perceel_id,
+        p_versie,
+        p_regel->>'soort',
+        nullif(p_regel->'patch', 'null'::jsonb),
+        nullif(p_regel->'invers', 'null'::jsonb),
+        p_regel->>'gebruiker'
+    );
+$$;
+
+
+create or replace function public.percelen_opslaan(
+    p_upserts jsonb default '[]'::jsonb,
+    p_verwijderd jsonb default '[]'::jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    r jsonb;
+    v_id text;
+    v_verwacht integer;
+    v_nieuw integer;
+    v_huidig record;
+    v_versies jsonb := '{}'::jsonb;
+    v_verwijderd jsonb := '[]'::jsonb;
+    v_conflicten jsonb := '[]'::jsonb;
+    v_laatste bigint;
+    v_vorige bigint;
+begin
+    for r in select * from jsonb_array_elements(coalesce(p_upserts, '[]'::jsonb)) loop
+        v_id := r->>'perceel_id';
+        v_verwacht := (r->>'versie')::integer;
+        v_nieuw := null;
+
+        if v_verwacht is null then
+            insert into public.percelen (perceel_id, perceel, versie, updated_at)
+            values (v_id, r->'perceel', 1, now())
+            on conflict (perceel_id) do nothing
+            returning versie into v_nieuw;
+        else
+            update public.percelen
+            set perceel = r->'perceel',
+                versie = versie + 1,
+                updated_at = now()
+            where perceel_id = v_id
+              and versie = v_verwacht
+            returning versie into v_nieuw;
+        end if;
+
+        if v_nieuw is null then
+            select public.percelen_samenstellen(perceel_id, perceel) as perceel, versie into v_huidig
+            from public.percelen
+            where perceel_id = v_id;
+
+            v_conflicten := v_conflicten || jsonb_build_array(jsonb_build_object(
+                'perceel_id', v_id,
+                'perceel', v_huidig.perceel,
+                'versie', v_huidig.versie
+            ));
+        else
+            if r ? 'kinderen' then
+                perform public.percelen_kinderen_schrijven(v_id, r->'kinderen');
+            end if;
+            v_versies := v_versies || jsonb_build_object(v_id, v_nieuw);
+            if r ? 'journaal' then
+                perform public.percelen_journaal_toevoegen(v_id, v_nieuw, r->'journaal');
+            end if;
+        end if;
+    end loop;
+
+    for r in select * from jsonb_array_elements(coalesce(p_verwijderd, '[]'::jsonb)) loop
+        v_id := r->>'perceel_id';
+        v_verwacht := (r->>'versie')::integer;
+
+        -- kindrijen gaan mee via on delete cascade
+        delete from public.percelen
+        where perceel_id = v_id
+          and (v_verwacht is null or versie = v_verwacht);
+
+        if found then
+            v_verwijderd := v_verwijderd || to_jsonb(v_id);
+            if r ? 'journaal' then
+                perform public.percelen_journaal_toevoegen(v_id, null, r->'journaal');
+            end if;
+        else
+            select public.percelen_samenstellen(perceel_id, perceel) as perceel, versie into v_huidig
+            from public.percelen
+            where perceel_id = v_id;
+
+            if found then
+                v_conflicten := v_conflicten || jsonb_build_array(jsonb_build_object(
+                    'perceel_id', v_id,
+                    'perceel', v_huidig.perceel,
+                    'versie', v_huidig.versie
+                ));
+            else
+                -- al door een ander verwijderd: het gewenste eindresultaat
+                v_verwijderd := v_verwijderd || to_jsonb(v_id);
+            end if;
+        end if;
+    end loop;
+
+    select coalesce(max(seq), 0) into v_laatste from public.percelen_journaal;
+    select coalesce(max(seq), 0) into v_vorige from public.percelen_snapshots;
+    if v_laatste - v_vorige >= 500 then
+        insert into public.percelen_snapshots (seq, percelen)
+        select v_laatste, coalesce(jsonb_agg(jsonb_build_object(
+            'perceel_id', perceel_id,
+            'versie', versie,
+            'perceel', public.percelen_samenstellen(perceel_id, perceel)
+        ) order by id), '[]'::jsonb)
+        from public.percelen;
+    end if;
+
+    return jsonb_build_object(
+        'versies', v_versies,
+        'verwijderd', v_verwijderd,
+        'conflicten', v_conflicten
+    );
+end;
+$$;
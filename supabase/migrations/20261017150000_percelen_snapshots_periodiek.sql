@@ -0,0 +1,153 @@
+-- Periodieke snapshots voor "as of"-opvragingen (DataStore.as_of).
+--
+-- Naast elke 500 journaalregels komt er nu ook een snapshot als de vorige
+-- ouder is dan 7 dagen (en er sindsdien iets gewijzigd is), en direct bij
+-- de eerste journaalregel: die legt de percelen van vóór het journaal vast.
+-- Een stand op een peildatum is dan de laatste snapshot daarvóór plus
+-- hooguit een week aan journaalregels. Zelfde grenzen als SNAPSHOT_ELKE
+-- en SNAPSHOT_DAGEN in backends.py.
+
+-- Snapshots bevatten de hele portfolio: lz4 comprimeert sneller dan pglz
+alter table public.percelen_snapshots alter column percelen set compression lz4;
+
+create index if not exists percelen_snapshots_tijd_idx
+    on public.percelen_snapshots (tijd);
+
+create index if not exists percelen_journaal_tijd_idx
+    on public.percelen_journaal (tijd);
+
+
+create or replace function public.percelen_snapshot_indien_nodig()
+returns void
+language plpgsql
+as $$
+declare
+    v_laatste bigint;
+    v_vorige_seq bigint;
+    v_vorige_tijd timestamptz;
+begin
+    select coalesce(max(seq), 0) into v_laatste from public.percelen_journaal;
+    select seq, tijd into v_vorige_seq, v_vorige_tijd
+    from public.percelen_snapshots
+    order by seq desc
+    limit 1;
+
+    if v_laatste <= coalesce(v_vorige_seq, 0) then
+        return;
+    end if;
+
+    if v_vorige_seq is null
+       or v_laatste - v_vorige_seq >= 500
+       or v_vorige_tijd <= now() - interval '7 days'
+    then
+        insert into public.percelen_snapshots (seq, percelen)
+        select v_laatste, coalesce(jsonb_agg(jsonb_build_object(
+            'perceel_id', perceel_id,
+            'versie', versie,
+            'perceel', public.percelen_samenstellen(perceel_id, perceel)
+        ) order by id), '[]'::jsonb)
+        from public.percelen;
+    end if;
+end;
+$$;
+
+
+create or replace function public.percelen_opslaan(
+    p_upserts jsonb default '[]'::jsonb,
+    p_verwijderd jsonb default '[]'::jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    r jsonb;
+    v_id text;
+    v_verwacht integer;
+    v_nieuw integer;
+    v_huidig record;
+    v_versies jsonb := '{}'::jsonb;
+    v_verwijderd jsonb := '[]'::jsonb;
+    v_conflicten jsonb := '[]'::jsonb;
+begin
+    for r in select * from jsonb_array_elements(coalesce(p_upserts, '[]'::jsonb)) loop
+        v_id := r->>'perceel_id';
+        v_verwacht := (r->>'versie')::integer;
+        v_nieuw := null;
+
+        if v_verwacht is null then
+            insert into public.percelen (perceel_id, perceel, versie, updated_at)
+            values (v_id, r->'perceel', 1, now())
+            on conflict (perceel_id) do nothing
+            returning versie into v_nieuw;
+        else
+            update public.percelen
+            set perceel = r->'perceel',
+                versie = versie + 1,
+                updated_at = now()
+            where perceel_id = v_id
+              and versie = v_verwacht
+            returning versie into v_nieuw;
+        end if;
+
+        if v_nieuw is null then
+            select public.percelen_samenstellen(perceel_id, perceel) as perceel, versie into v_huidig
+            from public.percelen
+            where perceel_id = v_id;
+
+            v_conflicten := v_conflicten || jsonb_build_array(jsonb_build_object(
+                'perceel_id', v_id,
+                'perceel', v_huidig.perceel,
+                'versie', v_huidig.versie
+            ));
+        else
+            if r ? 'kinderen' then
+                perform public.percelen_kinderen_schrijven(v_id, r->'kinderen');
+            end if;
+            v_versies := v_versies || jsonb_build_object(v_id, v_nieuw);
+            if r ? 'journaal' then
+                perform public.percelen_journaal_toevoegen(v_id, v_nieuw, r->'journaal');
+            end if;
+        end if;
+    end loop;
+
+    for r in select * from jsonb_array_elements(coalesce(p_verwijderd, '[]'::jsonb)) loop
+        v_id := r->>'perceel_id';
+        v_verwacht := (r->>'versie')::integer;
+
+        -- kindrijen gaan mee via on delete cascade
+        delete from public.percelen
+        where perceel_id = v_id
+          and (v_verwacht is null or versie = v_verwacht);
+
+        if found then
+            v_verwijderd := v_verwijderd || to_jsonb(v_id);
+            if r ? 'journaal' then
+                perform public.percelen_journaal_toevoegen(v_id, null, r->'journaal');
+            end if;
+        else
+            select public.percelen_samenstellen(perceel_id, perceel) as perceel, versie into v_huidig
+            from public.percelen
+            where perceel_id = v_id;
+
+            if found then
+                v_conflicten := v_conflicten || jsonb_build_array(jsonb_build_object(
+                    'perceel_id', v_id,
+                    'perceel', v_huidig.perceel,
+                    'versie', v_huidig.versie
+                ));
+            else
+                -- al door een ander verwijderd: het gewenste eindresultaat
+                v_verwijderd := v_verwijderd || to_jsonb(v_id);
+            end if;
+        end if;
+    end loop;
+
+    perform public.percelen_snapshot_indien_nodig();
+
+    return jsonb_build_object(
+        'versies', v_versies,
+        'verwijderd', v_verwijderd,
+        'conflicten', v_conflicten
+    );
+end;
+$$;
@@ -0,0 +1,181 @@
+"""
+Eén Supabase-client per proces.
+
+Alle datapaden (DataStore-backend, utils.get_supabase) gebruiken dezelfde
+client en daarmee één httpx-connectiepool met keep-alive en HTTP/2, zodat
+gelijktijdige sessies geen eigen TLS-verbindingen opbouwen. Verder:
+begrensde timeouts, herhalen met jitter bij verbindings- en tijdelijke
+serverfouten, en latency per endpoint (zie `metingen`).
+
+Herhalen gebeurt altijd als het verzoek de server niet bereikte
+(verbindingsfout); na een leestimeout of 502/503/504 alleen voor GET/HEAD,
+omdat een rpc-aanroep dan mogelijk al is uitgevoerd. Writes worden op
+hoger niveau herhaald door de schrijfwachtrij.
+"""
+import random
+import threading
+import time
+from collections import deque
+
+import httpx
+from supabase import Client, ClientOptions, create_client
+
+from backends import instelling
+from logboek import logger, gebeurtenis
+
+log = logger("supabase")
+
+# Timeouts in seconden (SUPABASE_TIMEOUT overschrijft de lees/schrijf-timeout)
+CONNECT_TIMEOUT = 5.0
+TIMEOUT = 15.0
+
+# Connectiepool per proces
+MAX_VERBINDINGEN = 20
+MAX_KEEPALIVE = 10
+KEEPALIVE_SECONDEN = 60.0
+
+# Pogingen per verzoek en wachttijd (verdubbelt per poging, met volledige jitter)
+MAX_POGINGEN = 3
+WACHTTIJD = 0.2
+MAX_WACHTTIJD = 2.0
+
+# Statuscodes die bij GET/HEAD opnieuw geprobeerd worden
+HERHAAL_STATUS = {502, 503, 504}
+
+# Aantal metingen per endpoint voor de percentielen
+METINGEN_PER_ENDPOINT = 500
+
+_IDEMPOTENT = {"GET", "HEAD", "OPTIONS"}
+
+
+class LatentieMetingen:
+    """Duur per aanroep (tot de response-headers), per endpoint."""
+
+    def __init__(self, per_endpoint: int = METINGEN_PER_ENDPOINT):
+        self._lock = threading.Lock()
+        self._per_endpoint = per_endpoint
+        self._duren = {}
+        self._tellers = {}
+
+    def registreer(self, endpoint: str, duur: float, pogingen: int, fout: bool):
+        with self._lock:
+            self._duren.setdefault(endpoint, deque(maxlen=self._per_endpoint)).append(duur)
+            teller = self._tellers.setdefault(endpoint, {"aantal": 0, "herhaald": 0, "fouten": 0})
+            teller["aantal"] += 1
+            teller["herhaald"] += pogingen - 1
+            teller["fouten"] += int(fout)
+
+    def overzicht(self) -> list[dict]:
+        """Per endpoint: aantal, herhaald, fouten en p50/p95/max in ms (recente metingen)."""
+        with self._lock:
+            rijen = []
+            for endpoint, duren in self._duren.items():
+                gesorteerd = sorted(duren)
+                n = len(gesorteerd)
+                rijen.append({
+                    "endpoint": endpoint,
+                    **self._tellers[endpoint],
+                    "p50_ms": round(gesorteerd[n // 2] * 1000, 1),
+                    "p95_ms": round(gesorteerd[min(int(n * 0.95), n - 1)] * 1000, 1),
+                    "max_ms": round(gesorteerd[-1] * 1000, 1),
+                })
+        return sorted(rijen, key=lambda r: -r["aantal"])
+
+    def wis(self):
+        with self._lock:
+            self._duren.clear()
+            self._tellers.clear()
+
+
+metingen = LatentieMetingen()
+
+
+class HerhaalTransport(httpx.BaseTransport):
+    """httpx-transport met herhalen (exponentieel, volledige jitter) en latency-metingen."""
+
+    def __init__(self, transport: httpx.BaseTransport, max_pogingen: int = MAX_POGINGEN,
+                 wachttijd: float = WACHTTIJD, metingen: LatentieMetingen = metingen):
+        self._transport = transport
+        self.max_pogingen = max_pogingen
+        self.wachttijd = wachttijd
+        self.metingen = metingen
+
+    def _wacht(self, poging: int):
+        time.sleep(random.uniform(0, min(self.wachttijd * 2 ** (poging - 1), MAX_WACHTTIJD)))
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        endpoint = f"{request.method} {request.url.path}"
+        idempotent = request.method in _IDEMPOTENT
+        start = time.perf_counter()
+        poging = 0
+        while True:
+            poging += 1
+            laatste = poging >= self.max_pogingen
+            try:
+                response = self._transport.handle_request(request)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+                # verzoek is niet verstuurd: altijd veilig om te herhalen
+                if laatste:
+                    self.metingen.registreer(endpoint, time.perf_counter() - start, poging, True)
+                    raise
+            except (httpx.ReadTimeout, httpx.ReadError, httpx.RemoteProtocolError):
+                if laatste or not idempotent:
+                    self.metingen.registreer(endpoint, time.perf_counter() - start, poging, True)
+                    raise
+            else:
+                if response.status_code in HERHAAL_STATUS and idempotent and not laatste:
+                    response.close()
+                else:
+                    self.metingen.registreer(
+                        endpoint, time.perf_counter() - start, poging, response.status_code >= 500
+                    )
+                    return response
+            gebeurtenis(log, "herhaal", endpoint=endpoint, poging=poging)
+            self._wacht(poging)
+
+    def close(self):
+        self._transport.close()
+
+
+_lock = threading.Lock()
+_http = None
+_clients = {}
+
+
+def http_client() -> httpx.Client:
+    """De gedeelde httpx-client (connectiepool) van dit proces."""
+    global _http
+    with _lock:
+        if _http is None:
+            timeout = float(instelling("SUPABASE_TIMEOUT") or TIMEOUT)
+            limits = httpx.Limits(
+                max_connections=MAX_VERBINDINGEN,
+                max_keepalive_connections=MAX_KEEPALIVE,
+                keepalive_expiry=KEEPALIVE_SECONDEN,
+            )
+            _http = httpx.Client(
+                transport=HerhaalTransport(httpx.HTTPTransport(http2=True, limits=limits)),
+                timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT),
+                follow_redirects=True,
+            )
+        return _http
+
+
+def supabase_client() -> Client:
+    """
+    De Supabase-client van dit proces (SUPABASE_URL met SUPABASE_ANON_KEY,
+    anders SUPABASE_KEY; env of secrets).
+    """
+    url = instelling("SUPABASE_URL")
+    key = instelling("SUPABASE_ANON_KEY") or instelling("SUPABASE_KEY")
+    if not url or not key:
+        raise ValueError("SUPABASE_URL of SUPABASE_ANON_KEY/SUPABASE_KEY ontbreekt")
+
+    with _lock:
+        client = _clients.get((url, key))
+    if client is None:
+        client = create_client(url, key, options=ClientOptions(httpx_client=http_client()))
+        with _lock:
+            client = _clients.setdefault((url, key), client)
+        gebeurtenis(log, "client_aangemaakt", url=url)
+    return client
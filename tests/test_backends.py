@@ -0,0 +1,64 @@
+import pytest
+
+from backends import JSONBackend, SQLiteBackend
+
+
+@pytest.fixture(params=["sqlite", "sqlite_genormaliseerd", "json"])
+def backend(request, tmp_path):
+    if request.param == "json":
+        return JSONBackend(str(tmp_path / "percelen.json"))
+    return SQLiteBackend(str(tmp_path / "percelen.db"), genormaliseerd=request.param == "sqlite_genormaliseerd")
+
+
+def _perceel(pid, **velden):
+    return {"perceel_id": pid, "perceel": {"perceel_id": pid, **velden}}
+
+
+def test_opslaan_voorwaardelijk_op_versie(backend):
+    r = backend.opslaan([{**_perceel("p1", locatie="Sanyang"), "versie": None}], [])
+    assert r == {"versies": {"p1": 1}, "verwijderd": [], "conflicten": []}
+
+    r = backend.opslaan([{**_perceel("p1", locatie="Sanyang 2"), "versie": 1}], [])
+    assert r["versies"] == {"p1": 2} and r["conflicten"] == []
+
+    # verouderde versie: niets geschreven, huidige stand terug
+    r = backend.opslaan([{**_perceel("p1", locatie="oud"), "versie": 1}], [])
+    assert r["versies"] == {}
+    assert r["conflicten"] == [{"perceel_id": "p1", "versie": 2,
+                                "perceel": {"perceel_id": "p1", "locatie": "Sanyang 2"}}]
+    assert backend.lees_rijen(["p1"])[0]["perceel"]["locatie"] == "Sanyang 2"
+
+
+def test_nieuw_perceel_dat_al_bestaat_is_conflict(backend):
+    backend.opslaan([{**_perceel("p1", locatie="a"), "versie": None}], [])
+    r = backend.opslaan([{**_perceel("p1", locatie="b"), "versie": None}], [])
+    assert r["versies"] == {}
+    assert r["conflicten"][0]["versie"] == 1
+
+
+def test_verwijderen_voorwaardelijk_op_versie(backend):
+    backend.opslaan([{**_perceel("p1"), "versie": None}, {**_perceel("p2"), "versie": None}], [])
+    backend.opslaan([{**_perceel("p1", locatie="x"), "versie": 1}], [])
+
+    r = backend.opslaan([], [{"perceel_id": "p1", "versie": 1}, {"perceel_id": "p2", "versie": 1}])
+    assert r["verwijderd"] == ["p2"]
+    assert [c["perceel_id"] for c in r["conflicten"]] == ["p1"]
+    assert backend.lees_versies() == {"p1": 2}
+
+    # al weg telt als verwijderd
+    assert backend.opslaan([], [{"perceel_id": "p2", "versie": 1}])["verwijderd"] == ["p2"]
+
+
+def test_lees_paginas_keyset_in_volgorde_van_toevoegen(backend):
+    ids = [f"p{i}" for i in range(7)]
+    backend.opslaan([{**_perceel(pid), "versie": None} for pid in ids], [])
+    # een wijziging verplaatst een perceel niet
+    backend.opslaan([{**_perceel("p0", locatie="x"), "versie": 1}], [])
+
+    paginas = list(backend.lees_paginas(3))
+    assert [len(p) for p in paginas] == [3, 3, 1]
+    assert [r["perceel_id"] for p in paginas for r in p] == ids
+    assert paginas[0][0]["perceel"]["locatie"] == "x"
+
+    # precies vol: geen lege laatste pagina
+    assert [len(p) for p in backend.lees_paginas(7)] == [7]
@@ -0,0 +1,101 @@
+import pandas as pd
+import pytest
+
+from backends import JSONBackend
+from bulk_import import ImportOnderbroken, _getallen, importeer, valideer
+from datastore import DataStore, PerceelTracker
+
+# lon/lat-hoekpunten rond Sanyang
+HOEKEN = {"x1": -16.77, "y1": 13.27, "x2": -16.769, "y2": 13.27, "x3": -16.769, "y3": 13.271}
+
+
+def _rij(**velden):
+    return {"locatie": "Sanyang 1", "aankoopdatum": "01-05-2024", "aankoopprijs": "75000", **HOEKEN, **velden}
+
+
+def test_geldige_rij_wordt_perceel():
+    df = pd.DataFrame([_rij(verkoopdatum="2025-02-01", investeerder="Jan", investeerder_bedrag_eur="500",
+                            investeerder_rente="10", status="Gekocht")])
+    percelen, fouten = valideer(df, wisselkoers=75)
+
+    assert fouten.empty
+    p = percelen[0]
+    assert p["perceel_id"]
+    assert (p["aankoopprijs"], p["aankoopprijs_eur"]) == (75000, 1000.0)
+    assert (p["aankoopdatum"], p["verkoopdatum"]) == ("2024-05-01", "2025-02-01")
+    assert p["dealstage"] == "Verkocht"
+    assert len(p["polygon"]) == 3 and p["polygon"][0] == [13.27, -16.77]
+    assert p["investeerders"] == [{"naam": "Jan", "bedrag": 37500, "bedrag_eur": 500.0, "rente": 0.1,
+                                   "winstdeling": 0.0, "rentetype": "bij verkoop"}]
+    assert p["status_updates"][0]["tekst"] == "Gekocht"
+
+
+def test_getallen_met_komma_en_duizendtallen():
+    getallen = _getallen(pd.Series(["12.500,50", "12500,5", "12.5", "€ 1 000", "abc", None]))
+    assert getallen.tolist()[:4] == [12500.5, 12500.5, 12.5, 1000.0]
+    assert getallen.iloc[4:].isna().all()
+
+
+def test_verkoopprijs_in_eur_blijft_zonder_koers():
+    df = pd.DataFrame([_rij(aankoopprijs_eur="1000", verkoopprijs_eur="2000")])
+    percelen, fouten = valideer(df, wisselkoers=None)
+    assert fouten.empty
+    assert percelen[0]["verkoopprijs_eur"] == 2000.0
+    assert percelen[0]["dealstage"] == "Verkocht"
+
+
+def test_fouten_per_rij_en_kolom():
+    df = pd.DataFrame([
+        _rij(),
+        _rij(),                                     # dubbel
+        _rij(locatie=None),
+        _rij(locatie="Brikama", aankoopdatum="31-02-2024"),
+        _rij(locatie="Bestaand"),
+        _rij(locatie="Tanji", lengte="-5", x3=None),
+        _rij(locatie="Gunjur", investeerder="Jan"),
+    ])
+    percelen, fouten = valideer(df, wisselkoers=75, bestaande_locaties=["Bestaand"])
+
+    assert [p["locatie"] for p in percelen] == ["Sanyang 1"]
+    assert list(fouten.itertuples(index=False, name=None)) == [
+        (2, "locatie", "dubbel in het bestand"),
+        (3, "locatie", "ontbreekt"),
+        (4, "aankoopdatum", "onbekende datum"),
+        (5, "locatie", "bestaat al"),
+        (6, "lengte", "negatief"),
+        (6, "polygon", "minder dan 3 geldige hoekpunten"),
+        (7, "investeerder_bedrag_eur", "bedrag ontbreekt"),
+    ]
+
+
+def test_zonder_wisselkoers_geen_omrekening():
+    percelen, fouten = valideer(pd.DataFrame([_rij()]), wisselkoers=None)
+    assert percelen == []
+    assert fouten["kolom"].tolist() == ["aankoopprijs_eur"]
+
+
+def test_importeer_in_batches_en_onderbroken_import(tmp_path):
+    store = DataStore(JSONBackend(str(tmp_path / "percelen.json")))
+    df = pd.DataFrame([_rij(locatie=f"Sanyang {i}") for i in range(5)])
+    percelen, _fouten = valideer(df, wisselkoers=75)
+
+    tracker = PerceelTracker()
+    totaal = importeer(percelen[:3], store, tracker, chunk=2)
+    assert (totaal["batches"], totaal["geschreven"]) == (2, 3)
+    assert tracker.delta(totaal["percelen"])["gewijzigd"] == []
+
+    schrijf = store.schrijf
+    aanroepen = []
+
+    def tweede_faalt(*args):
+        aanroepen.append(1)
+        if len(aanroepen) == 2:
+            raise ConnectionError("weg")
+        return schrijf(*args)
+
+    store.schrijf = tweede_faalt
+    rest = percelen[3:] + [dict(percelen[0], perceel_id="nieuw", locatie="Brikama")]
+    with pytest.raises(ImportOnderbroken) as fout:
+        importeer(rest, store, tracker, chunk=2)
+    assert [p["locatie"] for p in fout.value.percelen] == ["Sanyang 3", "Sanyang 4"]
+    assert len(store.backend.lees_versies()) == 5
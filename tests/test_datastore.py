@@ -0,0 +1,110 @@
+import pytest
+
+from backends import JSONBackend, SQLiteBackend
+from datastore import DataStore, OpslagConflict, PerceelTracker, merge_velden
+
+
+def _store(tmp_path):
+    store = DataStore(JSONBackend(str(tmp_path / "percelen.json")))
+    store.save_percelen([
+        {"perceel_id": "p1", "locatie": "Sanyang 1", "status_updates": [{"datum": "2024-05-01", "tekst": "a"}]},
+        {"perceel_id": "p2", "locatie": "Sanyang 2"},
+    ], tracker=PerceelTracker())
+    return store
+
+
+def test_delta_leeg_na_laden_en_normaliseren(tmp_path):
+    store = _store(tmp_path)
+    tracker = PerceelTracker()
+    percelen = store.load_percelen(tracker=tracker)
+
+    # zoals bereid_percelen_voor: datums naar DD-MM-YYYY en defaults
+    percelen[0]["status_updates"][0]["datum"] = "01-05-2024"
+    for p in percelen:
+        p.setdefault("wordt_gesplitst", False)
+    assert len(tracker.delta(percelen)["gewijzigd"]) == 2
+
+    tracker.herbevestig(percelen)
+    delta = tracker.delta(percelen)
+    assert delta["gewijzigd"] == [] and delta["verwijderd"] == []
+    assert store.save_percelen(percelen, tracker=tracker)["geschreven"] == 0
+
+
+def test_herbevestig_houdt_versie_en_negeert_onbekende(tmp_path):
+    store = _store(tmp_path)
+    tracker = PerceelTracker()
+    percelen = store.load_percelen(tracker=tracker)
+    versie = tracker.versie("p1")
+
+    tracker.herbevestig(percelen + [{"perceel_id": "nieuw", "locatie": "X"}])
+    assert tracker.versie("p1") == versie
+    assert tracker.basis("nieuw") is None
+
+
+def test_save_percelen_zonder_tracker_weigert(tmp_path):
+    store = _store(tmp_path)
+    with pytest.raises(ValueError):
+        store.save_percelen(store.load_percelen(), tracker=None)
+
+
+def test_merge_velden_neemt_wijzigingen_van_beide_kanten():
+    basis = {"locatie": "Sanyang", "fase": "aankoop", "notitie": "x"}
+    mijn = {"locatie": "Sanyang", "fase": "verkoop", "notitie": "x"}
+    hun = {"locatie": "Sanyang 2", "fase": "aankoop"}
+
+    doc, velden = merge_velden(basis, mijn, hun)
+    assert velden == []
+    assert doc == {"locatie": "Sanyang 2", "fase": "verkoop"}
+
+
+def test_merge_velden_conflict_houdt_mijn_waarde():
+    doc, velden = merge_velden({"fase": "a", "prijs": 1}, {"fase": "b", "prijs": 1}, {"fase": "c", "prijs": 1})
+    assert velden == ["fase"]
+    assert doc == {"fase": "b", "prijs": 1}
+
+    # allebei dezelfde wijziging is geen conflict
+    assert merge_velden({"fase": "a"}, {"fase": "b"}, {"fase": "b"}) == ({"fase": "b"}, [])
+
+
+def _twee_sessies(tmp_path):
+    store = DataStore(SQLiteBackend(str(tmp_path / "percelen.db")))
+    store.save_percelen([{"perceel_id": "p1", "locatie": "Sanyang", "fase": "aankoop", "prijs": 100}],
+                        tracker=PerceelTracker())
+    a, b = PerceelTracker(), PerceelTracker()
+    return store, (store.load_percelen(tracker=a), a), (store.load_percelen(tracker=b), b)
+
+
+def test_gelijktijdige_wijziging_andere_velden_wordt_samengevoegd(tmp_path):
+    store, (mijn, a), (hun, b) = _twee_sessies(tmp_path)
+    hun[0]["prijs"] = 120
+    store.save_percelen(hun, tracker=b)
+
+    mijn[0]["fase"] = "verkoop"
+    totaal = store.save_percelen(mijn, tracker=a)
+    assert totaal["samengevoegd"] == 1
+    assert mijn[0]["prijs"] == 120 and mijn[0]["fase"] == "verkoop"
+    assert a.versie("p1") == 3
+    assert store.backend.lees_rijen(["p1"])[0]["perceel"] == mijn[0]
+
+
+def test_gelijktijdige_wijziging_zelfde_veld_geeft_opslagconflict(tmp_path):
+    store, (mijn, a), (hun, b) = _twee_sessies(tmp_path)
+    hun[0]["fase"] = "verkocht"
+    store.save_percelen(hun, tracker=b)
+
+    mijn[0]["fase"] = "verkoop"
+    with pytest.raises(OpslagConflict) as fout:
+        store.save_percelen(mijn, tracker=a)
+    assert fout.value.conflicten[0]["velden"] == ["fase"]
+    assert store.backend.lees_rijen(["p1"])[0]["perceel"]["fase"] == "verkocht"
+
+
+def test_iter_percelen_in_paginas_vult_tracker(tmp_path):
+    store = DataStore(SQLiteBackend(str(tmp_path / "percelen.db")))
+    store.save_percelen([{"perceel_id": f"p{i}", "locatie": str(i)} for i in range(5)], tracker=PerceelTracker())
+    store = DataStore(store.backend)  # lege cache: pagina voor pagina
+
+    tracker = PerceelTracker()
+    percelen = list(store.iter_percelen(paginagrootte=2, tracker=tracker))
+    assert [p["perceel_id"] for p in percelen] == [f"p{i}" for i in range(5)]
+    assert tracker.delta(percelen)["gewijzigd"] == []
@@ -0,0 +1,148 @@
+import copy
+
+import pytest
+
+from backends import JSONBackend
+from datastore import DataStore, PerceelTracker
+from journaal import SessieJournaal, journaal_entry, maak_patch, pas_patch_toe
+
+
+def _store(tmp_path, percelen):
+    store = DataStore(JSONBackend(str(tmp_path / "percelen.json")))
+    store.save_percelen(percelen, tracker=PerceelTracker())
+    return store
+
+
+def _percelen():
+    return [{"perceel_id": f"p{i}", "locatie": f"Sanyang {i}", "lengte": 20} for i in range(3)]
+
+
+def test_dashboard_dan_percelenbeheer_opslaan_en_undo(tmp_path):
+    store = _store(tmp_path, _percelen())
+
+    # Dashboard laadt de percelen (en begint het journaal)
+    tracker = PerceelTracker()
+    percelen = store.load_percelen(tracker=tracker)
+    journaal = SessieJournaal()
+    journaal.begin(percelen)
+
+    # Percelenbeheer: één wijziging opslaan
+    percelen[0]["locatie"] = "Sanyang 10"
+    assert journaal.leg_vast(percelen) == 1
+    store.save_percelen(percelen, tracker=tracker)
+
+    # undo zet alleen die wijziging terug; de rest van de portfolio blijft staan
+    assert journaal.undo(percelen)
+    assert len(percelen) == 3
+    totaal = store.save_percelen(percelen, tracker=tracker)
+    assert totaal["verwijderd"] == 0
+    opgeslagen = {p["perceel_id"]: p for p in store.load_percelen()}
+    assert len(opgeslagen) == 3
+    assert opgeslagen["p0"]["locatie"] == "Sanyang 0"
+
+
+def test_leg_vast_zonder_begin_neemt_inhoud_over(tmp_path):
+    store = _store(tmp_path, _percelen())
+    tracker = PerceelTracker()
+    percelen = store.load_percelen(tracker=tracker)
+    journaal = SessieJournaal()
+
+    # eerste keer zonder begin(): uitgangssituatie, geen stap met de hele portfolio
+    assert journaal.leg_vast(percelen) == 0
+    assert not journaal.kan_undo
+
+    percelen[1]["lengte"] = 30
+    assert journaal.leg_vast(percelen) == 1
+    journaal.undo(percelen)
+    assert [p["perceel_id"] for p in percelen] == ["p0", "p1", "p2"]
+    assert percelen[1]["lengte"] == 20
+    assert store.save_percelen(percelen, tracker=tracker)["verwijderd"] == 0
+
+
+def test_raak_aan_verhoogt_versie_alleen_bij_andere_inhoud():
+    percelen = [{"perceel_id": "p1", "locatie": "Sanyang 1"}]
+    journaal = SessieJournaal()
+    journaal.begin(percelen)
+    versie = journaal.versie
+
+    assert not journaal.raak_aan(percelen[0])
+    assert journaal.versie == versie
+
+    percelen[0]["locatie"] = "Sanyang 2"
+    assert journaal.raak_aan(percelen[0])
+    assert journaal.versie > versie
+    versie = journaal.versie
+    assert not journaal.raak_aan(percelen[0])
+    assert journaal.versie == versie
+
+    # vastleggen maakt er nog steeds één undo-stap van
+    assert journaal.leg_vast(percelen) == 1
+    journaal.undo(percelen)
+    assert percelen[0]["locatie"] == "Sanyang 1"
+
+
+@pytest.mark.parametrize("oud, nieuw", [
+    ({"locatie": "a", "lengte": 20}, {"locatie": "b", "lengte": 20}),
+    ({"locatie": "a", "notitie": "x"}, {"locatie": "a"}),
+    ({"locatie": "a"}, {"locatie": "a", "investeerders": [{"naam": "Jan", "bedrag_eur": 500}]}),
+    (None, {"perceel_id": "p1", "locatie": "a"}),
+    ({"perceel_id": "p1", "locatie": "a"}, None),
+    ({"locatie": "a"}, {"locatie": "a"}),
+])
+def test_patch_heen_en_terug(oud, nieuw):
+    bewaard = copy.deepcopy(oud)
+    assert pas_patch_toe(oud, maak_patch(oud, nieuw)) == nieuw
+    assert pas_patch_toe(nieuw, maak_patch(nieuw, oud)) == oud
+    assert oud == bewaard  # pas_patch_toe laat het document staan
+
+
+def test_patch_bevat_alleen_gewijzigde_velden():
+    entry = journaal_entry("p1", {"locatie": "a", "lengte": 20, "notitie": "x"}, {"locatie": "b", "lengte": 20})
+    assert entry["soort"] == "gewijzigd"
+    assert entry["patch"] == {"zet": {"locatie": "b"}, "weg": ["notitie"]}
+    assert entry["invers"] == {"zet": {"locatie": "a", "notitie": "x"}, "weg": []}
+
+
+def test_undo_redo_over_meerdere_stappen():
+    percelen = _percelen()
+    journaal = SessieJournaal()
+    journaal.begin(percelen)
+    standen = [copy.deepcopy(percelen)]
+
+    percelen[0]["locatie"] = "Sanyang 10"
+    percelen[2]["lengte"] = 25
+    journaal.leg_vast(percelen)
+    standen.append(copy.deepcopy(percelen))
+
+    percelen.insert(1, {"perceel_id": "p9", "locatie": "Brikama"})
+    journaal.leg_vast(percelen)
+    standen.append(copy.deepcopy(percelen))
+
+    del percelen[0]
+    journaal.leg_vast(percelen)
+    standen.append(copy.deepcopy(percelen))
+
+    for stand in reversed(standen[:-1]):
+        assert journaal.undo(percelen)
+        assert percelen == stand
+    assert not journaal.undo(percelen)
+
+    for stand in standen[1:]:
+        assert journaal.redo(percelen)
+        assert percelen == stand
+    assert not journaal.redo(percelen)
+
+
+def test_nieuwe_stap_wist_redo():
+    percelen = _percelen()
+    journaal = SessieJournaal()
+    journaal.begin(percelen)
+    percelen[0]["lengte"] = 30
+    journaal.leg_vast(percelen)
+    journaal.undo(percelen)
+    assert journaal.kan_redo
+
+    percelen[1]["lengte"] = 40
+    journaal.leg_vast(percelen)
+    assert not journaal.kan_redo
+    assert journaal.undo(percelen) and percelen == _percelen()
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from financieel.kasstromen import xirr
+
+
+def _xirr(*groepen):
+    """xirr voor groepen [(datum, bedrag), ...]."""
+    groep, datums, bedragen = [], [], []
+    for g, stromen in enumerate(groepen):
+        for datum, bedrag in stromen:
+            groep.append(g)
+            datums.append(datum)
+            bedragen.append(bedrag)
+    return xirr(np.array(groep), np.array(datums, dtype="datetime64[D]"), np.array(bedragen))
+
+
+# voorbeeld uit de Excel-documentatie van XIRR: 0,373362535
+EXCEL = [("2008-01-01", -10000), ("2008-03-01", 2750), ("2008-10-30", 4250),
+         ("2009-02-15", 3250), ("2009-04-01", 2750)]
+
+
+def test_excel_voorbeeld():
+    assert _xirr(EXCEL)[0] == pytest.approx(0.373362535, abs=1e-8)
+
+
+def test_een_jaar():
+    # 2023 is geen schrikkeljaar: 365 dagen, Act/365
+    assert _xirr([("2023-01-01", -1000), ("2024-01-01", 1100)])[0] == pytest.approx(0.10, abs=1e-9)
+    # half jaar verlies
+    r = _xirr([("2023-01-01", -1000), ("2023-07-02", 900)])[0]
+    assert 1000 * (1 + r) ** (182 / 365) == pytest.approx(900)
+
+
+def test_groepen_tegelijk_en_volgorde_vrij():
+    uitkomst = _xirr(
+        EXCEL[::-1],
+        [("2023-01-01", -1000), ("2024-01-01", 1100)],
+        [("2023-01-01", -1000), ("2024-01-01", -100)],   # geen tekenwissel
+        [("2023-01-01", -1000), ("2023-02-01", 2000)],   # ruim boven 1000% per jaar
+        [("2023-01-01", -1000), ("2024-01-01", 50)],     # bijna alles kwijt
+    )
+    assert uitkomst[0] == pytest.approx(0.373362535, abs=1e-8)
+    assert uitkomst[1] == pytest.approx(0.10, abs=1e-9)
+    assert np.isnan(uitkomst[2]) and np.isnan(uitkomst[3])
+    assert uitkomst[4] == pytest.approx(-0.95, abs=1e-8)
+
+
+def test_leeg():
+    assert len(xirr(np.array([], dtype="int64"), np.array([], dtype="datetime64[D]"), np.array([]))) == 0
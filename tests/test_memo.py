@@ -0,0 +1,38 @@
+from journaal import SessieJournaal
+from memo import memoiseer, perceel_sleutel
+
+
+def test_perceel_sleutel_volgt_bewerking_voor_opslaan():
+    percelen = [{"perceel_id": "p1", "aankoopprijs": 1000}]
+    journaal = SessieJournaal()
+    journaal.begin(percelen)
+    sleutel = perceel_sleutel(percelen[0], journaal)
+
+    percelen[0]["aankoopprijs"] = 2000
+    journaal.raak_aan(percelen[0])
+    assert perceel_sleutel(percelen[0], journaal) != sleutel
+
+
+def test_memo_geeft_geen_verouderde_analyse_na_bewerking():
+    percelen = [{"perceel_id": "p1", "aankoopprijs": 1000}]
+    journaal = SessieJournaal()
+    journaal.begin(percelen)
+
+    @memoiseer(lambda perceel: perceel_sleutel(perceel, journaal))
+    def dubbel(perceel):
+        return {"waarde": perceel["aankoopprijs"] * 2}
+
+    assert dubbel(percelen[0]) == {"waarde": 2000}
+    percelen[0]["aankoopprijs"] = 1500
+    journaal.raak_aan(percelen[0])
+    assert dubbel(percelen[0]) == {"waarde": 3000}
+
+
+def test_kopie_valt_terug_op_inhoudshash():
+    perceel = {"perceel_id": "p1", "aankoopprijs": 1000}
+    journaal = SessieJournaal()
+    journaal.begin([perceel])
+    kopie = dict(perceel)
+    assert perceel_sleutel(kopie, journaal) == perceel_sleutel(dict(perceel), journaal)
+    kopie["aankoopprijs"] = 5
+    assert perceel_sleutel(kopie, journaal) != perceel_sleutel(dict(perceel), journaal)
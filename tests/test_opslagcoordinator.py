@@ -0,0 +1,40 @@
+import streamlit as st
+
+from opslagcoordinator import OpslagCoordinator, opslag_coordinator
+
+
+def test_verzoeken_in_een_run_worden_een_flush():
+    opgeslagen = []
+    coordinator = OpslagCoordinator(lambda: opgeslagen.append(1) or len(opgeslagen))
+
+    assert coordinator.flush() is None
+    for _ in range(3):
+        coordinator.vraag_opslaan()
+    assert coordinator.open
+    assert coordinator.flush() == 1
+    assert not coordinator.open and coordinator.flush() is None
+    assert (coordinator.verzoeken, coordinator.flushes, len(opgeslagen)) == (3, 1, 1)
+
+
+def test_cache_wissen_zonder_opslaan(monkeypatch):
+    gewist, opgeslagen = [], []
+    monkeypatch.setattr(st.cache_data, "clear", lambda: gewist.append(1))
+    coordinator = OpslagCoordinator(lambda: opgeslagen.append(1))
+
+    coordinator.vraag_cache_wissen()
+    coordinator.flush()
+    coordinator.vraag_opslaan(cache_wissen=True)
+    coordinator.vraag_opslaan()
+    coordinator.flush()
+    assert (len(gewist), len(opgeslagen)) == (2, 1)
+
+
+def test_afgebroken_run_wordt_bij_de_volgende_uitgevoerd():
+    opgeslagen = []
+    coordinator = opslag_coordinator("test_coordinator", lambda: opgeslagen.append("oud"))
+    coordinator.vraag_opslaan()  # daarna st.rerun() of een fout: geen flush
+
+    # volgende run: nieuwe opslaan-functie, het open verzoek gaat meteen weg
+    assert opslag_coordinator("test_coordinator", lambda: opgeslagen.append("nieuw")) is coordinator
+    assert opgeslagen == ["nieuw"]
+    del st.session_state["test_coordinator"]
@@ -0,0 +1,80 @@
+from backends import JSONBackend
+from datastore import DataStore, PerceelTracker
+from schrijfwachtrij import SchrijfWachtrij
+
+
+class TelStore(DataStore):
+    """DataStore die schrijf-aanroepen telt en de eerste `fouten` keer faalt."""
+
+    def __init__(self, backend):
+        super().__init__(backend)
+        self.fouten = 0
+        self.aanroepen = []
+
+    def schrijf(self, gewijzigd, verwijderd, tracker):
+        self.aanroepen.append([item["perceel_id"] for item in gewijzigd + verwijderd])
+        if self.fouten:
+            self.fouten -= 1
+            raise ConnectionError("opslag niet bereikbaar")
+        return super().schrijf(gewijzigd, verwijderd, tracker)
+
+
+def _sessie(tmp_path, fouten=0):
+    store = TelStore(JSONBackend(str(tmp_path / "percelen.json")))
+    store.save_percelen([{"perceel_id": "p1", "locatie": "Sanyang"}], tracker=PerceelTracker())
+    store.fouten, store.aanroepen = fouten, []
+    tracker = PerceelTracker()
+    return store, store.load_percelen(tracker=tracker), tracker
+
+
+def test_wijzigingen_kort_na_elkaar_worden_een_write(tmp_path):
+    store, percelen, tracker = _sessie(tmp_path)
+    wachtrij = SchrijfWachtrij(store)
+
+    # de schrijfthread kan de wachtrij pas leeghalen als het slot vrij is
+    with wachtrij._cond:
+        percelen[0]["locatie"] = "Sanyang 2"
+        assert wachtrij.plaats(percelen, tracker) == 1
+        percelen[0]["locatie"] = "Sanyang 3"
+        assert wachtrij.plaats(percelen, tracker) == 1
+        assert wachtrij.status(tracker)["wachtend"] == 1
+    assert wachtrij.wacht(tracker, timeout=5)
+
+    assert store.aanroepen == [["p1"]]
+    assert store.backend.lees_rijen(["p1"])[0]["perceel"]["locatie"] == "Sanyang 3"
+    assert tracker.delta(percelen)["gewijzigd"] == []
+    assert wachtrij.plaats(percelen, tracker) == 0
+
+
+def test_mislukte_write_wordt_opnieuw_geprobeerd(tmp_path):
+    store, percelen, tracker = _sessie(tmp_path, fouten=2)
+    wachtrij = SchrijfWachtrij(store, wachttijd=0.01)
+
+    percelen[0]["locatie"] = "Sanyang 2"
+    wachtrij.plaats(percelen, tracker)
+    assert wachtrij.wacht(tracker, timeout=5)
+
+    assert len(store.aanroepen) == 3
+    assert wachtrij.status(tracker) == {"wachtend": 0, "mislukt": []}
+    assert store.backend.lees_rijen(["p1"])[0]["perceel"]["locatie"] == "Sanyang 2"
+
+
+def test_na_max_pogingen_mislukt_tot_opnieuw(tmp_path):
+    store, percelen, tracker = _sessie(tmp_path, fouten=2)
+    wachtrij = SchrijfWachtrij(store, max_pogingen=2, wachttijd=0.01)
+
+    percelen[0]["locatie"] = "Sanyang 2"
+    wachtrij.plaats(percelen, tracker)
+    assert wachtrij.wacht(tracker, timeout=5)
+
+    mislukt = wachtrij.status(tracker)["mislukt"]
+    assert [m["perceel_id"] for m in mislukt] == ["p1"]
+    assert "niet bereikbaar" in mislukt[0]["fout"]
+    assert wachtrij.openstaand(tracker) == {"p1"}
+    # dezelfde inhoud nog eens plaatsen zet hem niet terug
+    assert wachtrij.plaats(percelen, tracker) == 0
+
+    assert wachtrij.opnieuw(tracker) == 1
+    assert wachtrij.wacht(tracker, timeout=5)
+    assert wachtrij.status(tracker) == {"wachtend": 0, "mislukt": []}
+    assert store.backend.lees_rijen(["p1"])[0]["perceel"]["locatie"] == "Sanyang 2"
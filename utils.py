@@ -1,10 +1,9 @@
-from supabase import create_client, Client
+from supabase import Client
 import pandas as pd
 import pydeck as pdk
 import numpy as np
 import requests
 from datetime import date, timedelta
-from dateutil.relativedelta import relativedelta
 import streamlit as st
 from oauth2client.service_account import ServiceAccountCredentials
 import gspread
@@ -13,6 +12,9 @@ import json
 import gettext
 from typing import Tuple, Callable
 import os, tomllib
+from memo import memoiseer, perceel_sleutel, percelen_sleutel
+import financieel
+from financieel.gevoeligheid import FX_SCHOKKEN_PCT, GROEI_PCTS, HORIZONNEN
 
 # Safe fallback voor vertalingen in utils
 _ = st.session_state.get("_", lambda x: x)
@@ -56,15 +58,11 @@ def language_selector(default: str = "nl") -> Tuple[Callable, Callable]:
 # SUPABASE
 # =========================
 
-@st.cache_resource
 def get_supabase() -> Client:
-    url = st.secrets.get("SUPABASE_URL")
-    key = st.secrets.get("SUPABASE_KEY")
+    """De gedeelde Supabase-client van dit proces (zie supabase_client)."""
+    from supabase_client import supabase_client
 
-    if not url or not key:
-        raise ValueError("SUPABASE_URL of SUPABASE_KEY ontbreekt")
-
-    return create_client(url, key)
+    return supabase_client()
 
 def get_ai_config():
     """Zoekt de [ai] sectie in config.toml of .streamlit/config.toml."""
@@ -99,7 +97,8 @@ def get_exchange_rate_eur_to_gmd():
 # 🔵 2. Wisselkoersvolatiliteit berekenen
 ttldays_vol = 86400
 @st.cache_data(ttl=ttldays_vol)
-def get_exchange_rate_volatility(dagen=30):
+def get_exchange_rate_timeseries(dagen=30) -> list[float]:
+    """Dagkoersen EUR → GMD van de afgelopen `dagen` dagen (oud → nieuw); leeg als de API faalt."""
     end_date = date.today()
     start_date = end_date - timedelta(days=dagen)
     url = "https://api.fxratesapi.com/timeseries"
@@ -111,13 +110,17 @@ def get_exchange_rate_volatility(dagen=30):
     }
     resp = requests.get(url, headers=headers, params=params)
     if resp.status_code == 200:
-        data = resp.json()
-        rates = data.get("rates", {})
-        koersen = [v.get("GMD") for v in rates.values() if "GMD" in v]
-        if len(koersen) >= 2:
-            std = np.std(koersen)
-            mean = np.mean(koersen)
-            return round((std / mean) * 100, 2)
+        rates = resp.json().get("rates", {})
+        return [rates[d]["GMD"] for d in sorted(rates) if "GMD" in rates[d]]
+    return []
+
+@st.cache_data(ttl=ttldays_vol)
+def get_exchange_rate_volatility(dagen=30):
+    koersen = get_exchange_rate_timeseries(dagen)
+    if len(koersen) >= 2:
+        std = np.std(koersen)
+        mean = np.mean(koersen)
+        return round((std / mean) * 100, 2)
     return None
 
 # 🧭 3. Geocoding via Google Maps API
@@ -283,249 +286,40 @@ def format_currency(amount, currency="EUR") -> str:
     return str(amount)
 
 # 📊 13. Rentebetalingen
-@st.cache_data(ttl=60)
+# (13–17: Streamlit-laag om de rekenkern in financieel/: vertaling en memo)
+@memoiseer(lambda percelen, today=None: (percelen_sleutel(percelen), today or date.today()))
 def build_rentebetalingen(percelen: list[dict], today: date | None = None) -> pd.DataFrame:
-    if today is None:
-        today = date.today()
-    rows = []
-    for perceel in percelen or []:
-        locatie = perceel.get("locatie", _("Onbekend"))
-        aankoopdatum_str = perceel.get("aankoopdatum", "")
-        aankoopdatum = pd.to_datetime(aankoopdatum_str, errors="coerce")
-        if pd.isna(aankoopdatum):
-            aankoopdatum = pd.Timestamp(today)
-        aankoopdatum_date = aankoopdatum.date()
-        for inv in (perceel.get("investeerders") or []):
-            naam = (inv or {}).get("naam", _("Investeerder"))
-            bedrag_eur = float((inv or {}).get("bedrag_eur", 0.0) or 0.0)
-            rente = float((inv or {}).get("rente", 0.0) or 0.0)
-            rentetype = str((inv or {}).get("rentetype", _("bij verkoop"))).lower()
-            if rente <= 0 or rentetype not in ("maandelijks", "jaarlijks"):
-                continue
-            if rentetype == "maandelijks":
-                maanden = (today.year - aankoopdatum_date.year) * 12 + (today.month - aankoopdatum_date.month)
-                maanden = max(maanden, 0)
-                opgebouwde = bedrag_eur * (rente / 12) * maanden
-                volgende = aankoopdatum_date + relativedelta(months=maanden + 1)
-                volgende_bedrag = bedrag_eur * rente / 12
-            else:
-                jaren = max(today.year - aankoopdatum_date.year, 0)
-                opgebouwde = bedrag_eur * rente * jaren
-                volgende = aankoopdatum_date + relativedelta(years=jaren + 1)
-                volgende_bedrag = bedrag_eur * rente
-            rows.append({
-                _("Perceel"): locatie,
-                _("Investeerder"): naam,
-                _("Rentetype"): rentetype,
-                _("Startdatum"): aankoopdatum_date.strftime("%d-%m-%Y"),
-                _("Volgende betaling"): volgende.strftime("%d-%m-%Y"),
-                _("Bedrag volgende betaling (€)"): round(volgende_bedrag, 2),
-                _("Opgebouwde rente tot nu (€)"): round(opgebouwde, 2),
-                "_volgende_sort": volgende,
-            })
-    df = pd.DataFrame(rows)
-    if not df.empty:
-        df = df.sort_values("_volgende_sort").drop(columns=["_volgende_sort"]).reset_index(drop=True)
-    return df
-
-def _safe_float(v, default=0.0):
-    try:
-        return float(v)
-    except (TypeError, ValueError):
-        return default
+    return financieel.build_rentebetalingen(percelen, today, vertaal=_)
 
 # 📊 14. Analyse portfolio perceel
-@st.cache_data(ttl=60)
-def analyse_portfolio_perceel(perceel: dict, groei_pct: float, horizon_jaren: int, exchange_rate: float) -> dict | None:
-    aankoopprijs = _safe_float(perceel.get("aankoopprijs"))
-    aankoopdatum = pd.to_datetime(perceel.get("aankoopdatum"), errors="coerce")
-    investeerders = perceel.get("investeerders", [])
-    if not isinstance(investeerders, list):
-        investeerders = []
-    totaal_extern = sum(_safe_float(i.get("bedrag")) for i in investeerders if isinstance(i, dict))
-    eigen_inleg = aankoopprijs - totaal_extern
-    if eigen_inleg > 0:
-        investeerders.append({
-            "naam": _("Eigen beheer"),
-            "bedrag": eigen_inleg,
-            "rente": 0,
-            "rentetype": _("bij verkoop"),
-            "winstdeling": 1.0,
-        })
-    if not pd.notnull(aankoopdatum) or aankoopprijs <= 0:
-        return None
-    verkoopprijs_gmd = _safe_float(perceel.get("verkoopprijs"))
-    verkoopprijs_eur = _safe_float(perceel.get("verkoopprijs_eur"))
-    if verkoopprijs_gmd > 0:
-        verkoopwaarde = verkoopprijs_gmd
-    else:
-        verkoopwaarde = aankoopprijs * ((1 + groei_pct / 100) ** horizon_jaren)
-    if verkoopprijs_eur <= 0 and exchange_rate:
-        verkoopprijs_eur = round(verkoopwaarde / exchange_rate, 2)
-    vandaag = pd.Timestamp.today()
-    maanden = max((vandaag.year - aankoopdatum.year) * 12 + (vandaag.month - aankoopdatum.month), 1)
-    jaren = maanden / 12
-    totaal_inleg = 0.0
-    totaal_rente = 0.0
-    inv_rows = []
-    for inv in investeerders:
-        if isinstance(inv, dict):
-            bedrag = _safe_float(inv.get("bedrag"))
-            rente = _safe_float(inv.get("rente"))
-            winstdeling_pct = _safe_float(inv.get("winstdeling"))
-            rentetype = (inv.get("rentetype") or _("maandelijks")).lower()
-            naam = inv.get("naam", _("Investeerder"))
-        else:
-            bedrag = rente = winstdeling_pct = 0.0
-            rentetype = _("bij verkoop")
-            naam = str(inv)
-        if rentetype == "maandelijks":
-            rente_opbouw = bedrag * ((1 + rente / 12) ** maanden - 1)
-        elif rentetype == "jaarlijks":
-            rente_opbouw = bedrag * ((1 + rente) ** jaren - 1)
-        elif rentetype == "bij verkoop":
-            rente_opbouw = bedrag * rente
-        else:
-            rente_opbouw = 0.0
-        totaal_inleg += bedrag
-        totaal_rente += rente_opbouw
-        inv_rows.append({
-            "naam": naam,
-            "inleg": round(bedrag, 2),
-            "rente": round(rente_opbouw, 2),
-            "kapitaalkosten": round(bedrag + rente_opbouw, 2),
-            "kapitaalkosten_eur": round((bedrag + rente_opbouw) / exchange_rate, 2) if exchange_rate else None,
-            "rentetype": rentetype,
-            "winstdeling_pct": winstdeling_pct,
-        })
-    netto_winst = verkoopwaarde - totaal_inleg - totaal_rente
-    waardestijging = max(0, verkoopwaarde - aankoopprijs)
-    for r in inv_rows:
-        winst_aandeel = waardestijging * r.get("winstdeling_pct", 0)
-        r["winstdeling"] = round(winst_aandeel, 2)
-        r["winst_eur"] = round(winst_aandeel / exchange_rate, 2) if exchange_rate else None
-    return {
-        "locatie": perceel.get("locatie"),
-        "verkoopprijs": round(verkoopwaarde, 2),
-        "verkoopprijs_eur": round(verkoopprijs_eur, 2) if verkoopprijs_eur else None,
-        "verkoopwaarde": round(verkoopwaarde, 2),
-        "verkoopwaarde_eur": round(verkoopwaarde / exchange_rate, 2) if exchange_rate else None,
-        "totaal_inleg": round(totaal_inleg, 2),
-        "totaal_rente": round(totaal_rente, 2),
-        "netto_winst": round(netto_winst, 2),
-        "netto_winst_eur": round(netto_winst / exchange_rate, 2) if exchange_rate else None,
-        "investeerders": inv_rows,
-    }
+@memoiseer(lambda perceel, groei_pct, horizon_jaren, exchange_rate, peildatum=None: (
+    perceel_sleutel(perceel), groei_pct, horizon_jaren, exchange_rate, peildatum or date.today()))
+def analyse_portfolio_perceel(perceel: dict, groei_pct: float, horizon_jaren: int, exchange_rate: float,
+                              peildatum: date | None = None) -> dict | None:
+    return financieel.analyse_portfolio_perceel(perceel, groei_pct, horizon_jaren, exchange_rate, peildatum, vertaal=_)
 
 # 📊 15. Analyse verkocht perceel
-@st.cache_data(ttl=60)
+@memoiseer(lambda perceel, exchange_rate: (perceel_sleutel(perceel), exchange_rate))
 def analyse_verkocht_perceel(perceel: dict, exchange_rate: float) -> dict:
-    aankoopprijs = _safe_float(perceel.get("aankoopprijs"))
-    verkoopprijs_gmd = _safe_float(perceel.get("verkoopprijs"))
-    verkoopprijs_eur = _safe_float(perceel.get("verkoopprijs_eur"))
-    aankoopdatum = pd.to_datetime(perceel.get("aankoopdatum"), errors="coerce")
-    verkoopdatum = pd.to_datetime(perceel.get("verkoopdatum"), errors="coerce")
-    investeerders = perceel.get("investeerders", [])
-    if not isinstance(investeerders, list):
-        investeerders = []
-    if verkoopprijs_eur <= 0 and exchange_rate:
-        verkoopprijs_eur = round(verkoopprijs_gmd / exchange_rate, 2)
-    maanden = jaren = 0
-    if pd.notnull(aankoopdatum) and pd.notnull(verkoopdatum):
-        maanden = max((verkoopdatum.year - aankoopdatum.year) * 12 + (verkoopdatum.month - aankoopdatum.month), 1)
-        jaren = maanden / 12
-    totaal_inleg = aankoopprijs
-    totaal_rente = 0.0
-    inv_rows = []
-    for inv in investeerders:
-        bedrag = _safe_float(inv.get("bedrag"))
-        rente = _safe_float(inv.get("rente"))
-        rentetype = (inv.get("rentetype") or _("bij verkoop")).lower()
-        winstdeling_pct = _safe_float(inv.get("winstdeling"))
-        naam = inv.get("naam", _("Investeerder"))
-        if rentetype == "maandelijks":
-            rente_opbouw = bedrag * ((1 + rente / 12) ** maanden - 1)
-        elif rentetype == "jaarlijks":
-            rente_opbouw = bedrag * ((1 + rente) ** jaren - 1)
-        elif rentetype == "bij verkoop":
-            rente_opbouw = bedrag * rente
-        else:
-            rente_opbouw = 0.0
-        totaal_inleg += bedrag
-        totaal_rente += rente_opbouw
-        inv_rows.append({
-            "naam": naam,
-            "inleg": round(bedrag, 2),
-            "rente": round(rente_opbouw, 2),
-            "kapitaalkosten": round(bedrag + rente_opbouw, 2),
-            "kapitaalkosten_eur": round((bedrag + rente_opbouw) / exchange_rate, 2) if exchange_rate else None,
-            "rentetype": rentetype,
-            "winstdeling_pct": winstdeling_pct,
-        })
-    netto_winst = verkoopprijs_gmd - totaal_inleg - totaal_rente
-    netto_winst_eur = round(netto_winst / exchange_rate, 2) if exchange_rate else None
-    waardestijging = max(0, verkoopprijs_gmd - aankoopprijs)
-    for r in inv_rows:
-        winst_aandeel = waardestijging * r.get("winstdeling_pct", 0)
-        r["winstdeling"] = round(winst_aandeel, 2)
-        r["winst_eur"] = round(winst_aandeel / exchange_rate, 2) if exchange_rate else None
-    return {
-        "locatie": perceel.get("locatie"),
-        "verkoopprijs": round(verkoopprijs_gmd, 2),
-        "verkoopprijs_eur": round(verkoopprijs_eur, 2) if verkoopprijs_eur else None,
-        "verkoopwaarde": round(verkoopprijs_gmd, 2),
-        "verkoopwaarde_eur": round(verkoopprijs_eur, 2) if verkoopprijs_eur else None,
-        "totaal_inleg": round(totaal_inleg, 2),
-        "totaal_rente": round(totaal_rente, 2),
-        "netto_winst": round(netto_winst, 2),
-        "netto_winst_eur": netto_winst_eur,
-        "investeerders": inv_rows,
-    }
+    return financieel.analyse_verkocht_perceel(perceel, exchange_rate, vertaal=_)
 
 # 📊 16. Verdeel winst
-@st.cache_data(ttl=60)
+@memoiseer(lambda perceel_row: (perceel_sleutel(perceel_row), date.today()))
 def verdeel_winst(perceel_row: dict | pd.Series) -> pd.DataFrame:
-    def num(x, d=0.0):
-        try:
-            if x is None or (isinstance(x, float) and pd.isna(x)):
-                return d
-            return float(x)
-        except Exception:
-            return d
-    start_raw = perceel_row.get("start_verkooptraject") or perceel_row.get("aankoopdatum") or date.today()
-    einde_raw = perceel_row.get("doorlooptijd") or perceel_row.get("verkoopdatum")
-    start = pd.to_datetime(start_raw, errors="coerce")
-    einde = pd.to_datetime(einde_raw, errors="coerce")
-    if pd.isna(start) and not pd.isna(einde):
-        start = einde - relativedelta(months=1)
-    if pd.isna(start):
-        start = pd.Timestamp.today().normalize()
-    if pd.isna(einde) or einde < start:
-        einde = start + relativedelta(months=1)
-    opbrengst = num(perceel_row.get("totaal_opbrengst_eur")) or num(perceel_row.get("verwachte_opbrengst_eur"))
-    kosten = num(perceel_row.get("verwachte_kosten_eur"))
-    aankoop = num(perceel_row.get("aankoopprijs_eur"))
-    investering = aankoop + kosten
-    totaal_winst = opbrengst - kosten - aankoop
-    looptijd_jaren = max((einde.year - start.year) + (einde.month - start.month) / 12, 0.01)
-    winst_per_jaar = totaal_winst if looptijd_jaren < 0.5 else totaal_winst / looptijd_jaren
-    rendement_per_jaar_pct = (winst_per_jaar / investering * 100) if investering != 0 else 0.0
-    maanden = int(max((einde.year - start.year) * 12 + (einde.month - start.month) + 1, 1))
-    maand_winst = totaal_winst / maanden
-    rows = []
-    datum = start
-    for idx in range(maanden):
-        rows.append({
-            "jaar": datum.year,
-            "maand": datum.month,
-            "winst_eur": maand_winst,
-            "looptijd_jaren": looptijd_jaren,
-            "opbrengst": opbrengst,
-            "kosten": kosten,
-            "aankoop": aankoop,
-            "investering": investering,
-            "winst_per_jaar": winst_per_jaar,
-            "rendement_per_jaar_pct": rendement_per_jaar_pct,
-        })
-        datum += relativedelta(months=1)
-    return pd.DataFrame(rows)
+    return financieel.verdeel_winst(perceel_row)
+
+# 📊 17. Portfolio-KPI's op een peildatum
+portfolio_kpis = financieel.portfolio_kpis
+
+# 📊 18. Gevoeligheid: groei × horizon × FX-schok
+@memoiseer(lambda percelen, exchange_rate, groei_pcts=GROEI_PCTS, horizonnen=HORIZONNEN,
+           fx_schokken_pct=FX_SCHOKKEN_PCT: (percelen_sleutel(percelen), exchange_rate, tuple(groei_pcts),
+                                             tuple(horizonnen), tuple(fx_schokken_pct), date.today()))
+def gevoeligheidsgrid(percelen: list[dict], exchange_rate: float, groei_pcts=GROEI_PCTS, horizonnen=HORIZONNEN,
+                      fx_schokken_pct=FX_SCHOKKEN_PCT) -> dict:
+    return financieel.gevoeligheidsgrid(percelen, exchange_rate, groei_pcts, horizonnen, fx_schokken_pct, vertaal=_)
+
+# 📊 19. Kasstromen en XIRR
+@memoiseer(lambda percelen, vandaag=None: (percelen_sleutel(percelen), vandaag or date.today()))
+def rendementen(percelen: list[dict], vandaag: date | None = None) -> dict:
+    return financieel.rendementen(percelen, vandaag)
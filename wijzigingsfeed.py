@@ -0,0 +1,108 @@
+"""
+Wijzigingsfeed: welke percelen zijn door anderen gewijzigd?
+
+Bron is het wijzigingsjournaal (werkt met elke backend). Per proces wordt
+hooguit eens per FEED_INTERVAL seconden gevraagd wat er na de laatst
+gelezen seq bij kwam; de regels blijven in een begrensde buffer. Elke
+sessie heeft een eigen cursor in die buffer en krijgt alleen de percelen
+die daarna veranderden, zodat ze gericht ververst kunnen worden.
+
+De cursor telt binnenkomst, geen seq: een seq die later gecommit wordt dan
+een hogere (gelijktijdige transacties) komt via het terugkijkvenster
+alsnog binnen en wordt niet overgeslagen.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+from backends import instelling
+from datastore import store, DataStore
+from logboek import logger, gebeurtenis
+
+log = logger("wijzigingsfeed")
+
+# Seconden tussen twee polls (PERCELEN_FEED_INTERVAL; 0 = alleen bij een rerun)
+FEED_INTERVAL = 5.0
+
+# Aantal regels in de buffer; een sessie die verder achterloopt ververst alles
+FEED_BUFFER = 2000
+
+# Aantal seq's vóór de hoogste dat bij elke poll opnieuw gelezen wordt
+TERUGKIJKEN = 20
+
+
+class WijzigingsFeed:
+    """Gedeelde, begrensde buffer van journaalregels met cursors per sessie."""
+
+    def __init__(self, datastore: DataStore, interval: float | None = None, buffer: int = FEED_BUFFER):
+        self.datastore = datastore
+        if interval is None:
+            interval = float(instelling("PERCELEN_FEED_INTERVAL") or FEED_INTERVAL)
+        self.interval = interval
+
+        self._lock = threading.Lock()
+        # (teller, perceel_id, versie, seq)
+        self._regels = deque(maxlen=buffer)
+        self._gezien = set()
+        self._teller = 0
+        # teller tot waar de buffer volledig is
+        self._ondergrens = 0
+        self._hoogste_seq = None
+        self._gepolld = 0.0
+        self.fout = None
+
+    def cursor(self) -> int:
+        """Startpunt voor een nieuwe sessie (na het volledig laden)."""
+        with self._lock:
+            self._poll()
+            return self._teller
+
+    def sinds(self, cursor: int) -> tuple[dict | None, int]:
+        """
+        {perceel_id: versie (None = verwijderd)} van de regels na `cursor`,
+        en de nieuwe cursor. None i.p.v. een dict als de buffer niet ver
+        genoeg teruggaat.
+        """
+        with self._lock:
+            if time.monotonic() - self._gepolld >= self.interval:
+                self._poll()
+            if cursor < self._ondergrens:
+                return None, self._teller
+            versies = {pid: versie for teller, pid, versie, _seq in self._regels if teller > cursor}
+            return versies, self._teller
+
+    def _poll(self):
+        self._gepolld = time.monotonic()
+        try:
+            regels = self.datastore.wijzigingen_sinds(self._hoogste_seq, terugkijken=TERUGKIJKEN)
+        except Exception as e:
+            # journaal (nog) niet beschikbaar: de sessies werken door zonder feed
+            if self.fout is None:
+                gebeurtenis(log, "poll_mislukt", logging.WARNING, fout=repr(e))
+            self.fout = repr(e)
+            return
+        self.fout = None
+
+        if self._hoogste_seq is None:
+            # eerste poll: alleen het startpunt; het terugkijkvenster geldt als gezien
+            self._hoogste_seq = regels[0]["seq"] if regels else 0
+            self._gezien.update(
+                r["seq"] for r in self.datastore.wijzigingen_sinds(self._hoogste_seq, terugkijken=TERUGKIJKEN)
+            )
+            return
+
+        for regel in regels:
+            if regel["seq"] in self._gezien:
+                continue
+            if len(self._regels) == self._regels.maxlen:
+                oudste = self._regels[0]
+                self._ondergrens = oudste[0]
+                self._gezien.discard(oudste[3])
+            self._teller += 1
+            self._regels.append((self._teller, regel["perceel_id"], regel.get("versie"), regel["seq"]))
+            self._gezien.add(regel["seq"])
+            self._hoogste_seq = max(self._hoogste_seq, regel["seq"])
+
+
+feed = WijzigingsFeed(store)